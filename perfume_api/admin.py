@@ -5,15 +5,16 @@ from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import Group
 # Importaciones necesarias para el cálculo del total
-from django.db.models import Sum, F 
+from django.db.models import Count, Sum, F 
 from django.forms import BaseInlineFormSet 
 from decimal import Decimal
 
-from .models import Usuario, Producto, Cliente, Factura, DetalleFactura, Marca, Tipo, PasswordResetCode
+from .facturas_pdf import invalidar_pdf_factura, respuesta_zip_facturas
+from .ventas import dia_de, recalcular_dias
+from .models import IVA_RATE, Usuario, Producto, Cliente, Factura, DetalleFactura, Marca, Tipo, PasswordResetCode, CorreoSaliente
 
 # ==================== CONSTANTES ====================
-IVA_RATE = Decimal('0.15')
-IVA_FACTOR = Decimal('1.15')
+IVA_FACTOR = 1 + IVA_RATE
 
 # ==================== PERSONALIZACIÓN DEL ADMIN ====================
 admin.site.site_header = "Maison Des Senteurs - Administración"
@@ -141,6 +142,10 @@ class MarcaAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Conteo de productos en la misma consulta del listado
+        return super().get_queryset(request).annotate(num_productos=Count('producto'))
+    
     def logo_preview(self, obj):
         if obj.logo:
             return format_html(
@@ -168,13 +173,14 @@ class MarcaAdmin(admin.ModelAdmin):
     descripcion_corta.short_description = 'Descripción'
     
     def productos_count(self, obj):
-        count = obj.producto_set.count()
+        count = obj.num_productos
         return format_html(
             '<span style="background-color:#3B82F6; color:white; padding:4px 10px; '
             'border-radius:12px; font-size:11px; font-weight:600;">{} productos</span>',
             count
         )
     productos_count.short_description = 'Productos'
+    productos_count.admin_order_field = 'num_productos'
 
 # ==================== TIPO ====================
 @admin.register(Tipo)
@@ -182,6 +188,10 @@ class TipoAdmin(admin.ModelAdmin):
     list_display = ['id', 'nombre', 'descripcion_corta', 'productos_count']
     search_fields = ['nombre', 'descripcion']
     
+    def get_queryset(self, request):
+        # Conteo de productos en la misma consulta del listado
+        return super().get_queryset(request).annotate(num_productos=Count('producto'))
+    
     def descripcion_corta(self, obj):
         if obj.descripcion:
             return obj.descripcion[:50] + '...' if len(obj.descripcion) > 50 else obj.descripcion
@@ -189,13 +199,14 @@ class TipoAdmin(admin.ModelAdmin):
     descripcion_corta.short_description = 'Descripción'
     
     def productos_count(self, obj):
-        count = obj.producto_set.count()
+        count = obj.num_productos
         return format_html(
             '<span style="background-color:#8B5CF6; color:white; padding:4px 10px; '
             'border-radius:12px; font-size:11px; font-weight:600;">{} productos</span>',
             count
         )
     productos_count.short_description = 'Productos'
+    productos_count.admin_order_field = 'num_productos'
 
 # ==================== PRODUCTO ====================
 @admin.register(Producto)
@@ -325,6 +336,10 @@ class ClienteAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Conteo de compras en la misma consulta del listado
+        return super().get_queryset(request).annotate(num_facturas=Count('factura'))
+    
     def nombre_completo(self, obj):
         return f"{obj.nombre} {obj.apellido}"
     nombre_completo.short_description = 'Cliente'
@@ -345,7 +360,7 @@ class ClienteAdmin(admin.ModelAdmin):
     sexo_badge.short_description = 'Sexo'
     
     def facturas_count(self, obj):
-        count = obj.factura_set.count()
+        count = obj.num_facturas
         if count == 0:
             return format_html('<span style="color:#999;">Sin compras</span>')
         return format_html(
@@ -354,6 +369,7 @@ class ClienteAdmin(admin.ModelAdmin):
             count
         )
     facturas_count.short_description = 'Compras'
+    facturas_count.admin_order_field = 'num_facturas'
 
 # ==================== FACTURA (AJUSTADA) ====================
 @admin.register(Factura)
@@ -379,14 +395,15 @@ class FacturaAdmin(admin.ModelAdmin):
         'id',
     ]
     date_hierarchy = 'fecha'
+    actions = ['exportar_pdfs_zip']
     # 'total' es de solo lectura porque se calcula
-    readonly_fields = ['fecha', 'total'] 
+    readonly_fields = ['fecha', 'total', 'subtotal', 'iva', 'num_items'] 
     ordering = ['-fecha']
     
     fieldsets = (
         ('Información de la Factura', {
             # Mostramos el total final aquí.
-            'fields': ('cliente', 'fecha', 'metodo_pago', 'total') 
+            'fields': ('cliente', 'fecha', 'metodo_pago', 'subtotal', 'iva', 'total', 'num_items') 
         }),
     )
     
@@ -405,24 +422,44 @@ class FacturaAdmin(admin.ModelAdmin):
         
         # Solo calcular si el formset es el de DetalleFactura
         if formset.model == DetalleFactura:
-            # 1. Sumar los SUBTOTALES (que son SIN IVA)
-            agregacion = DetalleFactura.objects.filter(factura=factura).aggregate(
-                subtotal_total=Sum('subtotal') # Suma los subtotales (SIN IVA)
-            )
+            # 1. Sumar los SUBTOTALES de las líneas (que son SIN IVA) y contarlas
+            agregacion = factura.detallefactura_set.aggregate(subtotal=Sum('subtotal'), num_items=Count('id'))
             
-            subtotal_total = agregacion['subtotal_total'] or Decimal('0.00')
+            # 2. Calcular el TOTAL (con IVA) = Subtotal * 1.15, y guardar su
+            #    desglose igual que las ventas de la app (subtotal = total / 1.15)
+            total = ((agregacion['subtotal'] or Decimal('0.00')) * IVA_FACTOR).quantize(Decimal('0.00'))
+            factura.aplicar_agregados(total, agregacion['num_items'])
             
-            # 2. Calcular el TOTAL (con IVA)
-            # Total = Subtotal Total * 1.15
-            total_final = (subtotal_total * IVA_FACTOR).quantize(Decimal('0.00'))
+            # Usamos update_fields para actualizar solo los campos calculados
+            factura.save(update_fields=['total', 'subtotal', 'iva', 'num_items'])
             
-            # Si el total ha cambiado, actualizar y guardar la factura
-            if factura.total != total_final:
-                factura.total = total_final
-                # Usamos update_fields para actualizar solo el campo necesario
-                factura.save(update_fields=['total'])
+            # 3. Las líneas pudieron cambiar: borrar el PDF guardado de la versión anterior
+            invalidar_pdf_factura(factura)
+            
+            # 4. Recalcular el día de la factura en el rollup de ventas
+            recalcular_dias([dia_de(factura.fecha)])
+    
+    def delete_model(self, request, obj):
+        dia = dia_de(obj.fecha)
+        super().delete_model(request, obj)
+        recalcular_dias([dia])
+    
+    def delete_queryset(self, request, queryset):
+        dias = {dia_de(fecha) for fecha in queryset.values_list('fecha', flat=True)}
+        super().delete_queryset(request, queryset)
+        recalcular_dias(dias)
     # --------------------------------------------------------
     
+    def get_queryset(self, request):
+        # Cliente en la misma consulta del listado; subtotal, IVA e ítems
+        # son columnas de la propia factura.
+        return super().get_queryset(request).select_related('cliente')
+    
+    @admin.action(description='🗜️ Descargar PDFs seleccionados (ZIP)')
+    def exportar_pdfs_zip(self, request, queryset):
+        fecha = timezone.now().strftime('%Y%m%d_%H%M')
+        return respuesta_zip_facturas(queryset, f"Facturas_{fecha}.zip")
+    
     def numero_orden_display(self, obj):
         orden = f"ORD-{obj.id:06d}"
         return format_html(
@@ -439,34 +476,23 @@ class FacturaAdmin(admin.ModelAdmin):
     
     # Nuevo: Mostrar Subtotal sin IVA
     def subtotal_sin_iva_formateado(self, obj):
-        # Recalcular el subtotal total (suma de subtotales) para la visualización
-        subtotal_total = obj.detallefactura_set.aggregate(
-            subtotal_total=Sum('subtotal')
-        )['subtotal_total'] or Decimal('0.00')
-        
-        subtotal_formateado = f"€{subtotal_total.quantize(Decimal('0.00'))}"
+        subtotal_formateado = f"€{obj.subtotal.quantize(Decimal('0.00'))}"
         return format_html(
             '<span style="font-weight:400; font-size:14px; color:#555;">{}</span>',
             subtotal_formateado
         )
     subtotal_sin_iva_formateado.short_description = 'Subtotal (s/IVA)'
+    subtotal_sin_iva_formateado.admin_order_field = 'subtotal'
     
     # Nuevo: Mostrar IVA
     def iva_calculado_formateado(self, obj):
-        # Recalcular el subtotal total (suma de subtotales)
-        subtotal_total = obj.detallefactura_set.aggregate(
-            subtotal_total=Sum('subtotal')
-        )['subtotal_total'] or Decimal('0.00')
-        
-        # Calcular IVA: Subtotal Total * 0.15
-        iva = (subtotal_total * IVA_RATE).quantize(Decimal('0.00'))
-        
-        iva_formateado = f"€{iva}"
+        iva_formateado = f"€{obj.iva}"
         return format_html(
             '<span style="font-weight:400; font-size:14px; color:#F59E0B;">{}</span>',
             iva_formateado
         )
     iva_calculado_formateado.short_description = f'IVA ({IVA_RATE*100}%)'
+    iva_calculado_formateado.admin_order_field = 'iva'
     
     def total_formateado(self, obj):
         total = f"€{obj.total.quantize(Decimal('0.00'))}"
@@ -501,13 +527,14 @@ class FacturaAdmin(admin.ModelAdmin):
     metodo_pago_badge.short_description = 'Método de Pago'
     
     def items_count(self, obj):
-        count = obj.detallefactura_set.count()
+        count = obj.num_items
         return format_html(
             '<span style="background-color:#6B7280; color:white; padding:4px 10px; '
             'border-radius:12px; font-size:11px; font-weight:600;">{} items</span>',
             count
         )
     items_count.short_description = 'Productos'
+    items_count.admin_order_field = 'num_items'
     
     def ver_pdf_button(self, obj):
         # Asume que 'admin_factura_pdf' está definido en tus urls
@@ -524,7 +551,9 @@ class FacturaAdmin(admin.ModelAdmin):
     ver_pdf_button.short_description = 'Acciones'
 
 # ==================== DETALLE FACTURA ====================
-# Este DetalleFacturaAdmin se mantiene para la vista de lista/cambio si se accede directamente.
+# Este DetalleFacturaAdmin se mantiene para consultar las líneas si se accede directamente.
+# Es de solo lectura: las líneas se editan desde su factura, que recalcula
+# total/IVA/ítems, borra el PDF guardado y recalcula el rollup del día.
 @admin.register(DetalleFactura)
 class DetalleFacturaAdmin(admin.ModelAdmin):
     list_display = [
@@ -542,17 +571,30 @@ class DetalleFacturaAdmin(admin.ModelAdmin):
         'factura__id',
     ]
     readonly_fields = ['subtotal', 'precio_unitario'] # ¡De solo lectura!
-    ordering = ['-factura__fecha']
+    # Factura, producto y marca en la misma consulta del listado
+    list_select_related = ['factura', 'producto__marca']
+    # factura_id e id desempatan: orden estable y servido por detalle_factura_id_idx
+    ordering = ['-factura__fecha', '-factura_id', '-id']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
     
     def factura_numero(self, obj):
-        orden = f"ORD-{obj.factura.id:06d}"
+        orden = f"ORD-{obj.factura_id:06d}"
         return format_html(
             '<a href="/admin/perfume_api/factura/{}/change/" style="font-family:monospace; '
             'font-weight:700; color:#3B82F6; text-decoration:none;">{}</a>',
-            obj.factura.id,
+            obj.factura_id,
             orden
         )
     factura_numero.short_description = 'Factura'
+    factura_numero.admin_order_field = 'factura_id'
     
     def producto_info(self, obj):
         # Usamos el precio original del producto para mostrar.
@@ -633,4 +675,44 @@ class PasswordResetCodeAdmin(admin.ModelAdmin):
             '<span style="background-color:#10B981; color:white; padding:4px 12px; '
             'border-radius:12px; font-size:11px; font-weight:600;">ACTIVO</span>'
         )
-    estado_badge.short_description = 'Estado'
\ No newline at end of file
+    estado_badge.short_description = 'Estado'
+
+# ==================== BANDEJA DE SALIDA DE CORREOS ====================
+@admin.register(CorreoSaliente)
+class CorreoSalienteAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'destinatario',
+        'asunto_display',
+        'canal',
+        'estado_badge',
+        'intentos',
+        'created_at',
+        'enviado_at',
+    ]
+    list_filter = ['estado', 'canal']
+    search_fields = ['destinatario', 'asunto']
+    readonly_fields = ['created_at', 'enviado_at', 'ultimo_error']
+    ordering = ['-created_at']
+    
+    def asunto_display(self, obj):
+        if obj.factura_id:
+            return f"Factura ORD-{obj.factura_id:06d}"
+        return obj.asunto or '-'
+    asunto_display.short_description = 'Asunto'
+    
+    def estado_badge(self, obj):
+        colores = {
+            'pendiente': '#F59E0B',
+            'enviando': '#3B82F6',
+            'enviado': '#10B981',
+            'fallido': '#EF4444',
+        }
+        color = colores.get(obj.estado, '#6B7280')
+        return format_html(
+            '<span style="background-color:{}; color:white; padding:4px 12px; '
+            'border-radius:12px; font-size:11px; font-weight:600; text-transform:uppercase;">{}</span>',
+            color,
+            obj.estado
+        )
+    estado_badge.short_description = 'Estado'
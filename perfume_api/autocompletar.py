@@ -0,0 +1,392 @@
+# perfume_api/autocompletar.py
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.db import connections
+from django.utils import timezone
+
+from .busqueda import sin_acentos
+from .cache import version_marcas, version_productos
+from .models import Marca, Producto
+
+
+# ======================================================
+# 🔹 AUTOCOMPLETADO EN MEMORIA (marcas y productos)
+# ======================================================
+# Cada worker guarda los nombres ordenados (prefijos con bisect), los ids por
+# palabra y, sobre el vocabulario, trigramas y variantes con una letra menos
+# para corregir errores de tipeo. Responder no toca la base de datos: solo
+# se consulta cuando se crea, edita o borra un producto o una marca (no en
+# cada venta, que solo cambia el stock), y entonces solo se leen los
+# productos modificados desde la última sincronización.
+
+LIMITE_AUTOCOMPLETAR = 8
+LIMITE_AUTOCOMPLETAR_MAX = 20
+# Similitud mínima (la de pg_trgm) para corregir una palabra mal escrita
+# cuando ningún nombre empieza por lo escrito ("suavage" → "sauvage")
+UMBRAL_TRIGRAMAS = 0.3
+CANDIDATAS_TRIGRAMAS = 20
+# Se releen también los productos modificados un poco antes de la última
+# sincronización: una transacción puede confirmarse después de fijar updated_at
+MARGEN_SINCRONIZACION = timedelta(minutes=5)
+
+# Consultas de varias palabras: candidatos que se revisan uno por uno antes
+# de pasar a intersectar conjuntos, y máximo de candidatos para intersectar
+RECORRIDO_MAXIMO = 200
+MAX_CANDIDATOS = 5000
+
+
+def normalizar(texto):
+    """Palabras en minúsculas y sin acentos."""
+    return re.findall(r"\w+", sin_acentos(texto or "").lower())
+
+
+def trigramas(palabras):
+    """Trigramas como los de pg_trgm: cada palabra con dos espacios delante y uno detrás."""
+    resultado = set()
+    for palabra in palabras:
+        relleno = f"  {palabra} "
+        resultado.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return resultado
+
+
+def borrados(palabra):
+    """La palabra y sus variantes con una letra menos ("bleu" → bleu, leu, beu, blu, ble)."""
+    return {palabra} | {palabra[:i] + palabra[i + 1:] for i in range(len(palabra))}
+
+
+def _rango(lista, prefijo):
+    """Posiciones [inicio, fin) de las entradas (texto, id) de `lista` cuyo texto empieza por `prefijo`."""
+    return bisect_left(lista, (prefijo,)), bisect_left(lista, (prefijo + "\uffff",))
+
+
+def _con_prefijo(palabras, prefijo):
+    """Palabras de la lista ordenada `palabras` que empiezan por `prefijo`."""
+    return palabras[bisect_left(palabras, prefijo):bisect_left(palabras, prefijo + "\uffff")]
+
+
+def _quitar_ordenado(lista, entrada):
+    i = bisect_left(lista, entrada)
+    if i < len(lista) and lista[i] == entrada:
+        del lista[i]
+
+
+class IndiceNombres:
+    """Nombres de un tipo de objeto (marcas o productos) indexados por prefijo y por trigramas."""
+
+    def __init__(self, filas=()):
+        """`filas`: iterable de (id, nombre)."""
+        self.nombres = {}
+        self.palabras = {}
+        self.por_nombre = []                # (nombre normalizado, id), ordenada
+        self.por_palabra = defaultdict(set)  # palabra → ids
+        self.vocabulario = []               # palabras distintas, ordenada
+        # Los trigramas son de las palabras distintas, no de cada nombre: el
+        # vocabulario es mucho más chico que el catálogo
+        self.por_trigrama = defaultdict(set)
+        self.num_trigramas = {}
+        # Variante con una letra borrada → palabras (corrección a una edición)
+        self.por_borrado = defaultdict(set)
+        for objeto_id, nombre in filas:
+            palabras = self._registrar(objeto_id, nombre)
+            self.por_nombre.append((" ".join(palabras), objeto_id))
+        # Ordenar una vez al final es mucho más rápido que insertar en orden
+        self.por_nombre.sort()
+        self.vocabulario = sorted(self.por_palabra)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def _registrar(self, objeto_id, nombre):
+        palabras = normalizar(nombre)
+        self.nombres[objeto_id] = nombre
+        self.palabras[objeto_id] = palabras
+        for palabra in palabras:
+            if palabra not in self.por_palabra:
+                propios = trigramas([palabra])
+                self.num_trigramas[palabra] = len(propios)
+                for trigrama in propios:
+                    self.por_trigrama[trigrama].add(palabra)
+                for variante in borrados(palabra):
+                    self.por_borrado[variante].add(palabra)
+            self.por_palabra[palabra].add(objeto_id)
+        return palabras
+
+    def agregar(self, objeto_id, nombre):
+        """Alta o cambio de nombre (no hace nada si el nombre no cambió)."""
+        if self.nombres.get(objeto_id) == nombre:
+            return
+        self.quitar(objeto_id)
+        nuevas = [p for p in normalizar(nombre) if p not in self.por_palabra]
+        palabras = self._registrar(objeto_id, nombre)
+        insort(self.por_nombre, (" ".join(palabras), objeto_id))
+        for palabra in set(nuevas):
+            insort(self.vocabulario, palabra)
+
+    def quitar(self, objeto_id):
+        if objeto_id not in self.nombres:
+            return
+        del self.nombres[objeto_id]
+        palabras = self.palabras.pop(objeto_id)
+        _quitar_ordenado(self.por_nombre, (" ".join(palabras), objeto_id))
+        for palabra in set(palabras):
+            ids = self.por_palabra[palabra]
+            ids.discard(objeto_id)
+            if ids:
+                continue
+            # Era el último nombre con esta palabra: sale del vocabulario
+            del self.por_palabra[palabra]
+            del self.num_trigramas[palabra]
+            _quitar_ordenado(self.vocabulario, palabra)
+            for trigrama in trigramas([palabra]):
+                self.por_trigrama[trigrama].discard(palabra)
+                if not self.por_trigrama[trigrama]:
+                    del self.por_trigrama[trigrama]
+            for variante in borrados(palabra):
+                self.por_borrado[variante].discard(palabra)
+                if not self.por_borrado[variante]:
+                    del self.por_borrado[variante]
+
+    def completar(self, palabras, limite):
+        """Ids cuyos nombres completan `palabras` (ya normalizadas), como mucho `limite`."""
+        if not palabras:
+            return []
+
+        # 1. Nombres que empiezan por lo escrito, en orden alfabético
+        inicio, fin = _rango(self.por_nombre, " ".join(palabras))
+        encontrados = [objeto_id for _, objeto_id in self.por_nombre[inicio:min(fin, inicio + limite)]]
+        if len(encontrados) == limite:
+            return encontrados
+        vistos = set(encontrados)
+
+        # 2. Nombres en los que cada palabra escrita empieza alguna de sus
+        # palabras ("sauv" → "Dior Sauvage"). Se parte de la palabra escrita
+        # que menos nombres completa.
+        grupos = []
+        for palabra in palabras:
+            vocabulario = _con_prefijo(self.vocabulario, palabra)
+            conjuntos = [self.por_palabra[p] for p in vocabulario]
+            grupos.append((sum(map(len, conjuntos)), conjuntos, set(vocabulario)))
+        grupos.sort(key=lambda grupo: grupo[0])
+        (total, guia, _), otras = grupos[0], grupos[1:]
+
+        # Se recorren los candidatos por orden alfabético de palabra hasta
+        # llenar el límite. Si hay varias palabras y tras unos cientos todavía
+        # falta, casi nadie las tiene todas: el resto se filtra con
+        # operaciones de conjuntos en vez de uno por uno.
+        pendientes = (objeto_id for ids in guia for objeto_id in ids)
+        recorrer = islice(pendientes, RECORRIDO_MAXIMO) if otras and total <= MAX_CANDIDATOS else pendientes
+        vocabularios = [completan for _, _, completan in otras]
+        for objeto_id in recorrer:
+            if objeto_id in vistos:
+                continue
+            vistos.add(objeto_id)
+            propias = self.palabras[objeto_id]
+            for completan in vocabularios:
+                if completan.isdisjoint(propias):
+                    break
+            else:
+                encontrados.append(objeto_id)
+                if len(encontrados) == limite:
+                    return encontrados
+        if recorrer is pendientes:
+            return encontrados
+
+        # Para cada otra palabra se elige la forma más barata de filtrar
+        # (costos relativos medidos: unir ≈ 1 por id, cada candidato ≈ 5,
+        # cada conjunto ≈ 25)
+        candidatos = set().union(*guia) - vistos
+        for total_otra, conjuntos, completan in otras:
+            if not candidatos:
+                break
+            unir = total_otra
+            por_candidato = len(candidatos) * 5
+            por_conjunto = len(conjuntos) * 25 + sum(min(len(ids), len(candidatos)) for ids in conjuntos)
+            if unir <= min(por_candidato, por_conjunto):
+                candidatos &= set().union(*conjuntos)
+            elif por_candidato <= por_conjunto:
+                candidatos = {c for c in candidatos if not completan.isdisjoint(self.palabras[c])}
+            else:
+                candidatos = set().union(*(candidatos & ids for ids in conjuntos))
+        encontrados.extend(sorted(candidatos)[:limite - len(encontrados)])
+        return encontrados
+
+    def corregir(self, palabra):
+        """La palabra del vocabulario más parecida a `palabra` (o None si ninguna se parece)."""
+        if _con_prefijo(self.vocabulario, palabra):
+            return palabra
+        if len(palabra) < 3:
+            return None
+        return self._a_una_edicion(palabra) or self._parecida_por_trigramas(palabra)
+
+    def _parecida_por_trigramas(self, palabra):
+        buscados = trigramas([palabra])
+        comunes = Counter()
+        for trigrama in buscados:
+            comunes.update(self.por_trigrama.get(trigrama, ()))
+        mejor, mejor_puntaje = None, (UMBRAL_TRIGRAMAS, 0)
+        # La más parecida está entre las que más trigramas comparten
+        for candidata, n in comunes.most_common(CANDIDATAS_TRIGRAMAS):
+            # Similitud de pg_trgm: trigramas en común / trigramas entre las dos
+            similitud = n / (len(buscados) + self.num_trigramas[candidata] - n)
+            puntaje = (similitud, len(self.por_palabra[candidata]))
+            if puntaje >= mejor_puntaje:
+                mejor, mejor_puntaje = candidata, puntaje
+        return mejor
+
+    def _a_una_edicion(self, palabra):
+        """
+        Palabra del vocabulario a una letra de distancia (sobra, falta, cambia
+        o se intercambia una): comparten alguna variante con una letra borrada.
+        En palabras cortas es lo único que funciona: un error cambia casi todos
+        sus trigramas ("belu" / "bleu").
+        """
+        cercanas = set().union(*(self.por_borrado.get(variante, ()) for variante in borrados(palabra)))
+        return max(cercanas, key=lambda p: (len(self.por_palabra[p]), p), default=None)
+
+
+class IndiceAutocompletar:
+    def __init__(self, marcas=(), productos=()):
+        """`marcas`: iterable de (id, nombre); `productos`: de (id, nombre, marca_id)."""
+        self.marca_de = {}
+        self.marcas = IndiceNombres(marcas)
+        self.productos = IndiceNombres(self._con_marca(productos))
+
+    def _con_marca(self, productos):
+        for producto_id, nombre, marca_id in productos:
+            self.marca_de[producto_id] = marca_id
+            yield producto_id, nombre
+
+    def sincronizar_marcas(self, marcas):
+        """Deja las marcas igual que `marcas` (son pocas: se comparan todas)."""
+        actuales = dict(marcas)
+        for marca_id in [m for m in self.marcas.nombres if m not in actuales]:
+            self.marcas.quitar(marca_id)
+        for marca_id, nombre in actuales.items():
+            self.marcas.agregar(marca_id, nombre)
+
+    def agregar_producto(self, producto_id, nombre, marca_id):
+        self.marca_de[producto_id] = marca_id
+        self.productos.agregar(producto_id, nombre)
+
+    def quitar_producto(self, producto_id):
+        self.marca_de.pop(producto_id, None)
+        self.productos.quitar(producto_id)
+
+    def buscar(self, texto, limite=LIMITE_AUTOCOMPLETAR):
+        palabras = normalizar(texto)
+        marcas = self.marcas.completar(palabras, limite)
+        productos = self.productos.completar(palabras, limite)
+
+        if not marcas and not productos and palabras:
+            # Nada empieza así: se corrigen las palabras mal escritas y se reintenta
+            for indice, encontrados in ((self.marcas, marcas), (self.productos, productos)):
+                corregidas = [indice.corregir(palabra) for palabra in palabras]
+                if None not in corregidas and corregidas != palabras:
+                    encontrados.extend(indice.completar(corregidas, limite))
+
+        return {
+            "marcas": [{"id": marca_id, "nombre": self.marcas.nombres[marca_id]} for marca_id in marcas],
+            "productos": [self._producto(producto_id) for producto_id in productos],
+        }
+
+    def _producto(self, producto_id):
+        marca_id = self.marca_de.get(producto_id)
+        return {
+            "id": producto_id,
+            "nombre": self.productos.nombres[producto_id],
+            "marca_id": marca_id,
+            "marca": self.marcas.nombres.get(marca_id),
+        }
+
+
+# ======================================================
+# 🔹 ÍNDICE DEL WORKER
+# ======================================================
+
+_indice = None
+_version = None
+_marca_agua = None
+# Uno evita sincronizar dos veces a la vez; el otro impide leer el índice
+# mientras se le aplican cambios (solo se retiene durante microsegundos)
+_lock_sincronizacion = threading.Lock()
+_lock_indice = threading.Lock()
+
+
+def _sincronizar(version):
+    global _indice, _version, _marca_agua
+    ahora = timezone.now()
+    marcas = list(Marca.objects.values_list("id", "nombre"))
+
+    if _indice is None:
+        productos = Producto.objects.values_list("id", "nombre", "marca_id").iterator(chunk_size=2000)
+        _indice = IndiceAutocompletar(marcas, productos)
+    else:
+        cambiados = list(
+            Producto.objects
+            .filter(updated_at__gte=_marca_agua - MARGEN_SINCRONIZACION)
+            .values_list("id", "nombre", "marca_id")
+        )
+        total = Producto.objects.count()
+        with _lock_indice:
+            _indice.sincronizar_marcas(marcas)
+            for fila in cambiados:
+                _indice.agregar_producto(*fila)
+
+        # Si sobran productos es que hubo bajas: se quitan los que ya no existen
+        if len(_indice.productos) != total:
+            existentes = set(Producto.objects.values_list("id", flat=True))
+            with _lock_indice:
+                for producto_id in [p for p in _indice.productos.nombres if p not in existentes]:
+                    _indice.quitar_producto(producto_id)
+
+    _version = version
+    _marca_agua = ahora
+
+
+def indice_autocompletar():
+    """Índice del worker, puesto al día si cambiaron los productos o las marcas."""
+    version = (version_productos(), version_marcas())
+    if version != _version:
+        with _lock_sincronizacion:
+            if version != _version:
+                _sincronizar(version)
+    return _indice
+
+
+def autocompletar(texto, limite=LIMITE_AUTOCOMPLETAR):
+    """Sugerencias {marcas, productos} para lo que el usuario lleva escrito."""
+    indice = indice_autocompletar()
+    with _lock_indice:
+        return indice.buscar(texto, limite)
+
+
+def calentar_autocompletar():
+    """
+    Construye el índice para que la primera petición no espere. Si la base
+    no responde (o aún no está migrada) solo avisa: el índice se construirá
+    en la primera petición de autocompletado.
+    """
+    try:
+        indice_autocompletar()
+    except Exception as e:
+        print(f"⚠️ No se pudo precargar el autocompletado: {str(e)}")
+
+
+def _calentar_en_hilo():
+    try:
+        calentar_autocompletar()
+    finally:
+        # El hilo abrió sus propias conexiones a la base de datos
+        connections.close_all()
+
+
+def calentar_autocompletar_en_segundo_plano():
+    """Precarga el índice en un hilo: el arranque del worker nunca espera a la base."""
+    hilo = threading.Thread(target=_calentar_en_hilo, name="calentar-autocompletar", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,187 @@
+# perfume_api/busqueda.py
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .cache import version_productos
+from .models import Producto
+
+
+# ======================================================
+# 🔹 BÚSQUEDA DE TEXTO COMPLETO EN POSTGRESQL
+# ======================================================
+# Configuración 'espanol_sin_acentos' (spanish + unaccent) e índice GIN
+# producto_busqueda_gin creados en la migración 0014. Es un índice de
+# expresión y no una columna tsvector: no hay nada que mantener al guardar
+# (ni triggers ni save()) y el esquema sigue igual en MySQL.
+
+CONFIG_BUSQUEDA = "espanol_sin_acentos"
+
+# Debe ser la MISMA expresión del índice producto_busqueda_gin para que
+# PostgreSQL lo use. El nombre pesa más (A) que la descripción (B).
+VECTOR_PRODUCTO = (
+    "setweight(to_tsvector('espanol_sin_acentos'::regconfig, coalesce({tabla}.nombre, '')), 'A') || "
+    "setweight(to_tsvector('espanol_sin_acentos'::regconfig, coalesce({tabla}.descripcion, '')), 'B')"
+)
+
+
+def _coincide_postgres(texto):
+    """Condición `vector @@ consulta` (la que resuelve el índice GIN)."""
+    vector = VECTOR_PRODUCTO.format(tabla=connection.ops.quote_name(Producto._meta.db_table))
+    consulta = f"websearch_to_tsquery('{CONFIG_BUSQUEDA}', %s)"
+    return RawSQL(f"{vector} @@ {consulta}", [texto], output_field=BooleanField())
+
+
+def _buscar_postgres(texto):
+    vector = VECTOR_PRODUCTO.format(tabla=connection.ops.quote_name(Producto._meta.db_table))
+    consulta = f"websearch_to_tsquery('{CONFIG_BUSQUEDA}', %s)"
+    return (
+        Producto.objects
+        .select_related("marca", "tipo")
+        .filter(_coincide_postgres(texto))
+        .annotate(relevancia=RawSQL(f"ts_rank_cd({vector}, {consulta})", [texto], output_field=FloatField()))
+        .order_by("-relevancia", "-id")
+    )
+
+
+# ======================================================
+# 🔹 ÍNDICE EN MEMORIA (MySQL / SQLite / tests)
+# ======================================================
+# Índice invertido término → {producto_id: peso}. Se reconstruye solo cuando
+# se crea, edita o borra un producto (version_productos); las ventas cambian
+# el stock pero no los textos, así que no lo invalidan.
+
+PESO_NOMBRE = 1.0
+PESO_DESCRIPCION = 0.4
+# Una palabra a medio escribir ("eleg") cuenta menos que la palabra completa
+FACTOR_PREFIJO = 0.5
+
+PALABRAS_VACIAS = {
+    "de", "del", "la", "las", "el", "los", "y", "e", "o", "u", "en", "con",
+    "para", "por", "un", "una", "unos", "unas", "al", "a", "su", "sus",
+}
+
+
+def sin_acentos(texto):
+    normalizado = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in normalizado if not unicodedata.combining(c))
+
+
+def terminos(texto):
+    """Términos normalizados: minúsculas, sin acentos, sin palabras vacías ni plurales en -s."""
+    resultado = []
+    for palabra in re.findall(r"\w+", sin_acentos(texto or "").lower()):
+        if palabra in PALABRAS_VACIAS:
+            continue
+        # Plural simple: "perfumes" → "perfume", "notas" → "nota". Solo se quita
+        # la "s" ("flores" → "flore"): "flor" la encuentra igual por prefijo.
+        if len(palabra) > 3 and palabra.endswith("s"):
+            palabra = palabra[:-1]
+        resultado.append(palabra)
+    return resultado
+
+
+class IndiceBusqueda:
+    def __init__(self, filas):
+        """`filas`: iterable de (id, nombre, descripcion)."""
+        self.pesos = defaultdict(dict)
+        for producto_id, nombre, descripcion in filas:
+            for termino in terminos(nombre):
+                self._sumar(termino, producto_id, PESO_NOMBRE)
+            for termino in terminos(descripcion):
+                self._sumar(termino, producto_id, PESO_DESCRIPCION)
+        self.vocabulario = sorted(self.pesos)
+
+    def _sumar(self, termino, producto_id, peso):
+        self.pesos[termino][producto_id] = self.pesos[termino].get(producto_id, 0) + peso
+
+    def _coincidencias(self, termino):
+        """Productos que contienen el término completo o una palabra que empieza por él."""
+        encontrados = {}
+        i = bisect_left(self.vocabulario, termino)
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(termino):
+            palabra = self.vocabulario[i]
+            factor = 1.0 if palabra == termino else FACTOR_PREFIJO
+            for producto_id, peso in self.pesos[palabra].items():
+                encontrados[producto_id] = max(encontrados.get(producto_id, 0), peso * factor)
+            i += 1
+        return encontrados
+
+    def buscar(self, texto):
+        """[(producto_id, relevancia)] de los productos con TODOS los términos, mejor primero."""
+        puntajes = None
+        for termino in terminos(texto):
+            encontrados = self._coincidencias(termino)
+            if puntajes is None:
+                puntajes = encontrados
+            else:
+                puntajes = {pid: puntajes[pid] + peso for pid, peso in encontrados.items() if pid in puntajes}
+            if not puntajes:
+                return []
+        return sorted((puntajes or {}).items(), key=lambda item: (-item[1], -item[0]))
+
+
+_indice = None
+_indice_version = None
+_indice_lock = threading.Lock()
+
+
+def indice_productos():
+    """Índice en memoria del catálogo actual (se reconstruye si cambió la versión)."""
+    global _indice, _indice_version
+    version = version_productos()
+    if _indice is None or _indice_version != version:
+        with _indice_lock:
+            if _indice is None or _indice_version != version:
+                filas = Producto.objects.values_list("id", "nombre", "descripcion").iterator()
+                _indice = IndiceBusqueda(filas)
+                _indice_version = version
+    return _indice
+
+
+class ResultadosEnMemoria:
+    """
+    Lista perezosa de productos ordenada por relevancia: el paginador
+    pide solo un tramo y solo esos productos se leen de la base de datos.
+    """
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def __getitem__(self, tramo):
+        ranking = self.ranking[tramo]
+        productos = Producto.objects.select_related("marca", "tipo").in_bulk([pid for pid, _ in ranking])
+        resultado = []
+        for producto_id, relevancia in ranking:
+            producto = productos.get(producto_id)
+            if producto is not None:
+                producto.relevancia = relevancia
+                resultado.append(producto)
+        return resultado
+
+
+# ======================================================
+# 🔹 PUNTO DE ENTRADA
+# ======================================================
+
+def buscar_productos(texto):
+    """Productos que coinciden con `texto`, de mayor a menor relevancia (con `.relevancia`)."""
+    if connection.vendor == "postgresql":
+        return _buscar_postgres(texto)
+    return ResultadosEnMemoria(indice_productos().buscar(texto))
+
+
+def filtro_busqueda(texto):
+    """Condición para filter(): productos que coinciden con `texto` (sin ordenar por relevancia)."""
+    if connection.vendor == "postgresql":
+        return Q(_coincide_postgres(texto))
+    return Q(id__in=[producto_id for producto_id, _ in indice_productos().buscar(texto)])
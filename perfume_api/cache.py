@@ -0,0 +1,230 @@
+# perfume_api/cache.py
+import hashlib
+import threading
+import time
+from calendar import timegm
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+# ======================================================
+# 🔹 CACHE DEL CATÁLOGO (Producto, Marca, Tipo)
+# ======================================================
+# Todas las claves del catálogo incluyen un número de versión. Cada escritura
+# sobre el catálogo incrementa la versión, de modo que las respuestas viejas
+# dejan de ser alcanzables al instante y expiran solas por TTL.
+
+CLAVE_VERSION_CATALOGO = "catalogo:version"
+# Solo altas, ediciones y bajas de productos (no las ventas, que solo tocan
+# el stock): de ella dependen los índices en memoria de nombres y descripciones.
+CLAVE_VERSION_PRODUCTOS = "catalogo:productos:version"
+# Solo altas, cambios de nombre y bajas de marcas (índice de autocompletado)
+CLAVE_VERSION_MARCAS = "catalogo:marcas:version"
+# Instante (epoch) de la última invalidación del catálogo: Last-Modified no
+# puede salir solo de updated_at, que no cambia al renombrar una marca o un
+# tipo ni al borrar un producto.
+CLAVE_MODIFICADO_CATALOGO = "catalogo:modificado"
+
+
+def _version(clave):
+    version = cache.get(clave)
+    if version is None:
+        # Partimos de un timestamp para no reutilizar versiones anteriores
+        # si la clave fue expulsada del cache.
+        cache.add(clave, int(time.time() * 1000), None)
+        version = cache.get(clave)
+    return version
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        _version(clave)
+        cache.incr(clave)
+
+
+def version_catalogo():
+    """Devuelve la versión actual del catálogo (la crea si no existe)."""
+    return _version(CLAVE_VERSION_CATALOGO)
+
+
+def version_productos():
+    """Versión que solo cambia cuando se crea, edita o borra un producto."""
+    return _version(CLAVE_VERSION_PRODUCTOS)
+
+
+def version_marcas():
+    """Versión que solo cambia cuando se crea, edita o borra una marca."""
+    return _version(CLAVE_VERSION_MARCAS)
+
+
+def modificado_catalogo():
+    """Instante (epoch) del último cambio del catálogo (ahora si se perdió la clave)."""
+    modificado = cache.get(CLAVE_MODIFICADO_CATALOGO)
+    if modificado is None:
+        # Sin registro no sabemos cuándo cambió: suponer ahora nunca da un 304 viejo
+        cache.add(CLAVE_MODIFICADO_CATALOGO, time.time(), None)
+        modificado = cache.get(CLAVE_MODIFICADO_CATALOGO)
+    return modificado
+
+
+def invalidar_catalogo():
+    """Incrementa la versión del catálogo y registra el instante del cambio."""
+    # Primero el instante: quien vea la versión nueva ve también la fecha nueva
+    cache.set(CLAVE_MODIFICADO_CATALOGO, time.time(), None)
+    _incrementar(CLAVE_VERSION_CATALOGO)
+
+
+def invalidar_productos():
+    """Incrementa la versión de los productos y la del catálogo."""
+    _incrementar(CLAVE_VERSION_PRODUCTOS)
+    invalidar_catalogo()
+
+
+def invalidar_marcas():
+    """Incrementa la versión de las marcas y la del catálogo."""
+    _incrementar(CLAVE_VERSION_MARCAS)
+    invalidar_catalogo()
+
+
+def invalidar_catalogo_al_confirmar(productos=False, marcas=False):
+    """
+    Invalida el catálogo cuando la transacción actual se confirme; con
+    `productos=True` o `marcas=True` también los índices en memoria que
+    dependen de sus nombres.
+    """
+    # Si se invalidara antes del COMMIT, otra petición podría cachear los
+    # datos viejos bajo la versión nueva.
+    if productos:
+        transaction.on_commit(invalidar_productos)
+    elif marcas:
+        transaction.on_commit(invalidar_marcas)
+    else:
+        transaction.on_commit(invalidar_catalogo)
+
+
+def clave_catalogo(request):
+    """Clave de cache para una petición GET del catálogo."""
+    url = request.build_absolute_uri()
+    resumen = hashlib.md5(url.encode("utf-8")).hexdigest()
+    return f"catalogo:{version_catalogo()}:{resumen}"
+
+
+def datos_catalogo(request, construir):
+    """Devuelve los datos cacheados para la petición o los construye."""
+    clave = clave_catalogo(request)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = construir()
+        cache.set(clave, datos, settings.CATALOGO_CACHE_TTL)
+    return datos
+
+
+# ======================================================
+# 🔹 GET CONDICIONALES (ETag / Last-Modified)
+# ======================================================
+
+def estado_productos(queryset):
+    """max(updated_at) y número de filas en una sola consulta agregada."""
+    return queryset.order_by().aggregate(ultima=Max("updated_at"), total=Count("id"))
+
+
+def respuesta_condicional(request, queryset, construir):
+    """
+    Responde 304 si el cliente ya tiene la versión actual de `queryset`;
+    si no, llama a `construir()` y añade ETag y Last-Modified a la respuesta.
+    Con Cache-Control: no-cache el cliente revalida siempre en vez de
+    suponer la respuesta fresca a partir de Last-Modified.
+
+    Last-Modified es el mayor entre updated_at y el último cambio del
+    catálogo: así también avanza al renombrar una marca o borrar un producto.
+
+    El ETag incluye la versión del catálogo (cambios de marca/tipo) y la URL
+    completa (filtros, cursor) además del estado agregado de los productos.
+    """
+    estado = estado_productos(queryset)
+    ultima = estado["ultima"]
+    firma = f"{version_catalogo()}|{request.get_full_path()}|{ultima}|{estado['total']}"
+    etag = '"%s"' % hashlib.sha1(firma.encode("utf-8")).hexdigest()
+    if ultima is not None and timezone.is_naive(ultima):
+        # Con USE_TZ=False updated_at está en hora local (America/Guayaquil), no en UTC
+        ultima = timezone.make_aware(ultima, timezone.get_current_timezone())
+    last_modified = int(modificado_catalogo())
+    if ultima is not None:
+        last_modified = max(last_modified, timegm(ultima.utctimetuple()))
+
+    respuesta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if respuesta is None:
+        respuesta = construir()
+
+    respuesta["ETag"] = etag
+    respuesta["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(respuesta, no_cache=True)
+    return respuesta
+
+
+# ======================================================
+# 🔹 CACHE CON REVALIDACIÓN EN SEGUNDO PLANO
+# ======================================================
+# Se guarda el valor junto con el instante en que deja de ser fresco.
+# Pasado ese instante se sigue sirviendo la copia vieja mientras un solo
+# proceso (el que obtiene el candado con cache.add) la recalcula en un hilo.
+
+def _recalcular(clave, construir, ttl, margen):
+    """Construye el valor y lo guarda con su nueva fecha de expiración."""
+    datos = construir()
+    cache.set(clave, {"datos": datos, "fresco_hasta": time.time() + ttl}, ttl + margen)
+    return datos
+
+
+def _recalcular_en_segundo_plano(clave, construir, ttl, margen, candado):
+    try:
+        _recalcular(clave, construir, ttl, margen)
+    except Exception as e:
+        print(f"❌ Error recalculando {clave}: {str(e)}")
+    finally:
+        cache.delete(candado)
+        # El hilo abrió sus propias conexiones a la base de datos
+        connections.close_all()
+
+
+def datos_con_revalidacion(clave, construir, ttl, margen, espera=5):
+    """
+    Devuelve `construir()` cacheado `ttl` segundos. Durante los `margen`
+    segundos siguientes se responde con el valor viejo y se recalcula en
+    segundo plano; nunca hay más de un cálculo a la vez por clave.
+    """
+    candado = f"{clave}:recalculando"
+    entrada = cache.get(clave)
+
+    if entrada is not None:
+        if entrada["fresco_hasta"] <= time.time() and cache.add(candado, 1, espera * 6):
+            threading.Thread(
+                target=_recalcular_en_segundo_plano,
+                args=(clave, construir, ttl, margen, candado),
+                daemon=True,
+            ).start()
+        return entrada["datos"]
+
+    # Sin copia en cache: calcula solo quien obtiene el candado; el resto
+    # espera un momento a que aparezca el valor antes de calcular por su cuenta.
+    if cache.add(candado, 1, espera * 6):
+        try:
+            return _recalcular(clave, construir, ttl, margen)
+        finally:
+            cache.delete(candado)
+
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        time.sleep(0.1)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada["datos"]
+    return construir()
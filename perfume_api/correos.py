@@ -0,0 +1,248 @@
+# perfume_api/correos.py
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .facturas_pdf import leer_pdf_factura
+from .models import CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+# Remitente por defecto de los correos transaccionales
+REMITENTE_SMTP = 'maisondeparfumsprofesional@gmail.com'
+
+# La API de Resend acepta hasta 100 correos por petición batch
+RESEND_MAX_LOTE = 100
+
+# Tiempo que un worker se reserva los correos que tomó. Si muere antes de
+# registrar el resultado, pasado este plazo otro worker los vuelve a tomar.
+PLAZO_ENVIO = timedelta(minutes=10)
+
+
+# ======================================================
+# 🔹 ENCOLAR CORREOS
+# ======================================================
+
+def encolar_correo(destinatario, asunto='', cuerpo='', cuerpo_html='', remitente='', canal='smtp', factura=None):
+    """
+    Deja un correo en la bandeja de salida. Si se llama dentro de una
+    transacción, el correo solo existe si la transacción se confirma.
+    """
+    return CorreoSaliente.objects.create(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo=cuerpo,
+        cuerpo_html=cuerpo_html,
+        remitente=remitente,
+        canal=canal,
+        factura=factura,
+    )
+
+
+def encolar_factura(factura):
+    """Encola la factura; el PDF se genera cuando el worker la envía."""
+    return encolar_correo(destinatario=factura.cliente.email, factura=factura)
+
+
+# ======================================================
+# 🔹 CONSTRUCCIÓN DE MENSAJES
+# ======================================================
+
+def texto_factura(factura):
+    """Asunto y cuerpo del correo de una factura"""
+    subject = f'Factura ORD-{factura.id:06d} - Maison Des Senteurs'
+    message = f"""
+Estimado/a {factura.cliente.nombre} {factura.cliente.apellido},
+
+Gracias por su compra en Maison Des Senteurs.
+
+Adjunto encontrará su factura correspondiente a la orden ORD-{factura.id:06d}.
+
+Detalles de la compra:
+- Total: ${factura.total:.2f}
+- Método de pago: {factura.metodo_pago.upper()}
+- Fecha: {factura.fecha.strftime('%d/%m/%Y %H:%M')}
+
+¡Esperamos volver a verle pronto!
+
+Atentamente,
+Maison Des Senteurs
+Perfumería de Lujo
+"""
+    return subject, message
+
+
+def construir_email(correo, connection=None):
+    """
+    Convierte un CorreoSaliente en EmailMessage (con el PDF adjunto si es factura)
+    """
+    asunto, cuerpo = correo.asunto, correo.cuerpo
+
+    pdf_content = None
+    if correo.factura_id:
+        asunto, cuerpo = texto_factura(correo.factura)
+        pdf_content = leer_pdf_factura(correo.factura)
+        if not pdf_content:
+            raise ValueError("No se pudo generar el PDF")
+
+    email = EmailMultiAlternatives(
+        subject=asunto,
+        body=cuerpo,
+        from_email=correo.remitente or REMITENTE_SMTP,
+        to=[correo.destinatario],
+        connection=connection,
+    )
+
+    if correo.cuerpo_html:
+        email.attach_alternative(correo.cuerpo_html, 'text/html')
+
+    if pdf_content:
+        email.attach(
+            f'Factura_ORD-{correo.factura.id:06d}.pdf',
+            pdf_content,
+            'application/pdf'
+        )
+
+    return email
+
+
+# ======================================================
+# 🔹 ENVÍO POR LOTES
+# ======================================================
+
+def _enviar_smtp(correos, connection):
+    """Envía cada correo por la conexión ya abierta; registra el estado de cada uno."""
+    for correo in correos:
+        try:
+            connection.send_messages([construir_email(correo, connection)])
+            _marcar_enviado(correo)
+        except Exception as e:
+            correo.registrar_fallo(e)
+            logger.error("❌ Error enviando correo a %s: %s", correo.destinatario, e)
+
+
+def _enviar_resend(correos):
+    """Envía los correos en peticiones batch a la API de Resend."""
+    # Import diferido: el SDK (y requests) solo se cargan si hay envíos por Resend
+    import resend
+    resend.api_key = settings.RESEND_API_KEY
+
+    for inicio in range(0, len(correos), RESEND_MAX_LOTE):
+        grupo = correos[inicio:inicio + RESEND_MAX_LOTE]
+        params = [
+            {
+                "from": correo.remitente or settings.DEFAULT_FROM_EMAIL,
+                "to": [correo.destinatario],
+                "subject": correo.asunto,
+                "html": correo.cuerpo_html or correo.cuerpo,
+            }
+            for correo in grupo
+        ]
+        try:
+            resend.Batch.send(params)
+            for correo in grupo:
+                _marcar_enviado(correo)
+        except Exception as e:
+            logger.error("❌ Error enviando lote a Resend: %s", e)
+            for correo in grupo:
+                correo.registrar_fallo(e)
+
+
+def _marcar_enviado(correo):
+    correo.estado = 'enviado'
+    correo.enviado_at = timezone.now()
+    correo.intentos += 1
+
+
+# ======================================================
+# 🔹 WORKER: PROCESAR LA BANDEJA DE SALIDA
+# ======================================================
+
+def tomar_pendientes(lote):
+    """
+    Reserva hasta `lote` correos pendientes cuyo reintento ya venció (o cuya
+    reserva anterior caducó): los marca 'enviando' con un plazo y confirma.
+
+    Las filas se bloquean con SKIP LOCKED solo durante esta transacción
+    corta, para que varios workers no tomen el mismo correo.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Solo ids: con select_related la factura sería un LEFT JOIN y
+        # PostgreSQL no admite FOR UPDATE sobre el lado nullable
+        ids = list(
+            CorreoSaliente.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado__in=['pendiente', 'enviando'], siguiente_intento__lte=ahora)
+            .order_by('siguiente_intento')
+            .values_list('id', flat=True)[:lote]
+        )
+        if ids:
+            CorreoSaliente.objects.filter(id__in=ids).update(
+                estado='enviando',
+                siguiente_intento=ahora + PLAZO_ENVIO,
+            )
+
+    # Ya reservados: se leen con su factura fuera de la transacción
+    correos = CorreoSaliente.objects.select_related('factura__cliente').in_bulk(ids)
+    correos = [correos[correo_id] for correo_id in ids if correo_id in correos]
+    # En memoria siguen 'pendiente' hasta que el envío decida su estado
+    for correo in correos:
+        correo.estado = 'pendiente'
+    return correos
+
+
+def procesar_pendientes(lote=50):
+    """
+    Envía hasta `lote` correos pendientes usando una sola conexión SMTP (y
+    peticiones batch para Resend) para todo el lote.
+
+    Devuelve un dict con `enviados`, `fallidos` y `segundos`.
+
+    Los correos se reservan y se confirma antes de enviar: la red (SMTP,
+    Resend) nunca corre con una transacción abierta ni con filas bloqueadas.
+    """
+    inicio = time.monotonic()
+
+    correos = tomar_pendientes(lote)
+
+    if correos:
+        # Sin API key de Resend (desarrollo, tests) todo sale por EMAIL_BACKEND
+        usar_resend = bool(settings.RESEND_API_KEY)
+        por_resend = [c for c in correos if usar_resend and c.canal == 'resend']
+        por_smtp = [c for c in correos if not (usar_resend and c.canal == 'resend')]
+
+        if por_smtp:
+            connection = get_connection()
+            try:
+                connection.open()
+                _enviar_smtp(por_smtp, connection)
+            except Exception as e:
+                # No se pudo abrir la conexión: reintentar todo el grupo
+                logger.error("❌ Error conectando al servidor de correo: %s", e)
+                for correo in por_smtp:
+                    if correo.estado == 'pendiente':
+                        correo.registrar_fallo(e)
+            finally:
+                connection.close()
+
+        if por_resend:
+            _enviar_resend(por_resend)
+
+        # Resultado de cada correo: enviado, reintento programado o fallido
+        CorreoSaliente.objects.bulk_update(
+            correos,
+            ['estado', 'intentos', 'siguiente_intento', 'ultimo_error', 'enviado_at'],
+        )
+
+    enviados = sum(1 for c in correos if c.estado == 'enviado')
+    return {
+        'enviados': enviados,
+        'fallidos': len(correos) - enviados,
+        'segundos': time.monotonic() - inicio,
+    }
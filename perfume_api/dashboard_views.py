@@ -1,118 +1,185 @@
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import re
+from datetime import timedelta
 from decimal import Decimal
-from plotly.offline import plot
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncDate
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import NullIf
 from django.utils import timezone
-from .models import Producto, Factura, Cliente
-
-# --- Función para generar gráficos ---
-def generate_plotly_plot(df, plot_type, x, y, title, colors_list=None, labels=None):
-    """Genera gráficos Plotly robustos que se ven incluso con 1 solo dato."""
-    
-    div_id = "plot_" + re.sub(r'\W+', '', title).lower()
-    
-    # Configuración básica del Layout para que se vea bien integrado
-    layout_config = dict(
-        template='plotly_white',
-        margin=dict(l=40, r=20, t=60, b=40),
-        title=dict(
-            text=title,
-            font=dict(size=18, color='#333', family="Segoe UI, sans-serif")
-        ),
-        font=dict(color='#555'),
-        paper_bgcolor='rgba(0,0,0,0)', # Fondo transparente
-        plot_bgcolor='rgba(0,0,0,0)',
-        height=450, # Altura forzada desde Python
-        xaxis=dict(showgrid=False, showline=True, linewidth=1, linecolor='#ddd'),
-        yaxis=dict(showgrid=True, gridcolor='#f0f0f0'),
-        hoverlabel=dict(bgcolor="white", font_size=13)
-    )
+from .models import Producto, Cliente, DetalleFactura, VentaDiaria
+from .cache import datos_con_revalidacion
+from .ventas import dia_de, inicio_dia
 
-    if df.empty:
-        fig = go.Figure()
-        fig.add_annotation(text="Sin datos disponibles", showarrow=False, font=dict(size=16, color="#999"))
-        fig.update_layout(**layout_config)
-    else:
-        # Definir colores
-        colors = colors_list if colors_list else ['#667eea']
-        
-        # Crear el gráfico
-        fig = px.line(df, x=x, y=y, labels=labels, color_discrete_sequence=colors)
-        
-        # ✅ CLAVE: 'lines+markers' asegura que se vea algo aunque sea 1 solo punto
-        fig.update_traces(mode='lines+markers', line=dict(width=3), marker=dict(size=10, line=dict(width=2, color='white')))
-        
-        # Efecto de área sombreada debajo de la línea (opcional, se ve moderno)
-        fig.update_traces(fill='tozeroy', fillcolor='rgba(102, 126, 234, 0.1)')
-        
-        fig.update_layout(**layout_config)
-    
-    # Generar el HTML del div (Sin incluir JS aquí para no duplicar)
-    plot_div = plot(fig, output_type='div', include_plotlyjs=False, auto_play=False, config={'responsive': True, 'displayModeBar': False})
-    
-    # Inyectar el ID correcto
-    plot_div = re.sub(r'id="[^"]+"', f'id="{div_id}"', plot_div, count=1)
-    
-    return plot_div
+# Ventanas (en días) que se pueden pedir para la analítica, y tamaño del top
+VENTANAS_ANALITICA = (7, 30, 90, 365)
+TOP_ANALITICA = 10
 
-@staff_member_required
-def custom_dashboard(request):
+# --- Métricas del dashboard ---
+# Solo consultas agregadas; el gráfico lo dibuja Plotly.js en el navegador,
+# así los workers no cargan pandas/plotly.
+def construir_metricas_dashboard():
+    """KPIs y serie de ventas diarias (JSON serializable, lo que se guarda en cache)."""
     # --- 1. MÉTRICAS ---
-    ventas_totales = Factura.objects.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    ordenes_totales = Factura.objects.count()
+    # Ventas y órdenes salen del rollup diario (una fila por día y método de
+    # pago), no de recorrer todas las facturas.
+    resumen = VentaDiaria.objects.aggregate(ventas=Sum('total'), ordenes=Sum('ordenes'))
+    ventas_totales = resumen['ventas'] or Decimal('0.00')
+    ordenes_totales = resumen['ordenes'] or 0
     clientes_totales = Cliente.objects.count()
     productos_total = Producto.objects.count()
     # Productos agotados
     productos_agotados = Producto.objects.filter(stock__lte=0).count()
-    
+
     # Ticket promedio
     if ordenes_totales > 0:
         ticket_promedio = ventas_totales / ordenes_totales
     else:
         ticket_promedio = Decimal('0.00')
 
-    # --- 2. GRÁFICO: Ventas Diarias ---
-    plot_ventas_diarias = None
+    # --- 2. SERIE: Ventas Diarias (últimos 30 días) ---
+    hace_30_dias = dia_de(timezone.now()) - timedelta(days=30)
+    ventas_qs = VentaDiaria.objects.filter(fecha__gte=hace_30_dias)\
+        .values('fecha')\
+        .annotate(total=Sum('total'))\
+        .order_by('fecha')
+
+    # Decimales como texto (igual que la API REST) para no perder precisión
+    return {
+        'kpis': {
+            'ventas_totales': str(ventas_totales.quantize(Decimal('0.00'))),
+            'ordenes_totales': ordenes_totales,
+            'ticket_promedio': str(ticket_promedio.quantize(Decimal('0.00'))),
+            'clientes_totales': clientes_totales,
+            'productos_total': productos_total,
+            'productos_agotados': productos_agotados,
+        },
+        'ventas_diarias': [
+            {'fecha': fila['fecha'].isoformat(), 'total': str(fila['total'].quantize(Decimal('0.00')))}
+            for fila in ventas_qs
+        ],
+    }
+
+def obtener_metricas_dashboard():
+    # Se cachean: si están vencidas se sirven las anteriores mientras un
+    # solo proceso las recalcula en segundo plano.
+    return datos_con_revalidacion(
+        'dashboard:metricas',
+        construir_metricas_dashboard,
+        ttl=settings.DASHBOARD_CACHE_TTL,
+        margen=settings.DASHBOARD_CACHE_MARGEN,
+    )
+
+# --- Analítica por ventana de tiempo ---
+# Todo se agrupa en SQL (GROUP BY + ORDER BY + LIMIT); Python solo da formato
+# a unas pocas filas ya agregadas.
+def _dinero(valor):
+    return str((valor or Decimal('0.00')).quantize(Decimal('0.00')))
+
+def construir_analitica_dashboard(dias):
+    """Top productos/marcas, mix de métodos de pago y ventas por género de los últimos `dias`."""
+    desde = dia_de(timezone.now()) - timedelta(days=dias)
+    # Rango sobre factura.fecha (no fecha__date) para poder usar el índice
+    lineas = DetalleFactura.objects.filter(factura__fecha__gte=inicio_dia(desde))
+
+    # Ingresos de una línea: su parte del total de la factura (IVA incluido,
+    # la misma base que VentaDiaria y el mix de pago). Las líneas de la app
+    # guardan precios con IVA y las del admin sin IVA: sumarlas tal cual
+    # mezclaría las dos bases.
+    importe = F('precio_unitario') * F('cantidad')
+    importe_factura = DetalleFactura.objects.filter(factura=OuterRef('factura'))\
+        .order_by().values('factura').annotate(suma=Sum(importe)).values('suma')
+    ingresos = Sum(ExpressionWrapper(
+        importe * F('factura__total') / NullIf(Subquery(importe_factura), 0),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    ))
+
+    def top(campos):
+        return lineas.values(*campos)\
+            .annotate(ingresos=ingresos, unidades=Sum('cantidad'))\
+            .order_by('-ingresos', campos[0])[:TOP_ANALITICA]
+
+    def producto(fila):
+        return {
+            'id': fila['producto_id'],
+            'nombre': fila['producto__nombre'],
+            'marca': fila['producto__marca__nombre'],
+            'ingresos': _dinero(fila['ingresos']),
+            'unidades': fila['unidades'],
+        }
+
+    def marca(fila):
+        return {
+            'id': fila['producto__marca_id'],
+            'nombre': fila['producto__marca__nombre'],
+            'ingresos': _dinero(fila['ingresos']),
+            'unidades': fila['unidades'],
+        }
+
+    productos = ('producto_id', 'producto__nombre', 'producto__marca__nombre')
+    marcas = ('producto__marca_id', 'producto__marca__nombre')
+
+    # El mix de pago sale del rollup diario: no necesita tocar las facturas
+    metodos = VentaDiaria.objects.filter(fecha__gte=desde)\
+        .values('metodo_pago')\
+        .annotate(ingresos=Sum('total'), ordenes=Sum('ordenes'))\
+        .order_by('-ingresos')
+
+    generos = lineas.values('producto__genero')\
+        .annotate(ingresos=ingresos, unidades=Sum('cantidad'))\
+        .order_by('-ingresos')
+
+    return {
+        'dias': dias,
+        'desde': desde.isoformat(),
+        'top_productos_ingresos': [producto(fila) for fila in top(productos)],
+        'top_marcas_ingresos': [marca(fila) for fila in top(marcas)],
+        'metodos_pago': [
+            {'metodo_pago': fila['metodo_pago'], 'ingresos': _dinero(fila['ingresos']), 'ordenes': fila['ordenes']}
+            for fila in metodos
+        ],
+        'generos': [
+            {'genero': fila['producto__genero'], 'ingresos': _dinero(fila['ingresos']), 'unidades': fila['unidades']}
+            for fila in generos
+        ],
+    }
+
+@staff_member_required
+def dashboard_analitica(request):
+    """GET /api/admin/dashboard/analitica/?dias=30 → top productos/marcas, métodos de pago y géneros."""
     try:
-        # Traer datos de los últimos 30 días
-        hace_30_dias = timezone.now() - datetime.timedelta(days=30)
-        ventas_qs = Factura.objects.filter(fecha__gte=hace_30_dias)\
-            .annotate(dia=TruncDate('fecha'))\
-            .values('dia')\
-            .annotate(total=Sum('total'))\
-            .order_by('dia')
-        
-        df = pd.DataFrame(list(ventas_qs))
-        
-        if not df.empty:
-            # Convertir fechas correctamente
-            df['dia'] = pd.to_datetime(df['dia'])
-            # Formatear para el eje X
-            df['fecha_str'] = df['dia'].dt.strftime('%d %b')
-            
-            plot_ventas_diarias = generate_plotly_plot(
-                df, 'line', x='fecha_str', y='total',
-                title='Comportamiento de Ventas (30 Días)',
-                colors_list=['#3B82F6'], # Azul vibrante
-                labels={'fecha_str': 'Fecha', 'total': 'Ventas (€)'}
-            )
-    except Exception as e:
-        print(f"Error generando gráfico: {e}")
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        dias = None
+    if dias not in VENTANAS_ANALITICA:
+        return JsonResponse(
+            {'error': f"dias debe ser uno de {', '.join(map(str, VENTANAS_ANALITICA))}"},
+            status=400
+        )
+
+    return JsonResponse(datos_con_revalidacion(
+        f'dashboard:analitica:{dias}',
+        lambda: construir_analitica_dashboard(dias),
+        ttl=settings.DASHBOARD_CACHE_TTL,
+        margen=settings.DASHBOARD_CACHE_MARGEN,
+    ))
+
+@staff_member_required
+def dashboard_metricas(request):
+    """GET /api/admin/dashboard/metricas/ → KPIs y serie diaria en JSON."""
+    return JsonResponse(obtener_metricas_dashboard())
+
+@staff_member_required
+def custom_dashboard(request):
+    kpis = obtener_metricas_dashboard()['kpis']
 
     context = {
-        'ventas_totales': f"€{ventas_totales:,.2f}",
-        'ordenes_totales': ordenes_totales,
-        'ticket_promedio': f"€{ticket_promedio:,.2f}",
-        'clientes_totales': clientes_totales,
-        'productos_total': productos_total,
-        'productos_agotados': productos_agotados,
-        'plot_ventas_diarias': plot_ventas_diarias,
+        'ventas_totales': f"€{Decimal(kpis['ventas_totales']):,.2f}",
+        'ordenes_totales': kpis['ordenes_totales'],
+        'ticket_promedio': f"€{Decimal(kpis['ticket_promedio']):,.2f}",
+        'clientes_totales': kpis['clientes_totales'],
+        'productos_total': kpis['productos_total'],
+        'productos_agotados': kpis['productos_agotados'],
     }
-    
-    return render(request, 'admin/custom_dashboard.html', context)
\ No newline at end of file
+
+    return render(request, 'admin/custom_dashboard.html', context)
@@ -0,0 +1,423 @@
+# perfume_api/facturas_pdf.py
+import hashlib
+import io
+import json
+import multiprocessing
+import zipfile
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+
+# ======================================================
+# 🔹 FUNCIÓN: GENERAR PDF CON REPORTLAB
+# ======================================================
+
+def datos_pdf_factura(factura, detalles=None):
+    """
+    Copia en objetos simples (serializables con pickle) lo que necesita el PDF,
+    para poder dibujarlo en otro proceso sin tocar la base de datos.
+    """
+    if detalles is None:
+        detalles = factura.detallefactura_set.select_related('producto').order_by('id')
+    
+    cliente = factura.cliente
+    return SimpleNamespace(
+        id=factura.id,
+        total=factura.total,
+        subtotal=factura.subtotal,
+        iva=factura.iva,
+        fecha=factura.fecha,
+        metodo_pago=factura.metodo_pago,
+        cliente=SimpleNamespace(
+            nombre=cliente.nombre,
+            apellido=cliente.apellido,
+            email=cliente.email,
+            cedula=cliente.cedula,
+            celular=cliente.celular,
+            direccion=cliente.direccion,
+        ),
+        detalles=[
+            SimpleNamespace(
+                producto=SimpleNamespace(nombre=detalle.producto.nombre),
+                cantidad=detalle.cantidad,
+                precio_unitario=detalle.precio_unitario,
+                subtotal=detalle.subtotal,
+            )
+            for detalle in detalles
+        ],
+    )
+
+
+def renderizar_pdf_factura(factura):
+    """
+    Dibuja el PDF con ReportLab a partir de `datos_pdf_factura(...)`
+    """
+    # Desglose guardado en la factura (subtotal = total / 1.15, iva = total - subtotal)
+    total = factura.total
+    subtotal = factura.subtotal
+    iva = factura.iva
+    
+    # Configurar meses en español
+    meses = {
+        1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril',
+        5: 'mayo', 6: 'junio', 7: 'julio', 8: 'agosto',
+        9: 'septiembre', 10: 'octubre', 11: 'noviembre', 12: 'diciembre'
+    }
+    mes_texto = meses[factura.fecha.month]
+    fecha_formateada = f"{factura.fecha.day} de {mes_texto}, {factura.fecha.year}"
+    
+    # ✅ REPORTLAB: se importa al dibujar el primer PDF, no al arrancar el worker
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    
+    # Crear PDF
+    pdf_buffer = io.BytesIO()
+    c = canvas.Canvas(pdf_buffer, pagesize=letter)
+    width, height = letter
+    
+    # Header
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(width/2, height - 50, "MAISON DES SENTEURS")
+    c.setFont("Helvetica-Oblique", 12)
+    c.drawCentredString(width/2, height - 70, "Perfumería de Lujo")
+    
+    # Línea separadora
+    c.line(50, height - 90, width - 50, height - 90)
+    
+    # Información de factura
+    y = height - 130
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Factura No:")
+    c.setFont("Helvetica", 12)
+    c.drawString(150, y, f"ORD-{factura.id:06d}")
+    
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(400, y, "Fecha:")
+    c.setFont("Helvetica", 12)
+    c.drawString(450, y, fecha_formateada)
+    
+    # Cliente
+    y -= 50
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Cliente:")
+    c.setFont("Helvetica", 12)
+    c.drawString(110, y, f"{factura.cliente.nombre} {factura.cliente.apellido}")
+    
+    y -= 20
+    c.drawString(110, y, factura.cliente.email)
+    
+    if factura.cliente.cedula:
+        y -= 20
+        c.drawString(110, y, f"CI: {factura.cliente.cedula}")
+    
+    if factura.cliente.celular:
+        y -= 20
+        c.drawString(110, y, f"Tel: {factura.cliente.celular}")
+    
+    if factura.cliente.direccion:
+        y -= 20
+        c.drawString(110, y, f"Dir: {factura.cliente.direccion[:50]}")
+    
+    # Método de pago
+    y -= 30
+    metodo_pago_display = {
+        'wawallet': 'WaWallet',
+        'efectivo': 'Efectivo',
+        'tarjeta': 'Tarjeta de Crédito'
+    }.get(factura.metodo_pago, factura.metodo_pago.upper())
+    
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(400, y, "Método de Pago:")
+    c.setFont("Helvetica", 12)
+    c.drawString(500, y, metodo_pago_display)
+    
+    # Tabla de productos
+    y -= 50
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, "Detalle de Productos")
+    
+    y -= 30
+    # Headers de tabla
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, y, "Producto")
+    c.drawString(300, y, "Cantidad")
+    c.drawString(370, y, "Precio Unit.")
+    c.drawString(470, y, "Subtotal")
+    
+    # Línea bajo headers
+    c.line(50, y - 5, width - 50, y - 5)
+    
+    # Productos
+    y -= 25
+    c.setFont("Helvetica", 10)
+    for detalle in factura.detalles:
+        producto = detalle.producto
+        c.drawString(50, y, producto.nombre[:40])
+        c.drawString(300, y, str(detalle.cantidad))
+        c.drawString(370, y, f"${detalle.precio_unitario:.2f}")
+        c.drawString(470, y, f"${detalle.subtotal:.2f}")
+        y -= 20
+        
+        if y < 150:
+            c.showPage()
+            y = height - 100
+            c.setFont("Helvetica", 10)
+    
+    # Totales
+    y -= 30
+    c.line(350, y, width - 50, y)
+    y -= 25
+    
+    c.setFont("Helvetica", 12)
+    c.drawString(370, y, "Subtotal:")
+    c.drawString(470, y, f"${subtotal:.2f}")
+    
+    y -= 20
+    c.drawString(370, y, "IVA (15%):")
+    c.drawString(470, y, f"${iva:.2f}")
+    
+    y -= 20
+    c.line(350, y + 5, width - 50, y + 5)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(370, y - 10, "TOTAL:")
+    c.drawString(470, y - 10, f"${total:.2f}")
+    
+    # Footer
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawCentredString(width/2, 50, "Gracias por su compra en Maison Des Senteurs")
+    c.drawCentredString(width/2, 35, "Perfumería de Lujo")
+    
+    c.save()
+    pdf_buffer.seek(0)
+    return pdf_buffer.getvalue()
+
+
+def generar_pdf_factura(factura):
+    """
+    Genera un PDF de la factura con ReportLab
+    """
+    try:
+        return renderizar_pdf_factura(datos_pdf_factura(factura))
+        
+    except Exception as e:
+        print(f"❌ Error generando PDF: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+# ======================================================
+# 🔹 ALMACENAMIENTO DE PDFs (una vez por versión de factura)
+# ======================================================
+# Las facturas no cambian una vez emitidas: el PDF se genera una sola vez y
+# se guarda como `<factura_id>/<huella>.pdf`. La huella resume todo lo que
+# se dibuja (factura, cliente y líneas), así que si el admin cambia las líneas
+# o se corrigen los datos del cliente se genera un archivo nuevo y el anterior
+# se borra con `invalidar_pdf_factura`.
+
+def almacenamiento_pdf():
+    """Storage configurado en FACTURAS_PDF_STORAGE (por defecto, MEDIA_ROOT/facturas)."""
+    config = settings.FACTURAS_PDF_STORAGE
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+def huella_factura(factura, detalles=None):
+    """
+    Hash SHA-256 de todo lo que se dibuja en el PDF (lo que copia
+    `datos_pdf_factura`): fecha, totales, método de pago, datos del cliente
+    y líneas con el nombre del producto. Sin `detalles` (ordenados por id,
+    con su producto) hace una consulta para obtener las líneas.
+    """
+    datos = datos_pdf_factura(factura, detalles)
+    cliente = datos.cliente
+    contenido = [
+        [datos.fecha.isoformat(), datos.total, datos.subtotal, datos.iva, datos.metodo_pago],
+        [cliente.nombre, cliente.apellido, cliente.email, cliente.cedula, cliente.celular, cliente.direccion],
+    ]
+    contenido += [
+        [d.producto.nombre, d.cantidad, d.precio_unitario, d.subtotal] for d in datos.detalles
+    ]
+    # JSON y no "a|b": un "|" dentro de un nombre no puede producir la misma huella
+    return hashlib.sha256(
+        json.dumps(contenido, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def obtener_pdf_factura(factura):
+    """
+    Devuelve `(storage, nombre)` del PDF de la factura, generándolo solo si
+    no existe todavía. Devuelve `(storage, None)` si no se pudo generar.
+    """
+    storage = almacenamiento_pdf()
+    nombre = f"{factura.id}/{huella_factura(factura)}.pdf"
+
+    if not storage.exists(nombre):
+        pdf_content = generar_pdf_factura(factura)
+        if not pdf_content:
+            return storage, None
+        nombre = storage.save(nombre, ContentFile(pdf_content))
+
+    return storage, nombre
+
+
+def leer_pdf_factura(factura):
+    """Contenido (bytes) del PDF de la factura, usando el almacenado si existe."""
+    storage, nombre = obtener_pdf_factura(factura)
+    if nombre is None:
+        return None
+    with storage.open(nombre, 'rb') as archivo:
+        return archivo.read()
+
+
+def invalidar_pdf_factura(factura):
+    """Borra los PDFs de versiones anteriores de la factura."""
+    storage = almacenamiento_pdf()
+    vigente = f"{huella_factura(factura)}.pdf"
+    try:
+        _, archivos = storage.listdir(str(factura.id))
+    except FileNotFoundError:
+        return
+    for archivo in archivos:
+        if archivo != vigente:
+            storage.delete(f"{factura.id}/{archivo}")
+
+
+# ======================================================
+# 🔹 EXPORTACIÓN MASIVA: ZIP EN STREAMING
+# ======================================================
+
+class _SalidaZip:
+    """
+    Destino de escritura para `zipfile` que acumula solo la entrada actual.
+    No tiene `seek`, así que zipfile escribe en modo streaming.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _renderizar_seguro(datos):
+    """Igual que renderizar_pdf_factura pero devuelve None si falla (para el pool)."""
+    try:
+        return renderizar_pdf_factura(datos)
+    except Exception as e:
+        print(f"❌ Error generando PDF ORD-{datos.id:06d}: {str(e)}")
+        return None
+
+
+# Cada proceso del pool vuelve a importar Django y reportlab (spawn): como
+# mucho unos pocos por exportación, y solo si faltan bastantes PDFs por dibujar
+MAX_PROCESOS_PDF = 4
+MIN_PDFS_PARA_POOL = 8
+
+
+def zip_facturas(facturas, procesos=None, tamano_bloque=32):
+    """
+    Generador que produce un ZIP con el PDF de cada factura del queryset.
+
+    Las facturas se leen por bloques (con sus líneas precargadas). Los PDFs ya
+    guardados se reutilizan y los que faltan se dibujan (en un pool de procesos
+    si son muchos) y se guardan. Cada entrada se emite en cuanto se escribe, así
+    que la memoria no depende de la cantidad de facturas.
+    """
+    # Import local: los procesos hijos importan este módulo sin Django configurado
+    from .models import DetalleFactura
+
+    if procesos is None:
+        procesos = settings.FACTURAS_PDF_PROCESOS or min(multiprocessing.cpu_count(), MAX_PROCESOS_PDF)
+
+    storage = almacenamiento_pdf()
+    facturas = facturas.select_related('cliente').prefetch_related(
+        Prefetch(
+            'detallefactura_set',
+            queryset=DetalleFactura.objects.select_related('producto').order_by('id'),
+        )
+    ).order_by('id')
+
+    pool = None
+
+    def obtener_pool(faltantes):
+        """Pool para dibujar `faltantes` PDFs, o None si conviene hacerlo aquí mismo."""
+        nonlocal pool
+        if procesos <= 1 or faltantes < MIN_PDFS_PARA_POOL:
+            return pool
+        if pool is None:
+            # spawn: los hijos no heredan conexiones a la base de datos ni hilos
+            pool = multiprocessing.get_context('spawn').Pool(procesos)
+        return pool
+
+    salida = _SalidaZip()
+
+    try:
+        with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+            bloque = []
+            for factura in facturas.iterator(chunk_size=tamano_bloque * 4):
+                bloque.append(factura)
+                if len(bloque) == tamano_bloque:
+                    yield from _escribir_bloque(bloque, archivo_zip, salida, storage, obtener_pool)
+                    bloque = []
+            if bloque:
+                yield from _escribir_bloque(bloque, archivo_zip, salida, storage, obtener_pool)
+        # Directorio central del ZIP
+        yield salida.vaciar()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def _escribir_bloque(bloque, archivo_zip, salida, storage, obtener_pool):
+    pdfs = {}
+    faltantes = []
+
+    for factura in bloque:
+        detalles = list(factura.detallefactura_set.all())
+        nombre = f"{factura.id}/{huella_factura(factura, detalles)}.pdf"
+        if storage.exists(nombre):
+            with storage.open(nombre, 'rb') as archivo:
+                pdfs[factura.id] = archivo.read()
+        else:
+            faltantes.append((nombre, datos_pdf_factura(factura, detalles)))
+
+    if faltantes:
+        datos = [d for _, d in faltantes]
+        pool = obtener_pool(len(datos))
+        renderizados = pool.map(_renderizar_seguro, datos) if pool else map(_renderizar_seguro, datos)
+        for (nombre, d), pdf_content in zip(faltantes, renderizados):
+            if pdf_content:
+                storage.save(nombre, ContentFile(pdf_content))
+                pdfs[d.id] = pdf_content
+
+    for factura in bloque:
+        pdf_content = pdfs.pop(factura.id, None)
+        if pdf_content:
+            archivo_zip.writestr(f"Factura_ORD-{factura.id:06d}.pdf", pdf_content)
+            yield salida.vaciar()
+
+
+def respuesta_zip_facturas(facturas, nombre_archivo):
+    """StreamingHttpResponse con el ZIP de las facturas del queryset."""
+    response = StreamingHttpResponse(zip_facturas(facturas), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
@@ -0,0 +1,45 @@
+# perfume_api/filters.py
+import django_filters
+from django.db.models import Q
+from rest_framework.filters import SearchFilter
+
+from .busqueda import filtro_busqueda
+from .models import Marca, Producto
+
+
+# ======================================================
+# 🔹 FILTROS DEL CATÁLOGO
+# ======================================================
+
+class ProductoFilter(django_filters.FilterSet):
+    """
+    GET /api/productos/?marca=1&tipo=2&genero=Femenino&precio_min=20&precio_max=80&en_stock=true
+    """
+    precio_min = django_filters.NumberFilter(field_name="precio", lookup_expr="gte")
+    precio_max = django_filters.NumberFilter(field_name="precio", lookup_expr="lte")
+    en_stock = django_filters.BooleanFilter(method="filtrar_en_stock")
+
+    class Meta:
+        model = Producto
+        fields = ["marca", "tipo", "genero"]
+
+    def filtrar_en_stock(self, queryset, name, value):
+        # stock > 0 / stock <= 0 (usa producto_stock_idx)
+        return queryset.filter(stock__gt=0) if value else queryset.filter(stock__lte=0)
+
+
+class BusquedaCatalogoFilter(SearchFilter):
+    """
+    ?search= del catálogo con la búsqueda de texto completo (índice GIN en
+    PostgreSQL, índice en memoria en los demás motores) en vez de icontains,
+    que recorre toda la tabla. También trae los productos de las marcas cuyo
+    nombre contiene el texto (son pocas filas).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, "").strip()
+        if not texto:
+            return queryset
+        marcas = Marca.objects.filter(nombre__icontains=texto).values("id")
+        return queryset.filter(filtro_busqueda(texto) | Q(marca__in=marcas))
+
@@ -0,0 +1,261 @@
+# perfume_api/management/commands/explicar_consultas.py
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from perfume_api.busqueda import _coincide_postgres
+from perfume_api.models import (
+    Cliente,
+    CorreoSaliente,
+    DetalleFactura,
+    EmailVerification,
+    Factura,
+    Marca,
+    PasswordResetCode,
+    Producto,
+    Tipo,
+    Usuario,
+)
+
+
+class Command(BaseCommand):
+    help = "🔍 Ejecuta EXPLAIN sobre las consultas frecuentes y falla si alguna recorre la tabla completa"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sembrar', type=int, default=0, metavar='N',
+            help="Inserta N facturas (y datos relacionados) de prueba; se revierten al terminar",
+        )
+
+    def handle(self, *args, **options):
+        # Todo dentro de una transacción que se revierte: los datos sembrados
+        # nunca quedan en la base de datos.
+        with transaction.atomic():
+            if options['sembrar']:
+                self.sembrar(options['sembrar'])
+                self.analizar()
+
+            fallidas = []
+            for nombre, queryset, tabla in self.consultas():
+                plan = self.explicar(queryset)
+                ok = not self.recorre_tabla(plan, tabla)
+                if not ok:
+                    fallidas.append(nombre)
+
+                icono = '✅' if ok else '❌'
+                self.stdout.write(f"{icono} {nombre} ({tabla})")
+                if not ok or options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+            for nombre, queryset, indice in self.consultas_con_indice():
+                plan = self.explicar(queryset)
+                ok = self.usa_indice(plan, indice)
+                if not ok:
+                    fallidas.append(nombre)
+
+                icono = '✅' if ok else '❌'
+                self.stdout.write(f"{icono} {nombre} ({indice})")
+                if not ok or options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+            transaction.set_rollback(True)
+
+        if fallidas:
+            raise CommandError(f"{len(fallidas)} consulta(s) sin índice: {', '.join(fallidas)}")
+        self.stdout.write(self.style.SUCCESS("✅ Todas las consultas usan índice"))
+
+    # ------------------ Consultas frecuentes ------------------
+    def consultas(self):
+        """(nombre, queryset, tabla que no debe recorrerse completa)"""
+        ahora = timezone.now()
+        factura = Factura.objects.order_by('id').first()
+        cliente_id = factura.cliente_id if factura else 0
+        marca_id = Marca.objects.values_list('id', flat=True).order_by('id').first() or 0
+        usuario_id = Usuario.objects.values_list('id', flat=True).order_by('id').first() or 0
+        facturas_ids = list(Factura.objects.order_by('-id').values_list('id', flat=True)[:20])
+
+        return [
+            (
+                "Dashboard: ventas de los últimos 30 días",
+                Factura.objects.filter(fecha__gte=ahora - timedelta(days=30)).values('fecha', 'total'),
+                Factura._meta.db_table,
+            ),
+            (
+                "Dashboard: productos agotados",
+                Producto.objects.filter(stock__lte=0).values('id'),
+                Producto._meta.db_table,
+            ),
+            (
+                "Catálogo: productos por marca y género",
+                Producto.objects.filter(marca_id=marca_id, genero='Femenino').values('id'),
+                Producto._meta.db_table,
+            ),
+            (
+                "Historial de compras del cliente",
+                Factura.objects.filter(cliente_id=cliente_id).order_by('-fecha', '-id')[:20],
+                Factura._meta.db_table,
+            ),
+            (
+                "Detalles de una página de facturas",
+                DetalleFactura.objects.filter(factura_id__in=facturas_ids or [0]).order_by('id'),
+                DetalleFactura._meta.db_table,
+            ),
+            (
+                "Verificación de email",
+                EmailVerification.objects.filter(
+                    email='cliente0@example.com', code='123456', is_verified=False
+                ).order_by('-created_at')[:1],
+                EmailVerification._meta.db_table,
+            ),
+            (
+                "Código de recuperación vigente",
+                PasswordResetCode.objects.filter(
+                    usuario_id=usuario_id, code='123456', used=False, expires_at__gt=ahora
+                )[:1],
+                PasswordResetCode._meta.db_table,
+            ),
+            (
+                "Worker de correos: pendientes",
+                CorreoSaliente.objects.filter(
+                    estado__in=['pendiente', 'enviando'], siguiente_intento__lte=ahora
+                ).order_by('siguiente_intento')[:50],
+                CorreoSaliente._meta.db_table,
+            ),
+        ]
+
+    def consultas_con_indice(self):
+        """(nombre, queryset, índice que el plan debe usar). Solo PostgreSQL."""
+        if connection.vendor != 'postgresql':
+            return []
+        return [
+            (
+                "Catálogo: búsqueda de texto completo",
+                Producto.objects.filter(_coincide_postgres('jazmín floral')).values('id'),
+                'producto_busqueda_gin',
+            ),
+        ]
+
+    # ------------------ EXPLAIN por motor ------------------
+    def explicar(self, queryset):
+        if connection.vendor in ('postgresql', 'mysql'):
+            return queryset.explain(format='json')
+        return queryset.explain()
+
+    def recorre_tabla(self, plan, tabla):
+        """True si el plan lee `tabla` completa (Seq Scan / type ALL / SCAN)."""
+        if connection.vendor == 'sqlite':
+            # "SCAN tabla" sin índice; "SEARCH ..." o "SCAN tabla USING INDEX" usan índice
+            return bool(re.search(rf'\bSCAN {re.escape(tabla)}\b(?! USING)', plan))
+        return any(
+            (nodo.get('Node Type') == 'Seq Scan' and nodo.get('Relation Name') == tabla)  # PostgreSQL
+            or (nodo.get('table_name') == tabla and nodo.get('access_type') == 'ALL')  # MySQL
+            for nodo in self.nodos(json.loads(plan))
+        )
+
+    def usa_indice(self, plan, indice):
+        """True si algún nodo del plan (JSON de PostgreSQL) lee `indice`."""
+        return any(nodo.get('Index Name') == indice for nodo in self.nodos(json.loads(plan)))
+
+    def nodos(self, valor):
+        """Recorre todos los dicts anidados de un plan en JSON."""
+        if isinstance(valor, dict):
+            yield valor
+            valor = list(valor.values())
+        if isinstance(valor, list):
+            for item in valor:
+                yield from self.nodos(item)
+
+    def analizar(self):
+        """Actualiza las estadísticas del planificador tras sembrar."""
+        # En MySQL ANALYZE TABLE hace COMMIT implícito (y los datos sembrados no
+        # se revertirían); InnoDB recalcula sus estadísticas solo.
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    # ------------------ Datos de prueba ------------------
+    def sembrar(self, n):
+        self.stdout.write(f"🌱 Sembrando {n} facturas...")
+        ahora = timezone.now()
+        lote = 2000
+
+        marcas = Marca.objects.bulk_create([Marca(nombre=f"Marca {i}") for i in range(max(n // 500, 5))])
+        tipo = Tipo.objects.create(nombre="Tipo de prueba")
+        generos = ['Masculino', 'Femenino', 'Unisex']
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f"Perfume {i}",
+                marca=marcas[i % len(marcas)],
+                tipo=tipo,
+                precio=Decimal('50.00'),
+                # Solo 1 de cada 100 productos agotado
+                stock=0 if i % 100 == 0 else 10,
+                genero=generos[i % 3],
+            )
+            for i in range(max(n // 10, 50))
+        ], batch_size=lote)
+
+        clientes = Cliente.objects.bulk_create([
+            Cliente(
+                nombre="Cliente",
+                apellido=str(i),
+                email=f"cliente{i}@example.com",
+                sexo='Mujer',
+                password='x',
+            )
+            for i in range(max(n // 20, 10))
+        ], batch_size=lote)
+
+        facturas = Factura.objects.bulk_create([
+            Factura(cliente=clientes[i % len(clientes)], total=Decimal('100.00'))
+            for i in range(n)
+        ], batch_size=lote)
+        # `fecha` es auto_now_add: se reparte en dos años con bulk_update
+        for i, factura in enumerate(facturas):
+            factura.fecha = ahora - timedelta(days=i % 730, minutes=i % 1440)
+        Factura.objects.bulk_update(facturas, ['fecha'], batch_size=lote)
+
+        DetalleFactura.objects.bulk_create([
+            DetalleFactura(
+                factura=factura,
+                producto=productos[(i + j) % len(productos)],
+                cantidad=1,
+                precio_unitario=Decimal('50.00'),
+                subtotal=Decimal('50.00'),
+            )
+            for i, factura in enumerate(facturas)
+            for j in range(2)
+        ], batch_size=lote)
+
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(email=f"usuario{i}@example.com", nombre="Usuario", apellido=str(i))
+            for i in range(max(n // 20, 10))
+        ], batch_size=lote)
+        PasswordResetCode.objects.bulk_create([
+            PasswordResetCode(
+                usuario=usuarios[i % len(usuarios)],
+                code=f"{i % 1000000:06d}",
+                used=i % 4 != 0,
+                expires_at=ahora + timedelta(minutes=15),
+            )
+            for i in range(n)
+        ], batch_size=lote)
+        EmailVerification.objects.bulk_create([
+            EmailVerification(email=f"cliente{i % len(clientes)}@example.com", code=f"{i % 1000000:06d}")
+            for i in range(n)
+        ], batch_size=lote)
+
+        CorreoSaliente.objects.bulk_create([
+            CorreoSaliente(
+                destinatario=f"cliente{i % len(clientes)}@example.com",
+                asunto="Prueba",
+                # Casi todos ya enviados, como en producción
+                estado='pendiente' if i % 100 == 0 else 'enviado',
+            )
+            for i in range(n)
+        ], batch_size=lote)
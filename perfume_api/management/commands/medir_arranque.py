@@ -0,0 +1,94 @@
+# perfume_api/management/commands/medir_arranque.py
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Paquetes pesados que solo deben cargarse al usarse (PDF, Resend, gráficos)
+PROHIBIDOS_AL_ARRANCAR = ['reportlab', 'resend', 'pandas', 'numpy', 'plotly']
+
+# Lo que hace un worker de gunicorn al arrancar: cargar la app WSGI y las URLs
+PROGRAMA_HIJO = """
+import json, resource, sys, time
+inicio = time.perf_counter()
+import perfumeria.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+ms = (time.perf_counter() - inicio) * 1000
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+prohibidos = %r
+cargados = sorted({m.split('.')[0] for m in sys.modules if m.split('.')[0] in prohibidos})
+print(json.dumps({'ms': ms, 'rss_mb': rss_mb, 'cargados': cargados}))
+"""
+
+
+class Command(BaseCommand):
+    help = "⏱️ Mide tiempo de import y memoria (RSS) de perfumeria.wsgi y falla si supera el presupuesto"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-ms', type=float, default=1500, help="Presupuesto de tiempo de arranque (ms)")
+        parser.add_argument('--max-mb', type=float, default=150, help="Presupuesto de memoria RSS (MB)")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Arranques a medir (se usa el más rápido)")
+        parser.add_argument('--top', type=int, default=10, help="Paquetes más lentos a mostrar")
+
+    def handle(self, *args, **options):
+        mediciones = [self.arrancar() for _ in range(max(options['repeticiones'], 1))]
+        mejor = min(mediciones, key=lambda m: m['ms'])
+
+        self.stdout.write(f"📦 Paquetes que más tardan en importarse ({mejor['total_importtime_ms']:.0f} ms en imports):")
+        for paquete, ms in mejor['por_paquete'][:options['top']]:
+            self.stdout.write(f"   {ms:8.1f} ms  {paquete}")
+
+        self.stdout.write(
+            f"⏱️  Arranque: {mejor['ms']:.0f} ms (presupuesto {options['max_ms']:.0f} ms) | "
+            f"RSS: {mejor['rss_mb']:.1f} MB (presupuesto {options['max_mb']:.0f} MB)"
+        )
+
+        errores = []
+        if mejor['ms'] > options['max_ms']:
+            errores.append(f"arranque de {mejor['ms']:.0f} ms > {options['max_ms']:.0f} ms")
+        if mejor['rss_mb'] > options['max_mb']:
+            errores.append(f"RSS de {mejor['rss_mb']:.1f} MB > {options['max_mb']:.0f} MB")
+        if mejor['cargados']:
+            errores.append(f"se cargan al arrancar: {', '.join(mejor['cargados'])}")
+
+        if errores:
+            raise CommandError("❌ " + "; ".join(errores))
+        self.stdout.write(self.style.SUCCESS("✅ Arranque dentro del presupuesto"))
+
+    def arrancar(self):
+        """Arranca un intérprete limpio con -X importtime y devuelve sus mediciones."""
+        resultado = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROGRAMA_HIJO % PROHIBIDOS_AL_ARRANCAR],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if resultado.returncode != 0:
+            raise CommandError(f"No se pudo importar perfumeria.wsgi:\n{resultado.stderr[-2000:]}")
+
+        # El hilo que precarga el autocompletado también puede escribir en stdout
+        linea = next(l for l in reversed(resultado.stdout.splitlines()) if l.startswith('{"ms"'))
+        medicion = json.loads(linea)
+        medicion.update(self.resumir_importtime(resultado.stderr))
+        return medicion
+
+    def resumir_importtime(self, salida):
+        """Suma el tiempo propio (self) de cada módulo por paquete raíz."""
+        por_paquete = defaultdict(float)
+        for linea in salida.splitlines():
+            if not linea.startswith('import time:') or 'self [us]' in linea:
+                continue
+            _, propio, _, modulo = (parte.strip() for parte in linea.replace('import time:', '|', 1).split('|'))
+            por_paquete[modulo.split('.')[0]] += int(propio) / 1000
+
+        return {
+            'total_importtime_ms': sum(por_paquete.values()),
+            'por_paquete': sorted(por_paquete.items(), key=lambda item: item[1], reverse=True),
+        }
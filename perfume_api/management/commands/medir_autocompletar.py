@@ -0,0 +1,122 @@
+# perfume_api/management/commands/medir_autocompletar.py
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perfume_api.autocompletar import LIMITE_AUTOCOMPLETAR, IndiceAutocompletar
+
+# Palabras reales (las de las consultas con error de tipeo) más otras
+# inventadas con sílabas, para tener un vocabulario del tamaño de un catálogo grande
+PALABRAS = [
+    "Sauvage", "Bleu", "Noir", "Rouge", "Élégance", "Nuit", "Ambre", "Oud", "Rose", "Jasmin",
+    "Vétiver", "Cuir", "Santal", "Iris", "Musc", "Citrus", "Intense", "Absolu", "Privé", "Extrême",
+    "Homme", "Femme", "Sport", "Aqua", "Velours", "Mystère", "Lumière", "Éclat", "Fleur", "Bois",
+    "Tabac", "Vanille", "Néroli", "Patchouli", "Bergamote", "Poivre", "Encens", "Ciel", "Océan", "Soleil",
+]
+SILABAS = ["ba", "be", "ca", "ce", "di", "do", "fa", "la", "le", "lo", "ma", "mi", "na", "no",
+           "pa", "ra", "ri", "ro", "sa", "se", "ta", "te", "to", "va", "vi", "za", "lu", "mo"]
+TIPOS = ["Eau Fraîche", "Eau de Cologne", "Eau de Toilette", "Eau de Parfum", "Parfum"]
+
+
+def vocabulario_sintetico(tamano, aleatorio):
+    palabras = set(PALABRAS)
+    while len(palabras) < tamano:
+        palabras.add("".join(aleatorio.choices(SILABAS, k=aleatorio.randint(2, 4))).capitalize())
+    return sorted(palabras)
+
+
+def catalogo_sintetico(num_productos, num_marcas, num_palabras, aleatorio):
+    vocabulario = vocabulario_sintetico(num_palabras, aleatorio)
+    marcas = [(i, f"{aleatorio.choice(vocabulario)} {aleatorio.choice(vocabulario)}") for i in range(1, num_marcas + 1)]
+    productos = [
+        (
+            i,
+            f"{' '.join(aleatorio.sample(vocabulario, aleatorio.randint(1, 3)))} {aleatorio.choice(TIPOS)}",
+            aleatorio.randint(1, num_marcas),
+        )
+        for i in range(1, num_productos + 1)
+    ]
+    return marcas, productos
+
+
+def con_error(palabra, aleatorio):
+    """La palabra con dos letras vecinas intercambiadas ("suavage")."""
+    if len(palabra) < 4:
+        return palabra
+    i = aleatorio.randint(1, len(palabra) - 3)
+    return palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+
+
+class Command(BaseCommand):
+    help = "🔎 Mide el índice de autocompletado sobre un catálogo sintético (sin base de datos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=100_000, help="Productos del catálogo sintético")
+        parser.add_argument('--marcas', type=int, default=500, help="Marcas del catálogo sintético")
+        parser.add_argument('--palabras', type=int, default=5000, help="Palabras distintas en los nombres")
+        parser.add_argument('--consultas', type=int, default=5000, help="Consultas a medir por tipo")
+        parser.add_argument('--max-us', type=float, default=1000, help="Presupuesto del p95 por consulta (µs)")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        marcas, productos = catalogo_sintetico(
+            options['productos'], options['marcas'], options['palabras'], aleatorio
+        )
+
+        inicio = time.perf_counter()
+        indice = IndiceAutocompletar(marcas, productos)
+        construccion = time.perf_counter() - inicio
+
+        tracemalloc.start()
+        IndiceAutocompletar(marcas, productos)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"🏗️  Índice de {len(productos):,} productos y {len(marcas):,} marcas: "
+            f"{construccion:.2f} s, ~{pico / (1024 * 1024):.0f} MB"
+        )
+
+        nombres = [nombre for _, nombre, _ in productos]
+        consultas = {
+            'prefijo (1-8 letras)': lambda: aleatorio.choice(nombres)[:aleatorio.randint(1, 8)],
+            'palabra intermedia': lambda: aleatorio.choice(PALABRAS)[:aleatorio.randint(2, 6)],
+            'dos palabras': lambda: " ".join(
+                p[:aleatorio.randint(2, 5)] for p in aleatorio.choice(nombres).split()[:2]
+            ),
+            'con error de tipeo': lambda: con_error(aleatorio.choice(PALABRAS), aleatorio),
+        }
+
+        peor_p95 = 0
+        for nombre, generar in consultas.items():
+            textos = [generar() for _ in range(options['consultas'])]
+            tiempos = []
+            vacias = 0
+            for texto in textos:
+                inicio = time.perf_counter()
+                resultado = indice.buscar(texto, LIMITE_AUTOCOMPLETAR)
+                tiempos.append((time.perf_counter() - inicio) * 1_000_000)
+                vacias += not (resultado['productos'] or resultado['marcas'])
+            tiempos.sort()
+            p50, p95, p99 = (tiempos[int(len(tiempos) * q)] for q in (0.5, 0.95, 0.99))
+            peor_p95 = max(peor_p95, p95)
+            self.stdout.write(
+                f"   {nombre:<22} p50 {p50:6.0f} µs | p95 {p95:6.0f} µs | p99 {p99:6.0f} µs"
+                f" | máx {tiempos[-1]:6.0f} µs"
+                f" | sin resultados {vacias}"
+            )
+
+        # Sincronización incremental: cambios de nombre de productos existentes
+        cambios = aleatorio.sample(productos, min(1000, len(productos)))
+        inicio = time.perf_counter()
+        for producto_id, nombre, marca_id in cambios:
+            indice.agregar_producto(producto_id, f"{nombre} Édition", marca_id)
+        por_cambio = (time.perf_counter() - inicio) * 1_000_000 / max(len(cambios), 1)
+        self.stdout.write(f"🔄 Cambio incremental: {por_cambio:.1f} µs por producto")
+
+        if peor_p95 > options['max_us']:
+            raise CommandError(f"❌ p95 de {peor_p95:.0f} µs > {options['max_us']:.0f} µs")
+        self.stdout.write(self.style.SUCCESS("✅ Autocompletado dentro del presupuesto"))
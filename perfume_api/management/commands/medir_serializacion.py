@@ -0,0 +1,161 @@
+# perfume_api/management/commands/medir_serializacion.py
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from perfume_api.models import DetalleFactura, Factura, Marca, Producto, Tipo
+from perfume_api.serializers import (
+    DETALLE_FACTURA_VALORES,
+    FACTURA_VALORES,
+    PRODUCTO_VALORES,
+    DetalleFacturaSerializer,
+    FacturaSerializer,
+    ProductoSerializer,
+)
+
+GENEROS = ["Masculino", "Femenino", "Unisex"]
+METODOS_PAGO = [metodo for metodo, _ in Factura.PAGO_CHOICES]
+
+
+def precio(aleatorio):
+    return Decimal(aleatorio.randint(500, 50000)).scaleb(-2)
+
+
+def filas_productos(cantidad, aleatorio):
+    """Filas como las devuelve values() para PRODUCTO_VALORES."""
+    inicio = datetime(2025, 1, 1, 12, 0, 0)
+    filas = []
+    for i in range(1, cantidad + 1):
+        creado = inicio + timedelta(minutes=i, microseconds=aleatorio.randint(0, 999_999))
+        marca_id = aleatorio.randint(1, 50)
+        tipo_id = aleatorio.randint(1, 5)
+        filas.append({
+            "id": i,
+            "nombre": f"Perfume {i}",
+            "descripcion": "Notas de salida cítricas, corazón floral y fondo amaderado. " * 3,
+            "precio": precio(aleatorio),
+            "url_imagen": f"https://cdn.ejemplo.com/productos/{i}.jpg" if i % 10 else None,
+            "stock": aleatorio.randint(0, 100),
+            "genero": aleatorio.choice(GENEROS),
+            "created_at": creado,
+            "updated_at": creado + timedelta(days=aleatorio.randint(0, 30)),
+            "marca_id": marca_id,
+            "marca__nombre": f"Marca {marca_id}",
+            "tipo_id": tipo_id,
+            "tipo__nombre": f"Tipo {tipo_id}",
+        })
+    return filas
+
+
+def instancias_productos(filas):
+    marcas, tipos = {}, {}
+    productos = []
+    for fila in filas:
+        marca = marcas.setdefault(fila["marca_id"], Marca(id=fila["marca_id"], nombre=fila["marca__nombre"]))
+        tipo = tipos.setdefault(fila["tipo_id"], Tipo(id=fila["tipo_id"], nombre=fila["tipo__nombre"]))
+        campos = {k: v for k, v in fila.items() if "__" not in k and k not in ("marca_id", "tipo_id")}
+        productos.append(Producto(marca=marca, tipo=tipo, **campos))
+    return productos
+
+
+def filas_facturas(cantidad, aleatorio):
+    inicio = datetime(2025, 1, 1, 9, 0, 0)
+    filas = []
+    for i in range(1, cantidad + 1):
+        subtotal = precio(aleatorio)
+        iva = (subtotal * Decimal("0.15")).quantize(Decimal("0.01"))
+        filas.append({
+            "id": i,
+            "total": subtotal + iva,
+            "fecha": inicio + timedelta(minutes=i, microseconds=aleatorio.randint(0, 999_999)),
+            "metodo_pago": aleatorio.choice(METODOS_PAGO),
+            "subtotal": subtotal,
+            "iva": iva,
+            "num_items": aleatorio.randint(1, 10),
+            "cliente_id": aleatorio.randint(1, 5000),
+        })
+    return filas
+
+
+def filas_detalles(cantidad, aleatorio):
+    filas = []
+    for i in range(1, cantidad + 1):
+        unitario = precio(aleatorio)
+        cantidad_items = aleatorio.randint(1, 5)
+        filas.append({
+            "id": i,
+            "cantidad": cantidad_items,
+            "precio_unitario": unitario,
+            "subtotal": unitario * cantidad_items,
+            "factura_id": aleatorio.randint(1, max(cantidad // 3, 1)),
+            "producto_id": aleatorio.randint(1, 5000),
+        })
+    return filas
+
+
+# (nombre, generador de filas, modelo → instancias, serializer, representación)
+CASOS = [
+    ("productos", filas_productos, instancias_productos, ProductoSerializer, PRODUCTO_VALORES),
+    ("facturas", filas_facturas, lambda filas: [Factura(**fila) for fila in filas],
+     FacturaSerializer, FACTURA_VALORES),
+    ("detalles", filas_detalles, lambda filas: [DetalleFactura(**fila) for fila in filas],
+     DetalleFacturaSerializer, DETALLE_FACTURA_VALORES),
+]
+
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo (s) de `repeticiones` corridas, y el último resultado."""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+class Command(BaseCommand):
+    help = "⚡ Compara serializer DRF vs values() en las listas (sin base de datos) y verifica que el JSON sea idéntico"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', default="1000,10000,100000", help="Tamaños de lista separados por coma")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Corridas por medición (se toma la mejor)")
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(tamano) for tamano in options['filas'].split(",")]
+        except ValueError:
+            raise CommandError("--filas debe ser una lista de números, p. ej. 1000,10000")
+
+        renderer = JSONRenderer()
+        diferentes = []
+        for nombre, generar, instanciar, serializer_class, representacion in CASOS:
+            nombres = list(representacion.campos)
+            for tamano in tamanos:
+                filas = generar(tamano, random.Random(options['semilla']))
+                instancias = instanciar(filas)
+
+                t_serializer, datos_serializer = medir(
+                    lambda: serializer_class(instancias, many=True).data, options['repeticiones']
+                )
+                t_valores, datos_valores = medir(
+                    lambda: representacion.representar(filas, nombres), options['repeticiones']
+                )
+
+                identico = renderer.render(datos_serializer) == renderer.render(datos_valores)
+                if not identico:
+                    diferentes.append(f"{nombre} ({tamano:,} filas)")
+                self.stdout.write(
+                    f"   {nombre:<10} {tamano:>8,} filas | serializer {t_serializer * 1000:8.1f} ms"
+                    f" | values() {t_valores * 1000:7.1f} ms | x{t_serializer / t_valores:5.1f}"
+                    f" | {'JSON idéntico' if identico else '❌ JSON DIFERENTE'}"
+                )
+
+        if diferentes:
+            raise CommandError(f"❌ El JSON no coincide en: {', '.join(diferentes)}")
+        self.stdout.write(self.style.SUCCESS("✅ Mismo JSON por los dos caminos"))
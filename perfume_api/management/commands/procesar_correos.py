@@ -0,0 +1,46 @@
+# perfume_api/management/commands/procesar_correos.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from perfume_api.correos import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "📬 Worker que envía los correos de la bandeja de salida (CorreoSaliente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help="Correos por ciclo")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos de espera si no hay pendientes")
+        parser.add_argument('--una-vez', action='store_true', help="Procesa un solo ciclo y termina")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("📬 Worker de correos iniciado"))
+
+        while True:
+            close_old_connections()
+            try:
+                resultado = procesar_pendientes(lote=options['lote'])
+            except Exception as e:
+                # Un error de base de datos o de red no debe matar al worker:
+                # los correos tomados vuelven a estar disponibles al vencer su plazo
+                if options['una_vez']:
+                    raise
+                self.stderr.write(self.style.ERROR(f"❌ Error procesando correos: {str(e)}"))
+                time.sleep(options['intervalo'])
+                continue
+            procesados = resultado['enviados'] + resultado['fallidos']
+
+            if procesados:
+                por_segundo = procesados / resultado['segundos'] if resultado['segundos'] else procesados
+                self.stdout.write(
+                    f"✉️  {resultado['enviados']} enviados, {resultado['fallidos']} con error "
+                    f"en {resultado['segundos']:.2f}s ({por_segundo:.1f} correos/s)"
+                )
+
+            if options['una_vez']:
+                break
+
+            if procesados < options['lote']:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,28 @@
+# perfume_api/management/commands/reconstruir_ventas_diarias.py
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perfume_api.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = "📊 Reconstruye el rollup VentaDiaria a partir de las facturas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Reconstruir solo desde esta fecha (AAAA-MM-DD)")
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Formato inválido para --desde: use AAAA-MM-DD")
+
+        inicio = time.monotonic()
+        filas = reconstruir_ventas(desde=desde)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {filas} filas de ventas diarias reconstruidas en {time.monotonic() - inicio:.2f}s"
+        ))
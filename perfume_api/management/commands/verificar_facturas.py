@@ -0,0 +1,78 @@
+# perfume_api/management/commands/verificar_facturas.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from perfume_api.models import IVA_RATE, Factura, desglose_iva
+
+
+class Command(BaseCommand):
+    help = (
+        "🔎 Verifica que el total de cada Factura cuadre con sus líneas, que subtotal e iva "
+        "sean el desglose del total y num_items el número de líneas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true', help="Guarda los valores correctos en las facturas con diferencias")
+        parser.add_argument('--lote', type=int, default=2000, help="Filas leídas/actualizadas por bloque")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+
+        # Una sola consulta agrupada recorrida en bloques: los valores guardados
+        # junto al número real de líneas y la suma de sus subtotales.
+        filas = (
+            Factura.objects
+            .annotate(items_reales=Count('detallefactura'), suma_lineas=Sum('detallefactura__subtotal'))
+            .values('id', 'total', 'subtotal', 'iva', 'num_items', 'items_reales', 'suma_lineas')
+            .order_by('id')
+        )
+
+        revisadas = 0
+        diferencias = []
+        totales_descuadrados = 0
+        for fila in filas.iterator(chunk_size=lote):
+            revisadas += 1
+            # Las líneas de la app guardan precios con IVA (total = suma) y las
+            # del admin sin IVA (total = suma × 1.15): el total debe ser uno de los dos
+            suma = fila['suma_lineas'] or Decimal('0.00')
+            con_iva = (suma * (1 + IVA_RATE)).quantize(Decimal('0.00'))
+            if fila['total'] not in (suma, con_iva):
+                # No se corrige solo: no se sabe si falla el total o las líneas
+                totales_descuadrados += 1
+                self.stdout.write(
+                    f"⚠️  ORD-{fila['id']:06d}: total={fila['total']} no cuadra con sus líneas "
+                    f"(suma={suma}, con IVA={con_iva})"
+                )
+
+            # total incluye IVA: subtotal = total / (1 + IVA_RATE), iva = total - subtotal
+            subtotal, iva = desglose_iva(fila['total'])
+
+            if (fila['subtotal'], fila['iva'], fila['num_items']) != (subtotal, iva, fila['items_reales']):
+                diferencias.append(Factura(id=fila['id'], subtotal=subtotal, iva=iva, num_items=fila['items_reales']))
+                self.stdout.write(
+                    f"⚠️  ORD-{fila['id']:06d}: guardado subtotal={fila['subtotal']} iva={fila['iva']} "
+                    f"items={fila['num_items']} → real subtotal={subtotal} iva={iva} items={fila['items_reales']}"
+                )
+
+        if not diferencias and not totales_descuadrados:
+            self.stdout.write(self.style.SUCCESS(f"✅ {revisadas} facturas revisadas, todas consistentes"))
+            return
+
+        if diferencias and not options['corregir']:
+            # Código de salida distinto de 0 para que cron/CI lo detecten
+            raise CommandError(
+                f"❌ {len(diferencias)} de {revisadas} facturas con diferencias (use --corregir para repararlas)"
+            )
+
+        if diferencias:
+            with transaction.atomic():
+                Factura.objects.bulk_update(diferencias, ['subtotal', 'iva', 'num_items'], batch_size=lote)
+            self.stdout.write(self.style.SUCCESS(f"🔧 {len(diferencias)} de {revisadas} facturas corregidas"))
+
+        if totales_descuadrados:
+            raise CommandError(
+                f"❌ {totales_descuadrados} de {revisadas} facturas con total distinto a sus líneas (revisar a mano)"
+            )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0005_emailverification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['-fecha', '-id'], name='factura_fecha_id_idx'),
+        ),
+    ]
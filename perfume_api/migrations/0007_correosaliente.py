@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0006_factura_fecha_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destinatario', models.EmailField(max_length=254, verbose_name='Destinatario')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('intentos', models.PositiveIntegerField(default=0, verbose_name='Intentos')),
+                ('siguiente_intento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Siguiente intento')),
+                ('ultimo_error', models.TextField(blank=True, default='', verbose_name='Último error')),
+                ('enviado_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de envío')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha creación')),
+                ('factura', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='perfume_api.factura', verbose_name='Factura')),
+            ],
+            options={
+                'verbose_name': 'Correo Saliente',
+                'verbose_name_plural': 'Correos Salientes',
+                'db_table': 'correos_salientes',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['estado', 'siguiente_intento'], name='correo_pendiente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0007_correosaliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correosaliente',
+            name='asunto',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Asunto'),
+        ),
+        migrations.AddField(
+            model_name='correosaliente',
+            name='canal',
+            field=models.CharField(choices=[('smtp', 'SMTP'), ('resend', 'Resend API')], default='smtp', max_length=10, verbose_name='Canal'),
+        ),
+        migrations.AddField(
+            model_name='correosaliente',
+            name='cuerpo',
+            field=models.TextField(blank=True, default='', verbose_name='Cuerpo (texto)'),
+        ),
+        migrations.AddField(
+            model_name='correosaliente',
+            name='cuerpo_html',
+            field=models.TextField(blank=True, default='', verbose_name='Cuerpo (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='correosaliente',
+            name='remitente',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Remitente'),
+        ),
+    ]
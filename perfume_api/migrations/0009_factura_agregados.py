@@ -0,0 +1,64 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:10
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count
+
+# Copia fija: la migración no debe cambiar si IVA_RATE cambia en models.py
+IVA_RATE = Decimal('0.15')
+
+
+def rellenar_agregados(apps, schema_editor):
+    """Calcula subtotal, IVA y líneas de las facturas existentes."""
+    Factura = apps.get_model('perfume_api', 'Factura')
+
+    # Un solo GROUP BY para todas las facturas. El total ya incluye IVA:
+    # subtotal = total / (1 + IVA_RATE) e iva = total - subtotal.
+    agregados = (
+        Factura.objects
+        .annotate(lineas=Count('detallefactura'))
+        .values('id', 'total', 'lineas')
+        .order_by()
+    )
+
+    lote = []
+    for fila in agregados.iterator(chunk_size=2000):
+        total = (fila['total'] or Decimal('0.00')).quantize(Decimal('0.00'))
+        subtotal = (total / (1 + IVA_RATE)).quantize(Decimal('0.00'))
+        lote.append(Factura(
+            id=fila['id'],
+            subtotal=subtotal,
+            iva=total - subtotal,
+            num_items=fila['lineas'],
+        ))
+        if len(lote) >= 2000:
+            Factura.objects.bulk_update(lote, ['subtotal', 'iva', 'num_items'])
+            lote = []
+    if lote:
+        Factura.objects.bulk_update(lote, ['subtotal', 'iva', 'num_items'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0008_correosaliente_contenido_canal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factura',
+            name='iva',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='factura',
+            name='num_items',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='factura',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(rellenar_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0009_factura_agregados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detallefactura',
+            index=models.Index(fields=['factura', '-id'], name='detalle_factura_id_idx'),
+        ),
+    ]
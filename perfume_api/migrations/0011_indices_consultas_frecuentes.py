@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0010_detalle_factura_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emailverification',
+            index=models.Index(fields=['email', 'code', 'is_verified', 'created_at'], name='email_verif_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['cliente', '-fecha', '-id'], name='factura_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetcode',
+            index=models.Index(fields=['usuario', 'code', 'used', 'expires_at'], name='reset_code_vigente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock'], name='producto_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['marca', 'genero'], name='producto_marca_genero_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:13
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def construir_rollup(apps, schema_editor):
+    """Carga VentaDiaria con las facturas existentes."""
+    Factura = apps.get_model('perfume_api', 'Factura')
+    DetalleFactura = apps.get_model('perfume_api', 'DetalleFactura')
+    VentaDiaria = apps.get_model('perfume_api', 'VentaDiaria')
+
+    filas = {}
+    por_factura = (
+        Factura.objects
+        .annotate(dia=TruncDate('fecha'))
+        .values('dia', 'metodo_pago')
+        .annotate(total_dia=Sum('total'), ordenes_dia=Count('id'))
+        .order_by()
+    )
+    for fila in por_factura:
+        filas[(fila['dia'], fila['metodo_pago'])] = VentaDiaria(
+            fecha=fila['dia'],
+            metodo_pago=fila['metodo_pago'],
+            total=fila['total_dia'] or Decimal('0.00'),
+            ordenes=fila['ordenes_dia'],
+        )
+
+    por_detalle = (
+        DetalleFactura.objects
+        .annotate(dia=TruncDate('factura__fecha'))
+        .values('dia', 'factura__metodo_pago')
+        .annotate(unidades_dia=Sum('cantidad'))
+        .order_by()
+    )
+    for fila in por_detalle:
+        venta = filas.get((fila['dia'], fila['factura__metodo_pago']))
+        if venta is not None:
+            venta.unidades = fila['unidades_dia'] or 0
+
+    VentaDiaria.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0011_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('tarjeta', 'Tarjeta de Crédito/Débito'), ('wawallet', 'WaWallet'), ('transferencia', 'Transferencia Bancaria')], max_length=50, verbose_name='Método de pago')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total vendido')),
+                ('ordenes', models.PositiveIntegerField(default=0, verbose_name='Órdenes')),
+                ('unidades', models.PositiveIntegerField(default=0, verbose_name='Unidades')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'db_table': 'ventas_diarias',
+                'ordering': ['fecha', 'metodo_pago'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(fields=('fecha', 'metodo_pago'), name='venta_diaria_unica'),
+        ),
+        migrations.RunPython(construir_rollup, migrations.RunPython.noop),
+    ]
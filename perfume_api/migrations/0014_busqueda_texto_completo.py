@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-17 05:19
+
+from django.db import migrations
+
+# Solo PostgreSQL (producción). En MySQL/SQLite la búsqueda usa el índice en
+# memoria de perfume_api/busqueda.py y esta migración no hace nada.
+CREAR_BUSQUEDA = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'espanol_sin_acentos') THEN
+            CREATE TEXT SEARCH CONFIGURATION espanol_sin_acentos (COPY = pg_catalog.spanish);
+            ALTER TEXT SEARCH CONFIGURATION espanol_sin_acentos
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+    # Misma expresión que busqueda.VECTOR_PRODUCTO
+    """
+    CREATE INDEX IF NOT EXISTS producto_busqueda_gin ON perfume_api_producto USING GIN ((
+        setweight(to_tsvector('espanol_sin_acentos'::regconfig, coalesce(nombre, '')), 'A') ||
+        setweight(to_tsvector('espanol_sin_acentos'::regconfig, coalesce(descripcion, '')), 'B')
+    ))
+    """,
+]
+
+BORRAR_BUSQUEDA = [
+    "DROP INDEX IF EXISTS producto_busqueda_gin",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS espanol_sin_acentos",
+]
+
+
+def ejecutar_en_postgres(sentencias):
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perfume_api', '0013_producto_precio_nombre_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            ejecutar_en_postgres(CREAR_BUSQUEDA),
+            ejecutar_en_postgres(BORRAR_BUSQUEDA),
+        ),
+    ]
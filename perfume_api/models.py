@@ -3,6 +3,7 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 import random
 
 
@@ -13,6 +14,16 @@ ROLES = [
     ('cliente', 'Cliente'),
 ]
 
+# IVA incluido en el total de la factura (los precios de Producto ya lo incluyen)
+IVA_RATE = Decimal('0.15')
+
+
+def desglose_iva(total):
+    """(subtotal sin IVA, IVA) de un total con IVA: subtotal = total / (1 + IVA_RATE)."""
+    total = Decimal(total or 0).quantize(Decimal('0.00'))
+    subtotal = (total / (1 + IVA_RATE)).quantize(Decimal('0.00'))
+    return subtotal, total - subtotal
+
 
 # ----------- MANAGER PERSONALIZADO -----------
 class UsuarioManager(BaseUserManager):
@@ -114,6 +125,19 @@ class Producto(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+    class Meta:
+        indexes = [
+            # 📦 Conteo de agotados del dashboard (stock <= 0). Índice normal y no
+            # parcial: MySQL (desarrollo) no soporta índices con condición.
+            models.Index(fields=['stock'], name='producto_stock_idx'),
+            # 🏷️ Filtro del catálogo por marca y género
+            models.Index(fields=['marca', 'genero'], name='producto_marca_genero_idx'),
+            # 💶 Rango de precio (precio_min/precio_max) y ?ordering=precio
+            models.Index(fields=['precio', 'id'], name='producto_precio_idx'),
+            # 🔤 ?ordering=nombre
+            models.Index(fields=['nombre', 'id'], name='producto_nombre_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -159,12 +183,30 @@ class Factura(models.Model):
         choices=PAGO_CHOICES,
         default='efectivo'
     )
+    # 📊 Desglose del total (subtotal sin IVA + IVA = total) y número de líneas,
+    # guardados en la propia factura para no recalcularlos en cada listado/reporte.
+    # Se mantienen con aplicar_agregados() y se verifican con `manage.py verificar_facturas`.
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    iva = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    num_items = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name_plural = "Facturas"
+        indexes = [
+            # 📄 Soporta la paginación por cursor (-fecha, -id)
+            models.Index(fields=['-fecha', '-id'], name='factura_fecha_id_idx'),
+            # 👤 Historial de compras de un cliente (obtener_facturas_usuario)
+            models.Index(fields=['cliente', '-fecha', '-id'], name='factura_cliente_fecha_idx'),
+        ]
         
     def __str__(self):
         return f"Factura #{self.id} - {self.cliente.nombre} {self.cliente.apellido}"
+    
+    def aplicar_agregados(self, total, num_items):
+        """Asigna el total (con IVA), su desglose en subtotal e IVA y el número de líneas (no guarda)"""
+        self.subtotal, self.iva = desglose_iva(total)
+        self.total = self.subtotal + self.iva
+        self.num_items = num_items
 
 
 # ---------- DETALLE FACTURA ----------
@@ -178,11 +220,43 @@ class DetalleFactura(models.Model):
 
     class Meta:
         verbose_name_plural = "Detalles de Factura"
+        indexes = [
+            # 🧾 Líneas de una factura en orden: el listado del admin recorre
+            # factura_fecha_id_idx y entra por aquí a las líneas de cada una
+            models.Index(fields=['factura', '-id'], name='detalle_factura_id_idx'),
+        ]
         
     def __str__(self):
         return f"Detalle #{self.id} - Factura #{self.factura.id}"
 
 
+# ---------- 📊 VENTAS DIARIAS (ROLLUP) ----------
+class VentaDiaria(models.Model):
+    """
+    Ventas agregadas por día y método de pago. El dashboard lee solo esta tabla.
+    Se actualiza en cada venta (perfume_api/ventas.py) y se puede reconstruir
+    con `python manage.py reconstruir_ventas_diarias`.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    metodo_pago = models.CharField(max_length=50, choices=Factura.PAGO_CHOICES, verbose_name="Método de pago")
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total vendido")
+    ordenes = models.PositiveIntegerField(default=0, verbose_name="Órdenes")
+    unidades = models.PositiveIntegerField(default=0, verbose_name="Unidades")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['fecha', 'metodo_pago']
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        db_table = 'ventas_diarias'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'metodo_pago'], name='venta_diaria_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.metodo_pago}: {self.total} ({self.ordenes} órdenes)"
+
+
 # ---------- EMAIL VERIFICATION CODE (ANTIGUO) ----------
 class EmailVerificationCode(models.Model):
     email = models.EmailField()
@@ -214,6 +288,10 @@ class EmailVerification(models.Model):
         verbose_name = "Verificación de Email"
         verbose_name_plural = "Verificaciones de Email"
         db_table = 'email_verifications'
+        indexes = [
+            # verify_code: email + code + is_verified=False, el más reciente
+            models.Index(fields=['email', 'code', 'is_verified', 'created_at'], name='email_verif_codigo_idx'),
+        ]
     
     def __str__(self):
         status = "Verificado" if self.is_verified else "Pendiente"
@@ -262,6 +340,10 @@ class PasswordResetCode(models.Model):
         verbose_name = "Código de Recuperación"
         verbose_name_plural = "Códigos de Recuperación"
         db_table = 'password_reset_codes'
+        indexes = [
+            # Igualdades primero y expires_at (rango) al final
+            models.Index(fields=['usuario', 'code', 'used', 'expires_at'], name='reset_code_vigente_idx'),
+        ]
     
     def __str__(self):
         status = "Usado" if self.used else "Activo"
@@ -270,3 +352,76 @@ class PasswordResetCode(models.Model):
     def is_valid(self):
         """Verifica si el código aún es válido"""
         return not self.used and self.expires_at > timezone.now()
+
+
+# ---------- ✅ BANDEJA DE SALIDA DE CORREOS ----------
+class CorreoSaliente(models.Model):
+    """
+    📬 Correo pendiente de envío. Se inserta en la misma transacción que lo
+    origina y lo envía el worker `python manage.py procesar_correos`.
+    Si tiene factura, el asunto, el cuerpo y el PDF se generan al enviarlo.
+    """
+    CANAL_CHOICES = [
+        ('smtp', 'SMTP'),
+        ('resend', 'Resend API'),
+    ]
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+    MAX_INTENTOS = 5
+
+    factura = models.ForeignKey(
+        Factura,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Factura"
+    )
+    destinatario = models.EmailField(verbose_name="Destinatario")
+    remitente = models.CharField(max_length=255, blank=True, default='', verbose_name="Remitente")
+    asunto = models.CharField(max_length=255, blank=True, default='', verbose_name="Asunto")
+    cuerpo = models.TextField(blank=True, default='', verbose_name="Cuerpo (texto)")
+    cuerpo_html = models.TextField(blank=True, default='', verbose_name="Cuerpo (HTML)")
+    canal = models.CharField(
+        max_length=10,
+        choices=CANAL_CHOICES,
+        default='smtp',
+        verbose_name="Canal"
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name="Estado"
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    siguiente_intento = models.DateTimeField(default=timezone.now, verbose_name="Siguiente intento")
+    ultimo_error = models.TextField(blank=True, default='', verbose_name="Último error")
+    enviado_at = models.DateTimeField(blank=True, null=True, verbose_name="Fecha de envío")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha creación")
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Correo Saliente"
+        verbose_name_plural = "Correos Salientes"
+        db_table = 'correos_salientes'
+        indexes = [
+            # El worker busca: estado IN ('pendiente', 'enviando') AND siguiente_intento <= ahora
+            models.Index(fields=['estado', 'siguiente_intento'], name='correo_pendiente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.estado} ({self.intentos} intentos)"
+
+    def registrar_fallo(self, error):
+        """Programa un reintento con backoff exponencial (1, 2, 4, 8... min, máx. 1 h)."""
+        self.intentos += 1
+        self.ultimo_error = str(error)
+        if self.intentos >= self.MAX_INTENTOS:
+            self.estado = 'fallido'
+        else:
+            espera = min(2 ** (self.intentos - 1), 60)
+            self.siguiente_intento = timezone.now() + timedelta(minutes=espera)
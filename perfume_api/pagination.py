@@ -0,0 +1,44 @@
+# perfume_api/pagination.py
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+# ======================================================
+# 🔹 PAGINACIÓN POR CURSOR (KEYSET)
+# ======================================================
+# El cursor guarda la posición del último registro, así que las páginas
+# profundas usan el índice (WHERE id < x) en lugar de OFFSET, y no se
+# repiten ni saltan filas cuando entran inserciones nuevas.
+
+class IdCursorPagination(CursorPagination):
+    """Paginación por defecto: registros más recientes primero por id (PK)."""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        """
+        El orden pedido (?ordering=precio) más id como desempate: con valores
+        repetidos el cursor necesita un orden total, si no repite o se salta
+        filas entre páginas.
+        """
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        if any(campo.lstrip("-") in ("id", "pk") for campo in ordering):
+            return ordering
+        return (*ordering, "-id" if ordering[0].startswith("-") else "id")
+
+
+class FacturaCursorPagination(IdCursorPagination):
+    """Facturas por fecha descendente; id desempata facturas del mismo instante."""
+    ordering = ("-fecha", "-id")
+
+
+# ======================================================
+# 🔹 PAGINACIÓN POR NÚMERO DE PÁGINA
+# ======================================================
+
+class BusquedaPagination(PageNumberPagination):
+    """Resultados de búsqueda: el orden es la relevancia, no una columna, así que no admite cursor."""
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
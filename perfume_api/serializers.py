@@ -1,5 +1,10 @@
+import datetime
+from decimal import Decimal
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
+from django.utils import timezone
 from .models import Usuario, Marca, Tipo, Producto, Cliente, Factura, DetalleFactura
 
 
@@ -57,6 +62,113 @@ class ProductoSerializer(serializers.ModelSerializer):
         return value
 
 
+class ProductoBusquedaSerializer(ProductoSerializer):
+    relevancia = serializers.FloatField(read_only=True)
+
+    class Meta(ProductoSerializer.Meta):
+        fields = ProductoSerializer.Meta.fields + ["relevancia"]
+
+
+# ---------- REPRESENTACIÓN DESDE values() (listas de solo lectura) ----------
+# Para listas grandes: se leen solo las columnas pedidas con values() y cada
+# fila se arma con un dict, sin instanciar modelos ni pasar por los campos
+# de DRF. Los formatos son los mismos que usa el serializer: el JSON sale
+# idéntico (se compara con `manage.py medir_serializacion`).
+
+def decimal_texto(decimales):
+    """Como DecimalField de DRF: texto con `decimales` cifras ("45.00")."""
+    exponente = Decimal(1).scaleb(-decimales)
+
+    def formatear(valor):
+        if valor is None:
+            return None
+        # Lo normal: la base ya lo devuelve con `decimales` cifras y str() basta
+        texto = str(valor)
+        if decimales and texto[-decimales - 1:-decimales] == "." and "E" not in texto:
+            return texto
+        return "{:f}".format(Decimal(valor).quantize(exponente))
+    return formatear
+
+
+def fecha_iso(valor):
+    """Como DateTimeField de DRF: ISO 8601 (UTC con "Z")."""
+    if not valor:
+        return None
+    if settings.USE_TZ:
+        valor = timezone.localtime(valor) if timezone.is_aware(valor) else timezone.make_aware(valor)
+    elif timezone.is_aware(valor):
+        valor = timezone.make_naive(valor, datetime.timezone.utc)
+    texto = valor.isoformat()
+    return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+
+
+class RepresentacionValores:
+    """
+    `campos`: nombre en la respuesta → columna de values() o (columna, formato),
+    en el orden del serializer. `compactos`: campos de ?view=compact.
+    """
+
+    def __init__(self, campos, compactos=()):
+        self.campos = {
+            nombre: definicion if isinstance(definicion, tuple) else (definicion, None)
+            for nombre, definicion in campos.items()
+        }
+        self.compactos = [nombre for nombre in self.campos if nombre in compactos]
+
+    def elegir(self, parametros):
+        """
+        Campos pedidos con ?fields=a,b o ?view=compact (si vienen los dos
+        manda fields). Sin parámetros: todos, como el serializer.
+        """
+        vista = parametros.get("view")
+        if vista and (vista != "compact" or not self.compactos):
+            raise ValueError("view solo admite 'compact'" if self.compactos else "view no disponible")
+
+        pedidos = {campo.strip() for campo in parametros.get("fields", "").split(",") if campo.strip()}
+        if pedidos:
+            invalidos = pedidos - self.campos.keys()
+            if invalidos:
+                raise ValueError(
+                    f"Campos no válidos: {', '.join(sorted(invalidos))}. "
+                    f"Disponibles: {', '.join(self.campos)}"
+                )
+            return [nombre for nombre in self.campos if nombre in pedidos]
+        return list(self.compactos if vista else self.campos)
+
+    def columnas(self, nombres, extra=()):
+        """Columnas para values(): las de los campos y las `extra` (p. ej. las del orden)."""
+        columnas = [self.campos[nombre][0] for nombre in nombres]
+        return columnas + [columna for columna in extra if columna not in columnas]
+
+    def representar(self, filas, nombres):
+        campos = [(nombre, *self.campos[nombre]) for nombre in nombres]
+        return [
+            {nombre: formato(fila[columna]) if formato else fila[columna] for nombre, columna, formato in campos}
+            for fila in filas
+        ]
+
+
+PRODUCTO_VALORES = RepresentacionValores(
+    {
+        "id": "id",
+        "nombre": "nombre",
+        "descripcion": "descripcion",
+        "precio": ("precio", decimal_texto(Producto._meta.get_field("precio").decimal_places)),
+        "url_imagen": "url_imagen",
+        "stock": "stock",
+        "genero": "genero",
+        "created_at": ("created_at", fecha_iso),
+        "updated_at": ("updated_at", fecha_iso),
+        "marca": "marca_id",
+        "marca_nombre": "marca__nombre",
+        "tipo": "tipo_id",
+        "tipo_nombre": "tipo__nombre",
+    },
+    # 🖼️ Lo que necesita una miniatura de la grilla
+    compactos=["id", "nombre", "precio", "url_imagen", "stock"],
+)
+
+
 # ---------- SERIALIZER CLIENTE (Crear y Editar) ----------
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -88,6 +200,7 @@ class FacturaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Factura
         fields = "__all__"
+        read_only_fields = ["subtotal", "iva", "num_items"]
 
 
 class DetalleFacturaSerializer(serializers.ModelSerializer):
@@ -96,6 +209,30 @@ class DetalleFacturaSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+# Mismo orden que fields = "__all__" (las FK van al final)
+FACTURA_VALORES = RepresentacionValores({
+    "id": "id",
+    "total": ("total", decimal_texto(Factura._meta.get_field("total").decimal_places)),
+    "fecha": ("fecha", fecha_iso),
+    "metodo_pago": "metodo_pago",
+    "subtotal": ("subtotal", decimal_texto(Factura._meta.get_field("subtotal").decimal_places)),
+    "iva": ("iva", decimal_texto(Factura._meta.get_field("iva").decimal_places)),
+    "num_items": "num_items",
+    "cliente": "cliente_id",
+})
+
+DETALLE_FACTURA_VALORES = RepresentacionValores({
+    "id": "id",
+    "cantidad": "cantidad",
+    "precio_unitario": (
+        "precio_unitario", decimal_texto(DetalleFactura._meta.get_field("precio_unitario").decimal_places)
+    ),
+    "subtotal": ("subtotal", decimal_texto(DetalleFactura._meta.get_field("subtotal").decimal_places)),
+    "factura": "factura_id",
+    "producto": "producto_id",
+})
+
+
 # ---------- REGISTRO DE USUARIOS Y EMPLEADOS ----------
 class RegistroUsuarioSerializer(serializers.ModelSerializer):
     class Meta:
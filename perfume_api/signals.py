@@ -0,0 +1,27 @@
+# perfume_api/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidar_catalogo_al_confirmar
+from .models import Marca, Tipo, Producto
+
+
+# ==================== INVALIDACIÓN DEL CATÁLOGO ====================
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_modificado(sender, **kwargs):
+    # También el índice de búsqueda (las ventas solo invalidan el catálogo)
+    invalidar_catalogo_al_confirmar(productos=True)
+
+
+@receiver(post_save, sender=Marca)
+@receiver(post_delete, sender=Marca)
+def marca_modificada(sender, **kwargs):
+    # También el autocompletado, que muestra el nombre de la marca
+    invalidar_catalogo_al_confirmar(marcas=True)
+
+
+@receiver(post_save, sender=Tipo)
+@receiver(post_delete, sender=Tipo)
+def catalogo_modificado(sender, **kwargs):
+    invalidar_catalogo_al_confirmar()
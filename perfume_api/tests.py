@@ -0,0 +1,1487 @@
+# perfume_api/tests.py
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import Client, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import autocompletar as autocompletar_modulo
+from .autocompletar import autocompletar, calentar_autocompletar, calentar_autocompletar_en_segundo_plano
+from .busqueda import buscar_productos, indice_productos
+from .cache import CLAVE_MODIFICADO_CATALOGO, datos_con_revalidacion
+from .correos import PLAZO_ENVIO, encolar_correo, encolar_factura, procesar_pendientes
+from .dashboard_views import construir_analitica_dashboard
+from .facturas_pdf import MAX_PROCESOS_PDF, almacenamiento_pdf, huella_factura, invalidar_pdf_factura, leer_pdf_factura
+from .management.commands.explicar_consultas import Command as ExplicarConsultas
+from .models import CorreoSaliente, Cliente, DetalleFactura, Factura, Marca, Producto, Tipo, Usuario, VentaDiaria
+from .serializers import (
+    DETALLE_FACTURA_VALORES,
+    FACTURA_VALORES,
+    PRODUCTO_VALORES,
+    DetalleFacturaSerializer,
+    FacturaSerializer,
+    ProductoSerializer,
+)
+from .ventas import registrar_venta
+
+
+def crear_catalogo(num_productos, precio=Decimal('23.00'), stock=10):
+    """Marca, tipo y `num_productos` productos con el mismo precio y stock."""
+    marca = Marca.objects.create(nombre='Chanel')
+    tipo = Tipo.objects.create(nombre='Eau de Parfum')
+    Producto.objects.bulk_create([
+        Producto(nombre=f'Perfume {i}', marca=marca, tipo=tipo, precio=precio, stock=stock, descripcion='Notas florales')
+        for i in range(num_productos)
+    ])
+    return marca, tipo
+
+
+def datos_venta(usuario, producto, cantidad=1):
+    return {
+        'usuario_id': usuario.id,
+        'productos': [{'id': producto.id, 'cantidad': cantidad}],
+        'metodo_pago': 'tarjeta',
+        'cliente': {'email': usuario.email, 'nombre': 'Ana', 'apellido': 'Pérez', 'cedula': f'{usuario.id:010d}'},
+    }
+
+
+# ======================================================
+# 🔢 CONSULTAS POR PETICIÓN DEL CATÁLOGO
+# ======================================================
+# El número de consultas no debe crecer con el catálogo (sin N+1).
+
+class CatalogoConsultasTests(TestCase):
+    TAMANOS = (5, 60)
+
+    def setUp(self):
+        self.productos = 0
+
+    def crecer_hasta(self, tamano):
+        marca, _ = crear_catalogo(tamano - self.productos)
+        self.productos = tamano
+        return marca
+
+    def test_consultas_constantes(self):
+        for tamano in self.TAMANOS:
+            marca = self.crecer_hasta(tamano)
+            producto = Producto.objects.last()
+            # Agregado para ETag/Last-Modified + la página (marca y tipo en el mismo JOIN).
+            # ?marca= valida el id de la marca (ModelChoiceFilter) en el ETag y en la página.
+            for url, consultas in (
+                ('/api/productos/', 2),
+                ('/api/productos/?view=compact', 2),
+                (f'/api/productos/?ordering=precio&marca={marca.id}', 4),
+                (f'/api/productos/{producto.id}/', 2),
+                (f'/api/productos/marca/{marca.id}/', 2),
+                ('/api/marcas/', 1),
+                ('/api/tipos/', 1),
+            ):
+                with self.subTest(tamano=tamano, url=url):
+                    cache.clear()
+                    with self.assertNumQueries(consultas):
+                        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_segunda_peticion_desde_cache(self):
+        crear_catalogo(5)
+        cache.clear()
+        self.client.get('/api/productos/')
+        # Solo el agregado del ETag; la página sale del cache versionado
+        with self.assertNumQueries(1):
+            self.client.get('/api/productos/')
+
+
+# Sin collectstatic no hay manifiesto para las plantillas del admin
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminConsultasTests(TestCase):
+    """Los listados del admin anotan conteos y unen relaciones en la misma consulta."""
+    TAMANOS = (5, 40)
+
+    def setUp(self):
+        self.client.force_login(Usuario.objects.create_superuser(email='admin@example.com', password='clave'))
+        self.facturas = 0
+
+    def crecer_hasta(self, tamano):
+        marca, _ = crear_catalogo(tamano - self.facturas)
+        productos = list(Producto.objects.filter(marca=marca))
+        for i, producto in enumerate(productos, start=self.facturas):
+            cliente = Cliente.objects.create(
+                nombre='Cliente', apellido=str(i), email=f'cliente{i}@example.com', sexo='Mujer', password='x'
+            )
+            factura = Factura(cliente=cliente)
+            factura.aplicar_agregados(producto.precio * 2, 1)
+            factura.save()
+            DetalleFactura.objects.create(
+                factura=factura, producto=producto, cantidad=2, precio_unitario=producto.precio, subtotal=factura.total
+            )
+        self.facturas = tamano
+
+    def test_consultas_constantes(self):
+        # Sesión + usuario + conteos del paginador + la página (y date_hierarchy en facturas;
+        # marcas del list_filter en detalles, que salen con factura, producto y marca unidos)
+        listados = {'marca': 5, 'tipo': 5, 'cliente': 5, 'factura': 7, 'detallefactura': 6}
+        for tamano in self.TAMANOS:
+            self.crecer_hasta(tamano)
+            for modelo, consultas in listados.items():
+                with self.subTest(tamano=tamano, modelo=modelo):
+                    with self.assertNumQueries(consultas):
+                        respuesta = self.client.get(f'/admin/perfume_api/{modelo}/')
+                    self.assertEqual(respuesta.status_code, 200)
+
+    def test_detalles_filtrados_por_marca(self):
+        for tamano in self.TAMANOS:
+            self.crecer_hasta(tamano)
+            marca = Marca.objects.order_by('-id').first()
+            with self.subTest(tamano=tamano):
+                with self.assertNumQueries(6):
+                    respuesta = self.client.get(f'/admin/perfume_api/detallefactura/?producto__marca__id__exact={marca.id}')
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertContains(respuesta, 'ORD-')
+
+
+# ======================================================
+# 🔎 BÚSQUEDA Y ORDEN DEL CATÁLOGO
+# ======================================================
+
+class CatalogoOrdenBusquedaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def recorrer(self, url):
+        """Ids de todas las páginas siguiendo el cursor `next`."""
+        ids = []
+        while url:
+            datos = self.client.get(url).json()
+            ids.extend(producto['id'] for producto in datos['results'])
+            url = datos['next']
+        return ids
+
+    def test_orden_con_empates_no_repite_ni_salta(self):
+        # Siete productos con el mismo precio y nombres repetidos, en páginas de 2 y 3
+        marca, tipo = crear_catalogo(7, precio=Decimal('50.00'))
+        Producto.objects.create(nombre='Perfume 3', marca=marca, tipo=tipo, precio=Decimal('10.00'), stock=1)
+        # En PostgreSQL un UPDATE mueve la fila al final de la tabla: el orden
+        # físico de los empates deja de coincidir con el de id
+        Producto.objects.filter(id__in=Producto.objects.order_by('id').values('id')[:4]).update(stock=2)
+
+        for orden in ('precio', '-precio', 'nombre', '-nombre'):
+            esperado = list(Producto.objects.order_by(orden, ('-' if orden.startswith('-') else '') + 'id')
+                            .values_list('id', flat=True))
+            for tamano in (2, 3):
+                with self.subTest(orden=orden, tamano=tamano):
+                    self.assertEqual(self.recorrer(f'/api/productos/?ordering={orden}&page_size={tamano}'), esperado)
+
+    def test_search_por_texto_completo_y_marca(self):
+        marca, tipo = crear_catalogo(2)
+        dior = Marca.objects.create(nombre='Dior')
+        sauvage = Producto.objects.create(
+            nombre='Sauvage', marca=dior, tipo=tipo, precio=Decimal('90.00'), stock=1, descripcion='Notas de bergamota'
+        )
+        buscar = lambda texto: {p['id'] for p in self.client.get('/api/productos/', {'search': texto}).json()['results']}
+
+        self.assertEqual(buscar('sauvage'), {sauvage.id})
+        # Sin acentos y en la descripción
+        self.assertEqual(buscar('BERGAMOTA'), {sauvage.id})
+        # Por nombre de marca
+        self.assertEqual(buscar('dior'), {sauvage.id})
+        self.assertEqual(buscar('chanel'), set(Producto.objects.filter(marca=marca).values_list('id', flat=True)))
+        self.assertEqual(buscar('inexistente'), set())
+
+
+# ======================================================
+# 📄 FORMATO DE LAS RESPUESTAS PAGINADAS
+# ======================================================
+# Los listados del router paginan por cursor: {next, previous, results}, sin
+# `count` ni ?page=. Las apps móviles dependen de este formato.
+
+class RespuestaPaginadaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(3)
+        Marca.objects.create(nombre='Dior')
+        Tipo.objects.create(nombre='Eau de Toilette')
+        producto = Producto.objects.first()
+        for i in range(3):
+            cliente = Cliente.objects.create(
+                nombre='Cliente', apellido=str(i), email=f'cliente{i}@example.com', sexo='Mujer', password='x'
+            )
+            factura = Factura.objects.create(cliente=cliente, total=Decimal('23.00'))
+            DetalleFactura.objects.create(
+                factura=factura, producto=producto, cantidad=1, precio_unitario=Decimal('23.00'), subtotal=Decimal('23.00')
+            )
+        self.api = APIClient()
+        self.api.force_authenticate(Usuario.objects.create_superuser(email='admin@example.com', password='clave'))
+
+    def test_formato_cursor(self):
+        for ruta in ('productos', 'marcas', 'tipos', 'facturas', 'detalles', 'clientes'):
+            with self.subTest(ruta=ruta):
+                primera = self.api.get(f'/api/{ruta}/', {'page_size': 1}).json()
+                self.assertEqual(set(primera), {'next', 'previous', 'results'})
+                self.assertIsNone(primera['previous'])
+                self.assertEqual(len(primera['results']), 1)
+                self.assertIn('cursor=', primera['next'])
+
+                segunda = self.api.get(primera['next']).json()
+                self.assertEqual(set(segunda), {'next', 'previous', 'results'})
+                self.assertIn('cursor=', segunda['previous'])
+                self.assertNotEqual(segunda['results'], primera['results'])
+
+    def test_ultima_pagina_sin_next(self):
+        datos = self.api.get('/api/productos/').json()
+        self.assertIsNone(datos['next'])
+        self.assertIsNone(datos['previous'])
+        self.assertEqual(len(datos['results']), 3)
+
+    def test_page_no_pagina(self):
+        # ?page= ya no existe: se ignora y devuelve la primera página
+        primera = self.api.get('/api/productos/', {'page_size': 1}).json()
+        self.assertEqual(self.api.get('/api/productos/', {'page_size': 1, 'page': 2}).json()['results'], primera['results'])
+
+
+# ======================================================
+# 🔁 GET CONDICIONALES DEL CATÁLOGO
+# ======================================================
+
+class CatalogoCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.marca, _ = crear_catalogo(3)
+        # Último cambio del catálogo mucho antes que los updated_at de las pruebas
+        cache.set(CLAVE_MODIFICADO_CATALOGO, datetime(2026, 1, 1).timestamp(), None)
+
+    def revalidar_tras(self, cambio):
+        """Respuesta a If-Modified-Since (sin ETag) con la fecha de antes de `cambio`."""
+        anterior = self.client.get('/api/productos/')
+        with self.captureOnCommitCallbacks(execute=True):
+            cambio()
+        return anterior, self.client.get('/api/productos/', HTTP_IF_MODIFIED_SINCE=anterior['Last-Modified'])
+
+    def test_last_modified_en_hora_local(self):
+        # updated_at se guarda en hora local (USE_TZ=False): 10:46 en Guayaquil son 15:46 UTC
+        local = datetime(2026, 3, 10, 10, 46, 0)
+        Producto.objects.update(updated_at=local)
+
+        respuesta = self.client.get('/api/productos/')
+        esperado = timezone.make_aware(local, timezone.get_current_timezone())
+        self.assertEqual(parse_http_date(respuesta['Last-Modified']), int(esperado.timestamp()))
+
+    def test_revalida_siempre(self):
+        respuesta = self.client.get('/api/productos/')
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+        no_modificado = self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertIn('no-cache', no_modificado['Cache-Control'])
+
+    def test_if_modified_since_tras_un_cambio(self):
+        Producto.objects.update(updated_at=datetime(2026, 3, 10, 10, 0, 0))
+        anterior = self.client.get('/api/productos/')['Last-Modified']
+
+        # Un cambio una hora después debe invalidar la copia del cliente
+        Producto.objects.filter(id=Producto.objects.first().id).update(updated_at=datetime(2026, 3, 10, 11, 0, 0))
+        respuesta = self.client.get('/api/productos/', HTTP_IF_MODIFIED_SINCE=anterior)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['Last-Modified'], anterior)
+
+    def test_if_modified_since_tras_renombrar_la_marca(self):
+        # Renombrar la marca no toca updated_at de los productos
+        Producto.objects.update(updated_at=datetime(2026, 3, 10, 10, 0, 0))
+        self.marca.nombre = 'Dior'
+        anterior, respuesta = self.revalidar_tras(self.marca.save)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual({p['marca_nombre'] for p in respuesta.json()['results']}, {'Dior'})
+        self.assertGreater(parse_http_date(respuesta['Last-Modified']), parse_http_date(anterior['Last-Modified']))
+
+    def test_if_modified_since_tras_borrar_un_producto(self):
+        # Se borra justo el más reciente: max(updated_at) baja
+        Producto.objects.update(updated_at=datetime(2026, 3, 10, 10, 0, 0))
+        reciente = Producto.objects.first()
+        Producto.objects.filter(id=reciente.id).update(updated_at=datetime(2026, 3, 10, 11, 0, 0))
+        anterior, respuesta = self.revalidar_tras(reciente.delete)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['results']), 2)
+        self.assertGreater(parse_http_date(respuesta['Last-Modified']), parse_http_date(anterior['Last-Modified']))
+
+
+# ======================================================
+# 🔎 ÍNDICE DE BÚSQUEDA EN MEMORIA
+# ======================================================
+
+class IndiceBusquedaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(3, stock=5)
+        self.producto = Producto.objects.order_by('id').first()
+
+    def test_una_venta_no_reconstruye_el_indice(self):
+        indice = indice_productos()
+        usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(
+                '/api/ventas/procesar/', datos_venta(usuario, self.producto), content_type='application/json'
+            )
+        self.assertEqual(respuesta.status_code, 201)
+
+        self.assertIs(indice_productos(), indice)
+        # El catálogo sí se invalidó: la búsqueda muestra el stock nuevo
+        resultados = self.client.get('/api/productos/buscar/', {'q': 'perfume'}).json()['results']
+        self.assertEqual({p['id']: p['stock'] for p in resultados}[self.producto.id], 4)
+
+    def test_editar_un_producto_reconstruye_el_indice(self):
+        indice = indice_productos()
+        self.producto.nombre = 'Sauvage Elixir'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+
+        nuevo = indice_productos()
+        self.assertIsNot(nuevo, indice)
+        self.assertEqual([pid for pid, _ in nuevo.buscar('sauvage')], [self.producto.id])
+
+
+# ======================================================
+# 🐘 BÚSQUEDA DE TEXTO COMPLETO EN POSTGRESQL
+# ======================================================
+
+@skipUnless(connection.vendor == 'postgresql', "Búsqueda de texto completo solo en PostgreSQL")
+class BusquedaPostgresTests(TestCase):
+    def setUp(self):
+        marca = Marca.objects.create(nombre='Chanel')
+        tipo = Tipo.objects.create(nombre='Eau de Parfum')
+        crear = lambda nombre, descripcion: Producto.objects.create(
+            nombre=nombre, marca=marca, tipo=tipo, precio=Decimal('50.00'), stock=1, descripcion=descripcion
+        )
+        self.en_nombre = crear('Jazmín Imperial', 'Notas cítricas')
+        self.en_descripcion = crear('Noche de Verano', 'Corazón de jazmín y flores blancas')
+        self.otro = crear('Bergamota Fresca', 'Notas cítricas')
+
+    def buscar(self, texto):
+        return [producto.id for producto in buscar_productos(texto)]
+
+    def test_nombre_pesa_mas_que_descripcion(self):
+        self.assertEqual(self.buscar('jazmín'), [self.en_nombre.id, self.en_descripcion.id])
+
+    def test_sin_acentos_ni_mayusculas(self):
+        for texto in ('jazmin', 'JAZMÍN', 'corazon'):
+            with self.subTest(texto=texto):
+                self.assertIn(self.en_descripcion.id, self.buscar(texto))
+        self.assertEqual(self.buscar('citricas'), sorted([self.en_nombre.id, self.otro.id], reverse=True))
+
+    def test_relevancia_y_todos_los_terminos(self):
+        productos = list(buscar_productos('jazmin flores'))
+        self.assertEqual([p.id for p in productos], [self.en_descripcion.id])
+        self.assertGreater(productos[0].relevancia, 0)
+        self.assertEqual(self.buscar('vainilla'), [])
+
+    def test_explain_usa_el_indice_gin(self):
+        comando = ExplicarConsultas()
+        consultas = comando.consultas_con_indice()
+        self.assertIn('producto_busqueda_gin', [indice for _, _, indice in consultas])
+        for nombre, queryset, indice in consultas:
+            with self.subTest(nombre):
+                self.assertTrue(comando.usa_indice(comando.explicar(queryset), indice))
+
+
+# ======================================================
+# 🔤 AUTOCOMPLETADO EN MEMORIA
+# ======================================================
+
+class AutocompletarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # El índice es global del worker: cada prueba parte de uno vacío
+        for nombre in ('_indice', '_version', '_marca_agua'):
+            parche = mock.patch.object(autocompletar_modulo, nombre, None)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+        self.chanel, tipo = crear_catalogo(0)
+        self.dior = Marca.objects.create(nombre='Dior')
+        self.sauvage = Producto.objects.create(
+            nombre='Sauvage Elixir', marca=self.dior, tipo=tipo, precio=Decimal('120.00'), stock=5, descripcion='Especiado'
+        )
+        self.bleu = Producto.objects.create(
+            nombre='Bleu de Chanel', marca=self.chanel, tipo=tipo, precio=Decimal('110.00'), stock=5, descripcion='Amaderado'
+        )
+
+    def buscar(self, texto):
+        respuesta = self.client.get('/api/productos/autocompletar/', {'q': texto})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_completa_por_prefijo(self):
+        # Al inicio del nombre o de cualquiera de sus palabras, sin acentos ni mayúsculas
+        self.assertEqual(
+            self.buscar('SAUV')['productos'],
+            [{'id': self.sauvage.id, 'nombre': 'Sauvage Elixir', 'marca_id': self.dior.id, 'marca': 'Dior'}],
+        )
+        resultado = self.buscar('chan')
+        self.assertEqual(resultado['marcas'], [{'id': self.chanel.id, 'nombre': 'Chanel'}])
+        self.assertEqual([p['id'] for p in resultado['productos']], [self.bleu.id])
+        self.assertEqual(self.buscar('élix')['productos'][0]['id'], self.sauvage.id)
+
+    def test_corrige_errores_de_tipeo(self):
+        self.assertEqual([p['id'] for p in self.buscar('suavage')['productos']], [self.sauvage.id])
+        self.assertEqual([m['nombre'] for m in self.buscar('doir')['marcas']], ['Dior'])
+        self.assertEqual(self.buscar('xyzw'), {'marcas': [], 'productos': []})
+
+    def test_renombrar_una_marca_llega_al_indice(self):
+        self.assertEqual(self.buscar('sauv')['productos'][0]['marca'], 'Dior')
+
+        self.dior.nombre = 'Christian Dior'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dior.save()
+
+        self.assertEqual([m['nombre'] for m in self.buscar('christ')['marcas']], ['Christian Dior'])
+        self.assertEqual(self.buscar('sauv')['productos'][0]['marca'], 'Christian Dior')
+
+    def test_nuevo_producto_llega_al_indice(self):
+        self.buscar('sauv')
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Producto.objects.create(
+                nombre='Sauvage Parfum', marca=self.dior, tipo=self.sauvage.tipo, precio=Decimal('130.00'), stock=5
+            )
+        self.assertEqual([p['id'] for p in self.buscar('sauv')['productos']], [self.sauvage.id, nuevo.id])
+
+    def test_una_venta_no_consulta_la_base(self):
+        autocompletar('sauv')
+        usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(
+                '/api/ventas/procesar/', datos_venta(usuario, self.sauvage), content_type='application/json'
+            )
+        self.assertEqual(respuesta.status_code, 201)
+
+        # La venta solo cambió el stock: el índice sigue vigente sin consultar
+        with self.assertNumQueries(0):
+            self.assertEqual(autocompletar('sauv')['productos'][0]['id'], self.sauvage.id)
+
+    def test_precargar_no_falla_si_la_base_no_responde(self):
+        with mock.patch('perfume_api.autocompletar.indice_autocompletar', side_effect=RuntimeError('sin conexión')) as indice, \
+                mock.patch('builtins.print') as imprimir:
+            calentar_autocompletar()
+
+        indice.assert_called_once()
+        self.assertIn('sin conexión', imprimir.call_args.args[0])
+
+    def test_precargar_en_segundo_plano_no_bloquea(self):
+        listo = threading.Event()
+
+        with mock.patch('perfume_api.autocompletar.indice_autocompletar', side_effect=lambda: listo.wait(5)), \
+                mock.patch('perfume_api.autocompletar.connections.close_all') as cerrar:
+            hilo = calentar_autocompletar_en_segundo_plano()
+            # El arranque del worker ya siguió mientras el índice sigue cargando
+            self.assertTrue(hilo.is_alive())
+            self.assertTrue(hilo.daemon)
+            listo.set()
+            hilo.join(5)
+
+        self.assertFalse(hilo.is_alive())
+        cerrar.assert_called_once()
+
+
+# ======================================================
+# 🧾 HISTORIAL DE COMPRAS DEL USUARIO
+# ======================================================
+
+class HistorialFacturasTests(TestCase):
+    def setUp(self):
+        marca, tipo = crear_catalogo(2)
+        self.productos = list(Producto.objects.order_by('id'))
+        self.usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+        self.cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+        self.url = f'/api/usuarios/{self.usuario.id}/facturas/'
+
+    def crear_facturas(self, fechas):
+        """Una factura con dos líneas por cada fecha, en ese orden de id."""
+        facturas = []
+        for fecha in fechas:
+            factura = Factura.objects.create(cliente=self.cliente, total=Decimal('46.00'))
+            Factura.objects.filter(id=factura.id).update(fecha=fecha)
+            DetalleFactura.objects.bulk_create([
+                DetalleFactura(factura=factura, producto=producto, cantidad=1,
+                               precio_unitario=Decimal('23.00'), subtotal=Decimal('23.00'))
+                for producto in self.productos
+            ])
+            facturas.append(factura)
+        return facturas
+
+    def recorrer(self, limite):
+        """Ids de todas las páginas siguiendo `siguiente` como `antes`."""
+        ids, antes = [], None
+        while len(ids) <= Factura.objects.count():  # tope por si la paginación se repite
+            parametros = {'limite': limite, **({'antes': antes} if antes else {})}
+            datos = self.client.get(self.url, parametros).json()
+            ids.extend(factura['id'] for factura in datos['facturas'])
+            antes = datos['siguiente']
+            if antes is None:
+                break
+        return ids
+
+    def test_consultas_constantes(self):
+        base = datetime(2026, 3, 1, 12, 0)
+        for cantidad in (3, 25):
+            Factura.objects.all().delete()
+            facturas = self.crear_facturas([base + timedelta(hours=i) for i in range(cantidad)])
+            with self.subTest(facturas=cantidad):
+                with self.assertNumQueries(4):
+                    datos = self.client.get(self.url, {'limite': 20}).json()
+                self.assertEqual(len(datos['facturas']), min(cantidad, 20))
+                self.assertEqual(len(datos['facturas'][0]['productos']), 2)
+                with self.assertNumQueries(4):
+                    self.client.get(self.url, {'limite': 2, 'antes': facturas[-1].id})
+
+    def test_empates_en_fecha_no_repiten_ni_saltan(self):
+        # Cinco facturas en el mismo segundo entre dos de otras fechas
+        mismo_momento = datetime(2026, 3, 1, 12, 0)
+        self.crear_facturas(
+            [mismo_momento + timedelta(days=1)] + [mismo_momento] * 5 + [mismo_momento - timedelta(days=1)]
+        )
+        esperado = list(Factura.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+
+        for limite in (1, 2, 3, 20):
+            with self.subTest(limite=limite):
+                self.assertEqual(self.recorrer(limite), esperado)
+
+    def test_parametros_invalidos(self):
+        for parametros in ({'limite': 'abc'}, {'antes': 'x'}, {'limite': '2.5'}, {'limite': 0}, {'limite': -3}):
+            with self.subTest(**parametros):
+                respuesta = self.client.get(self.url, parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.json())
+
+    def test_limite_maximo(self):
+        self.crear_facturas([datetime(2026, 3, 1) + timedelta(hours=i) for i in range(3)])
+        datos = self.client.get(self.url, {'limite': 1000}).json()
+        self.assertEqual(len(datos['facturas']), 3)
+        self.assertIsNone(datos['siguiente'])
+
+
+# ======================================================
+# 🧾 FACTURAS: DESGLOSE DEL IVA
+# ======================================================
+
+class DesgloseIvaTests(TestCase):
+    """total incluye IVA: subtotal = total / 1.15 e iva = total - subtotal, venga de la app o del admin."""
+
+    def setUp(self):
+        crear_catalogo(1, precio=Decimal('23.00'))
+        self.producto = Producto.objects.get()
+
+    def test_venta_de_la_app(self):
+        usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+        respuesta = self.client.post(
+            '/api/ventas/procesar/', datos_venta(usuario, self.producto, cantidad=3), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+
+        factura = Factura.objects.get()
+        self.assertEqual(factura.total, Decimal('69.00'))
+        self.assertEqual(factura.subtotal, Decimal('60.00'))
+        self.assertEqual(factura.iva, Decimal('9.00'))
+        self.assertEqual(factura.num_items, 1)
+
+    def crear_factura_admin(self):
+        admin = Usuario.objects.create_superuser(email='admin@example.com', password='clave')
+        cliente = Cliente.objects.create(nombre='Eva', apellido='Ruiz', email='eva@example.com', sexo='Mujer', password='x')
+        self.client.force_login(admin)
+
+        return self.client.post('/admin/perfume_api/factura/add/', {
+            'cliente': cliente.id,
+            'metodo_pago': 'efectivo',
+            'detallefactura_set-TOTAL_FORMS': '1',
+            'detallefactura_set-INITIAL_FORMS': '0',
+            'detallefactura_set-0-producto': self.producto.id,
+            'detallefactura_set-0-cantidad': '3',
+        })
+
+    def test_factura_del_admin(self):
+        self.assertEqual(self.crear_factura_admin().status_code, 302)
+
+        factura = Factura.objects.get()
+        # Las líneas del admin guardan precios sin IVA (20.00 × 3)
+        self.assertEqual(DetalleFactura.objects.get().subtotal, Decimal('60.00'))
+        self.assertEqual((factura.total, factura.subtotal, factura.iva), (Decimal('69.00'), Decimal('60.00'), Decimal('9.00')))
+
+    def test_subtotal_mas_iva_es_el_total(self):
+        factura = Factura()
+        for total in ('0.01', '10.00', '99.99', '1234.57'):
+            factura.aplicar_agregados(Decimal(total), 1)
+            self.assertEqual(factura.subtotal + factura.iva, Decimal(total))
+
+    def test_verificar_facturas_detecta_desglose_incorrecto(self):
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+        factura = Factura(cliente=cliente, total=Decimal('69.00'))
+        factura.aplicar_agregados(factura.total, 1)
+        factura.save()
+        DetalleFactura.objects.create(
+            factura=factura, producto=self.producto, cantidad=3, precio_unitario=Decimal('23.00'), subtotal=Decimal('69.00')
+        )
+        # El cálculo anterior: subtotal = total de las líneas con IVA y el IVA encima
+        Factura.objects.filter(id=factura.id).update(subtotal=Decimal('69.00'), iva=Decimal('10.35'))
+
+        # Sin --corregir termina con error (código de salida distinto de 0)
+        with self.assertRaisesMessage(CommandError, '1 de 1 facturas con diferencias'):
+            call_command('verificar_facturas', stdout=StringIO())
+
+        call_command('verificar_facturas', '--corregir', stdout=StringIO())
+        factura.refresh_from_db()
+        self.assertEqual((factura.subtotal, factura.iva), (Decimal('60.00'), Decimal('9.00')))
+        call_command('verificar_facturas', stdout=StringIO())
+
+    def test_verificar_facturas_detecta_total_distinto_a_las_lineas(self):
+        self.assertEqual(self.crear_factura_admin().status_code, 302)
+        # Líneas del admin sin IVA (60.00): el total válido es 69.00
+        call_command('verificar_facturas', stdout=StringIO())
+
+        factura = Factura.objects.get()
+        factura.aplicar_agregados(Decimal('80.00'), 1)
+        factura.save()
+
+        salida = StringIO()
+        # --corregir no lo repara solo: no se sabe si falla el total o las líneas
+        with self.assertRaisesMessage(CommandError, '1 de 1 facturas con total distinto a sus líneas'):
+            call_command('verificar_facturas', '--corregir', stdout=salida)
+        self.assertIn('total=80.00 no cuadra', salida.getvalue())
+
+    def test_lineas_de_solo_lectura_en_el_admin(self):
+        self.assertEqual(self.crear_factura_admin().status_code, 302)
+        detalle = DetalleFactura.objects.get()
+
+        # Editar o borrar una línea suelta dejaría viejos el total, el PDF y el rollup
+        respuesta = self.client.post(f'/admin/perfume_api/detallefactura/{detalle.id}/change/', {
+            'factura': detalle.factura_id, 'producto': self.producto.id, 'cantidad': '9',
+        })
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertEqual(self.client.post(f'/admin/perfume_api/detallefactura/{detalle.id}/delete/', {'post': 'yes'}).status_code, 403)
+        self.assertEqual(self.client.get('/admin/perfume_api/detallefactura/add/').status_code, 403)
+
+        detalle.refresh_from_db()
+        self.assertEqual(detalle.cantidad, 3)
+
+    def test_analitica_en_una_sola_base(self):
+        # Una venta de la app (líneas con IVA) y una del admin (líneas sin IVA)
+        usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/ventas/procesar/', datos_venta(usuario, self.producto, cantidad=3), content_type='application/json'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.crear_factura_admin().status_code, 302)
+
+        analitica = construir_analitica_dashboard(30)
+        suma = lambda filas: sum(Decimal(fila['ingresos']) for fila in filas)
+        # 69.00 + 69.00: los paneles suman lo mismo que los totales de las facturas
+        self.assertEqual(suma(analitica['metodos_pago']), Decimal('138.00'))
+        self.assertEqual(suma(analitica['top_productos_ingresos']), Decimal('138.00'))
+        self.assertEqual(suma(analitica['top_marcas_ingresos']), Decimal('138.00'))
+        self.assertEqual(suma(analitica['generos']), Decimal('138.00'))
+        self.assertEqual(analitica['top_productos_ingresos'][0]['unidades'], 6)
+
+
+# ======================================================
+# 🧾 PDF DE LA FACTURA (uno por versión)
+# ======================================================
+
+class PdfFacturaTests(TestCase):
+    def setUp(self):
+        # En disco: InMemoryStorage es un almacenamiento nuevo en cada llamada
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ajustes = override_settings(FACTURAS_PDF_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': directorio},
+        })
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        crear_catalogo(1)
+        self.producto = Producto.objects.get()
+        self.cliente = Cliente.objects.create(
+            nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x', cedula='0102030405'
+        )
+        factura = Factura(cliente=self.cliente, total=Decimal('46.00'), metodo_pago='tarjeta')
+        factura.aplicar_agregados(factura.total, 1)
+        factura.save()
+        self.detalle = DetalleFactura.objects.create(
+            factura=factura, producto=self.producto, cantidad=2, precio_unitario=Decimal('23.00'), subtotal=Decimal('46.00')
+        )
+        self.factura_id = factura.id
+
+    def factura(self):
+        return Factura.objects.select_related('cliente').get(id=self.factura_id)
+
+    def test_huella_cambia_con_todo_lo_que_se_dibuja(self):
+        cambios = {
+            'nombre del cliente': lambda: Cliente.objects.filter(id=self.cliente.id).update(nombre='Eva'),
+            'apellido': lambda: Cliente.objects.filter(id=self.cliente.id).update(apellido='Gómez'),
+            'email': lambda: Cliente.objects.filter(id=self.cliente.id).update(email='eva@example.com'),
+            'cédula': lambda: Cliente.objects.filter(id=self.cliente.id).update(cedula='0999999999'),
+            'celular': lambda: Cliente.objects.filter(id=self.cliente.id).update(celular='0991234567'),
+            'dirección': lambda: Cliente.objects.filter(id=self.cliente.id).update(direccion='Av. Amazonas'),
+            'fecha': lambda: Factura.objects.filter(id=self.factura_id).update(fecha=datetime(2025, 1, 2, 10, 0)),
+            'método de pago': lambda: Factura.objects.filter(id=self.factura_id).update(metodo_pago='efectivo'),
+            'nombre del producto': lambda: Producto.objects.filter(id=self.producto.id).update(nombre='Sauvage'),
+            'cantidad': lambda: DetalleFactura.objects.filter(id=self.detalle.id).update(cantidad=3),
+        }
+        huellas = {huella_factura(self.factura())}
+        for campo, cambiar in cambios.items():
+            with self.subTest(campo=campo):
+                cambiar()
+                huella = huella_factura(self.factura())
+                self.assertNotIn(huella, huellas)
+                huellas.add(huella)
+
+    def test_misma_huella_con_detalles_precargados(self):
+        factura = self.factura()
+        detalles = list(factura.detallefactura_set.select_related('producto').order_by('id'))
+        self.assertEqual(huella_factura(factura, detalles), huella_factura(factura))
+
+    def test_corregir_el_cliente_regenera_el_pdf(self):
+        with mock.patch('perfume_api.facturas_pdf.renderizar_pdf_factura', return_value=b'%PDF-ana') as renderizar:
+            self.assertEqual(leer_pdf_factura(self.factura()), b'%PDF-ana')
+            self.assertEqual(leer_pdf_factura(self.factura()), b'%PDF-ana')
+            self.assertEqual(renderizar.call_count, 1)
+
+            Cliente.objects.filter(id=self.cliente.id).update(email='eva@example.com')
+            renderizar.return_value = b'%PDF-eva'
+            self.assertEqual(leer_pdf_factura(self.factura()), b'%PDF-eva')
+            self.assertEqual(renderizar.call_args.args[0].cliente.email, 'eva@example.com')
+
+        invalidar_pdf_factura(self.factura())
+        self.assertEqual(len(almacenamiento_pdf().listdir(str(self.factura_id))[1]), 1)
+
+
+# ======================================================
+# 🗜️ EXPORTACIÓN DE FACTURAS EN ZIP
+# ======================================================
+
+@override_settings(FACTURAS_PDF_STORAGE={'BACKEND': 'django.core.files.storage.InMemoryStorage'})
+class ExportarFacturasZipTests(TestCase):
+    URL = '/api/admin/facturas/exportar-zip/'
+
+    def setUp(self):
+        crear_catalogo(1)
+        producto = Producto.objects.get()
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+        self.facturas = {}
+        # Bordes del mes: el primer y el último instante de noviembre, y el siguiente
+        for fecha in (datetime(2025, 10, 31, 23, 59, 59), datetime(2025, 11, 1, 0, 0), datetime(2025, 11, 30, 23, 59, 59),
+                      datetime(2025, 12, 1, 0, 0)):
+            factura = Factura(cliente=cliente, total=Decimal('23.00'))
+            factura.aplicar_agregados(factura.total, 1)
+            factura.save()
+            Factura.objects.filter(id=factura.id).update(fecha=fecha)
+            DetalleFactura.objects.create(
+                factura=factura, producto=producto, cantidad=1, precio_unitario=Decimal('23.00'), subtotal=Decimal('23.00')
+            )
+            self.facturas[fecha] = factura.id
+
+        self.cliente_api = APIClient()
+        self.cliente_api.force_authenticate(Usuario.objects.create_superuser(email='admin@example.com', password='clave'))
+
+    def descargar(self, **parametros):
+        respuesta = self.cliente_api.get(self.URL, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(respuesta.streaming_content))) as archivo:
+            return sorted(archivo.namelist()), archivo.read(archivo.namelist()[0]) if archivo.namelist() else b''
+
+    def nombres(self, *fechas):
+        return sorted(f'Factura_ORD-{self.facturas[fecha]:06d}.pdf' for fecha in fechas)
+
+    def test_zip_del_mes(self):
+        with mock.patch('perfume_api.facturas_pdf.multiprocessing.get_context') as contexto:
+            nombres, pdf = self.descargar(mes='2025-11')
+
+        self.assertEqual(nombres, self.nombres(datetime(2025, 11, 1, 0, 0), datetime(2025, 11, 30, 23, 59, 59)))
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        # Dos PDFs se dibujan aquí mismo: no vale la pena arrancar procesos
+        contexto.assert_not_called()
+
+    def test_exportacion_grande_usa_pocos_procesos(self):
+        with mock.patch('perfume_api.facturas_pdf.MIN_PDFS_PARA_POOL', 2), \
+                mock.patch('perfume_api.facturas_pdf.multiprocessing.cpu_count', return_value=32), \
+                mock.patch('perfume_api.facturas_pdf.multiprocessing.get_context') as contexto:
+            pool = contexto.return_value.Pool.return_value
+            pool.map.side_effect = lambda funcion, datos: list(map(funcion, datos))
+            nombres, _ = self.descargar(mes='2025-11')
+
+        self.assertEqual(len(nombres), 2)
+        contexto.return_value.Pool.assert_called_once_with(MAX_PROCESOS_PDF)
+        pool.terminate.assert_called_once()
+
+    def test_zip_por_rango_de_dias(self):
+        nombres, _ = self.descargar(desde='2025-10-31', hasta='2025-11-01')
+        self.assertEqual(nombres, self.nombres(datetime(2025, 10, 31, 23, 59, 59), datetime(2025, 11, 1, 0, 0)))
+
+    def test_mes_invalido(self):
+        for parametros in ({'mes': '2025-13'}, {'mes': 'noviembre'}, {'desde': '2025-11-31'}):
+            with self.subTest(**parametros):
+                respuesta = self.cliente_api.get(self.URL, parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.json())
+
+    def test_solo_administradores(self):
+        self.assertEqual(APIClient().get(self.URL, {'mes': '2025-11'}).status_code, 401)
+
+        cliente_api = APIClient()
+        cliente_api.force_authenticate(Usuario.objects.create_user(email='ana@example.com', password='clave'))
+        self.assertEqual(cliente_api.get(self.URL, {'mes': '2025-11'}).status_code, 403)
+
+
+# ======================================================
+# 📊 ROLLUP DE VENTAS DIARIAS
+# ======================================================
+
+class VentasDiariasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(2, stock=50)
+        self.a, self.b = Producto.objects.order_by('id')
+        self.cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+
+    def crear_factura(self, fecha, metodo_pago, lineas):
+        """Factura con `fecha` fija que no pasa por el rollup (como las cargadas a mano)."""
+        factura = Factura.objects.create(
+            cliente=self.cliente, metodo_pago=metodo_pago,
+            total=sum(producto.precio * cantidad for producto, cantidad in lineas),
+        )
+        Factura.objects.filter(id=factura.id).update(fecha=fecha)
+        factura.fecha = fecha
+        DetalleFactura.objects.bulk_create([
+            DetalleFactura(factura=factura, producto=producto, cantidad=cantidad,
+                           precio_unitario=producto.precio, subtotal=producto.precio * cantidad)
+            for producto, cantidad in lineas
+        ])
+        return factura
+
+    def rollup(self):
+        return {(fila.fecha, fila.metodo_pago): (fila.total, fila.ordenes, fila.unidades)
+                for fila in VentaDiaria.objects.all()}
+
+    def sumas_de_las_facturas(self):
+        """Lo mismo que el rollup, sumado en Python factura por factura."""
+        sumas = defaultdict(lambda: [Decimal('0.00'), 0, 0])
+        for factura in Factura.objects.prefetch_related('detallefactura_set'):
+            fila = sumas[(factura.fecha.date(), factura.metodo_pago)]
+            fila[0] += factura.total
+            fila[1] += 1
+            fila[2] += sum(detalle.cantidad for detalle in factura.detallefactura_set.all())
+        return {clave: tuple(valores) for clave, valores in sumas.items()}
+
+    def sembrar(self):
+        # Incluye facturas justo antes y justo después de medianoche
+        for fecha, metodo_pago, lineas in (
+            (datetime(2026, 3, 9, 23, 59, 59), 'efectivo', [(self.a, 1)]),
+            (datetime(2026, 3, 10, 0, 0, 0), 'efectivo', [(self.a, 2), (self.b, 1)]),
+            (datetime(2026, 3, 10, 12, 30), 'tarjeta', [(self.b, 3)]),
+            (datetime(2026, 3, 10, 18, 0), 'efectivo', [(self.b, 1)]),
+            (datetime(2026, 3, 12, 9, 15), 'transferencia', [(self.a, 1), (self.b, 1)]),
+        ):
+            self.crear_factura(fecha, metodo_pago, lineas)
+
+    def test_reconstruir_coincide_con_las_facturas(self):
+        self.sembrar()
+        # Una fila desactualizada y otra de un día sin ventas
+        VentaDiaria.objects.create(fecha=date(2026, 3, 10), metodo_pago='efectivo', total=Decimal('1.00'), ordenes=1, unidades=1)
+        VentaDiaria.objects.create(fecha=date(2026, 3, 11), metodo_pago='tarjeta', total=Decimal('5.00'), ordenes=1, unidades=1)
+
+        call_command('reconstruir_ventas_diarias', stdout=StringIO())
+
+        self.assertEqual(self.rollup(), self.sumas_de_las_facturas())
+        self.assertEqual(self.rollup()[(date(2026, 3, 10), 'efectivo')], (Decimal('92.00'), 2, 4))
+
+    def test_reconstruir_desde_una_fecha(self):
+        self.sembrar()
+        antigua = VentaDiaria.objects.create(
+            fecha=date(2026, 3, 9), metodo_pago='efectivo', total=Decimal('1.00'), ordenes=1, unidades=1
+        )
+
+        call_command('reconstruir_ventas_diarias', '--desde', '2026-03-10', stdout=StringIO())
+
+        esperado = self.sumas_de_las_facturas()
+        esperado[(antigua.fecha, 'efectivo')] = (Decimal('1.00'), 1, 1)
+        self.assertEqual(self.rollup(), esperado)
+
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_ventas_diarias', '--desde', '10/03/2026', stdout=StringIO())
+
+    def test_ventas_de_la_api_coinciden_con_la_reconstruccion(self):
+        usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+        for producto, cantidad in ((self.a, 2), (self.b, 1), (self.a, 1)):
+            respuesta = self.client.post(
+                '/api/ventas/procesar/', datos_venta(usuario, producto, cantidad), content_type='application/json'
+            )
+            self.assertEqual(respuesta.status_code, 201)
+
+        incremental = self.rollup()
+        self.assertEqual(incremental, self.sumas_de_las_facturas())
+        call_command('reconstruir_ventas_diarias', stdout=StringIO())
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_reintenta_si_otra_venta_crea_la_fila(self):
+        factura = self.crear_factura(datetime(2026, 3, 10, 12, 0), 'tarjeta', [(self.a, 1)])
+        # Otra venta del mismo día crea la fila entre nuestro UPDATE (0 filas) y el INSERT
+        VentaDiaria.objects.create(fecha=date(2026, 3, 10), metodo_pago='tarjeta', total=Decimal('10.00'), ordenes=1, unidades=2)
+        update = QuerySet.update
+        llamadas = []
+
+        def update_antes_de_la_otra_venta(queryset, **cambios):
+            llamadas.append(cambios)
+            return 0 if len(llamadas) == 1 else update(queryset, **cambios)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=update_antes_de_la_otra_venta):
+            registrar_venta(factura, unidades=1)
+
+        # UPDATE sin filas → INSERT con IntegrityError → UPDATE de nuevo
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(self.rollup(), {(date(2026, 3, 10), 'tarjeta'): (Decimal('33.00'), 2, 3)})
+
+
+# ======================================================
+# ⏱️ CACHE DEL DASHBOARD CON REVALIDACIÓN
+# ======================================================
+
+class RevalidacionCacheTests(TestCase):
+    CLAVE = 'pruebas:revalidacion'
+
+    def setUp(self):
+        cache.clear()
+        self.calculos = 0
+        self.liberar = threading.Event()
+
+    def construir(self):
+        """Cálculo lento: espera a `liberar` y devuelve cuántas veces se llamó."""
+        self.calculos += 1
+        self.liberar.wait(5)
+        return {'calculo': self.calculos}
+
+    def obtener(self):
+        return datos_con_revalidacion(self.CLAVE, self.construir, ttl=60, margen=300)
+
+    def sembrar_vencido(self):
+        cache.set(self.CLAVE, {'datos': {'calculo': 0}, 'fresco_hasta': time.time() - 1}, 300)
+
+    def esperar_recalculo(self):
+        """Espera a que el hilo de segundo plano suelte el candado."""
+        limite = time.monotonic() + 5
+        while cache.get(f'{self.CLAVE}:recalculando') and time.monotonic() < limite:
+            time.sleep(0.01)
+
+    def test_fresco_no_recalcula(self):
+        cache.set(self.CLAVE, {'datos': {'calculo': 0}, 'fresco_hasta': time.time() + 60}, 300)
+        self.assertEqual(self.obtener(), {'calculo': 0})
+        self.assertEqual(self.calculos, 0)
+
+    def test_vencido_sirve_lo_viejo_con_un_solo_recalculo(self):
+        self.sembrar_vencido()
+
+        # Varias peticiones mientras el recálculo sigue en curso: todas reciben
+        # la copia vieja al instante y solo una lanza el cálculo
+        for _ in range(5):
+            self.assertEqual(self.obtener(), {'calculo': 0})
+        self.liberar.set()
+        self.esperar_recalculo()
+
+        self.assertEqual(self.calculos, 1)
+        self.assertEqual(self.obtener(), {'calculo': 1})
+        self.assertEqual(self.calculos, 1)
+
+    def test_sin_copia_calcula_uno_y_el_resto_espera(self):
+        resultados = []
+        barrera = threading.Barrier(4)
+
+        def pedir():
+            barrera.wait()
+            resultados.append(self.obtener())
+
+        hilos = [threading.Thread(target=pedir) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        time.sleep(0.2)
+        self.liberar.set()
+        for hilo in hilos:
+            hilo.join(10)
+
+        self.assertEqual(self.calculos, 1)
+        self.assertEqual(resultados, [{'calculo': 1}] * 4)
+
+    def test_error_en_segundo_plano_sigue_sirviendo_lo_viejo(self):
+        self.sembrar_vencido()
+        with mock.patch.object(self, 'construir', side_effect=RuntimeError('base caída')), \
+                mock.patch('builtins.print') as imprimir:
+            self.assertEqual(self.obtener(), {'calculo': 0})
+            self.esperar_recalculo()
+
+        self.assertIn('base caída', imprimir.call_args.args[0])
+        # Se soltó el candado: la siguiente petición vuelve a intentarlo
+        self.liberar.set()
+        self.assertEqual(self.obtener(), {'calculo': 0})
+        self.esperar_recalculo()
+        self.assertEqual(self.obtener(), {'calculo': 1})
+
+
+# ======================================================
+# 🛒 VENTAS CON DATOS INVÁLIDOS
+# ======================================================
+
+class VentaDatosInvalidosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(1, stock=5)
+        self.producto = Producto.objects.get()
+        self.usuario = Usuario.objects.create_user(email='ana@example.com', password='clave')
+
+    def test_productos_invalidos_son_400(self):
+        for productos in (
+            [{'id': self.producto.id, 'cantidad': 'dos'}],
+            [{'id': self.producto.id, 'cantidad': None}],
+            [{'id': self.producto.id, 'cantidad': [1]}],
+            [{'id': 'abc', 'cantidad': 1}],
+            [{'id': {'pk': 1}, 'cantidad': 1}],
+            [{'id': self.producto.id, 'cantidad': 0}],
+            [{'cantidad': 1}],
+            [self.producto.id],
+            'perfume',
+        ):
+            with self.subTest(productos=productos):
+                datos = datos_venta(self.usuario, self.producto)
+                datos['productos'] = productos
+                respuesta = self.client.post('/api/ventas/procesar/', datos, content_type='application/json')
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('error', respuesta.json())
+
+        self.assertFalse(Factura.objects.exists())
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 5)
+
+    def test_ids_y_cantidades_como_texto(self):
+        datos = datos_venta(self.usuario, self.producto)
+        datos['productos'] = [{'id': str(self.producto.id), 'cantidad': '2'}]
+        respuesta = self.client.post('/api/ventas/procesar/', datos, content_type='application/json')
+
+        self.assertEqual(respuesta.status_code, 201)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 3)
+
+
+# ======================================================
+# 🛒 VENTAS CONCURRENTES (sin sobreventa)
+# ======================================================
+
+@skipUnlessDBFeature('has_select_for_update')
+class VentasConcurrentesTests(TransactionTestCase):
+    """
+    Varios checkouts a la vez contra poco stock. Necesita bloqueos de fila
+    reales (MySQL/PostgreSQL); SQLite no tiene SELECT ... FOR UPDATE.
+    """
+    COMPRADORES = 8
+
+    def setUp(self):
+        cache.clear()
+        crear_catalogo(2, stock=3)
+        self.a, self.b = Producto.objects.order_by('id')
+        self.usuarios = [
+            Usuario.objects.create_user(email=f'comprador{i}@example.com', password='clave')
+            for i in range(self.COMPRADORES)
+        ]
+
+    def comprar_en_paralelo(self, carritos):
+        """POST a procesar_venta desde un hilo por carrito, todos a la vez. Devuelve los status."""
+        barrera = threading.Barrier(len(carritos))
+        estados = [None] * len(carritos)
+
+        def comprar(i, usuario, productos):
+            try:
+                datos = datos_venta(usuario, self.a)
+                datos['productos'] = productos
+                barrera.wait()
+                estados[i] = Client().post('/api/ventas/procesar/', datos, content_type='application/json').status_code
+            finally:
+                connection.close()
+
+        hilos = [
+            threading.Thread(target=comprar, args=(i, usuario, productos))
+            for i, (usuario, productos) in enumerate(zip(self.usuarios, carritos))
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return estados
+
+    def test_no_vende_mas_que_el_stock(self):
+        estados = self.comprar_en_paralelo([[{'id': self.a.id, 'cantidad': 1}]] * self.COMPRADORES)
+
+        self.assertEqual(estados.count(201), 3)
+        self.assertEqual(estados.count(400), self.COMPRADORES - 3)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.stock, 0)
+        self.assertEqual(Factura.objects.count(), 3)
+        self.assertEqual(VentaDiaria.objects.get().ordenes, 3)
+
+    def test_carritos_en_orden_inverso_sin_deadlock(self):
+        # La mitad pide A y B, la otra mitad B y A: el bloqueo por id evita deadlocks
+        carritos = [
+            [{'id': self.a.id, 'cantidad': 1}, {'id': self.b.id, 'cantidad': 1}],
+            [{'id': self.b.id, 'cantidad': 1}, {'id': self.a.id, 'cantidad': 1}],
+        ] * (self.COMPRADORES // 2)
+        estados = self.comprar_en_paralelo(carritos)
+
+        self.assertEqual(estados.count(201), 3)
+        self.assertEqual(estados.count(400), self.COMPRADORES - 3)
+        for producto in (self.a, self.b):
+            producto.refresh_from_db()
+            self.assertEqual(producto.stock, 0)
+        self.assertEqual(DetalleFactura.objects.count(), 6)
+
+
+# ======================================================
+# 📬 BANDEJA DE SALIDA DE CORREOS
+# ======================================================
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    RESEND_API_KEY='',
+    FACTURAS_PDF_STORAGE={'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+)
+class CorreosSalientesTests(TestCase):
+    ENVIAR = 'django.core.mail.backends.locmem.EmailBackend.send_messages'
+
+    def setUp(self):
+        # El worker cierra conexiones viejas en cada ciclo; dentro de un
+        # TestCase eso cerraría la transacción del test
+        parche = mock.patch('perfume_api.management.commands.procesar_correos.close_old_connections')
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def procesar(self):
+        call_command('procesar_correos', '--una-vez', stdout=StringIO())
+
+    def vencer(self, correo):
+        """Adelanta el reintento programado para no esperar el backoff."""
+        CorreoSaliente.objects.filter(id=correo.id).update(siguiente_intento=timezone.now() - timedelta(seconds=1))
+
+    def test_encolar_y_enviar(self):
+        correo = encolar_correo('ana@example.com', asunto='Código', cuerpo='123456', cuerpo_html='<b>123456</b>', canal='resend')
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.procesar()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.assertEqual(mail.outbox[0].alternatives, [('<b>123456</b>', 'text/html')])
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('enviado', 1))
+        self.assertIsNotNone(correo.enviado_at)
+
+        # Ya enviado: el siguiente ciclo no lo repite
+        self.procesar()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_factura_con_pdf_adjunto(self):
+        crear_catalogo(1)
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+        factura = Factura(cliente=cliente)
+        factura.aplicar_agregados(Decimal('23.00'), 1)
+        factura.save()
+        producto = Producto.objects.get()
+        DetalleFactura.objects.create(
+            factura=factura, producto=producto, cantidad=1, precio_unitario=producto.precio, subtotal=producto.precio
+        )
+        encolar_factura(factura)
+
+        self.procesar()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(f'ORD-{factura.id:06d}', mail.outbox[0].subject)
+        nombre, contenido, tipo = mail.outbox[0].attachments[0]
+        self.assertEqual((nombre, tipo), (f'Factura_ORD-{factura.id:06d}.pdf', 'application/pdf'))
+        self.assertTrue(contenido.startswith(b'%PDF'))
+
+    def test_reintentos_con_backoff_hasta_fallido(self):
+        correo = encolar_correo('ana@example.com', asunto='Hola', cuerpo='Hola')
+
+        with mock.patch(self.ENVIAR, side_effect=ConnectionError('SMTP caído')), \
+                self.assertLogs('perfume_api.correos', 'ERROR') as registro:
+            for intento, espera in enumerate((1, 2, 4, 8), start=1):
+                antes = timezone.now()
+                self.procesar()
+                correo.refresh_from_db()
+                self.assertEqual((correo.estado, correo.intentos), ('pendiente', intento))
+                self.assertEqual(correo.ultimo_error, 'SMTP caído')
+                self.assertGreaterEqual(correo.siguiente_intento, antes + timedelta(minutes=espera))
+                self.assertLess(correo.siguiente_intento, antes + timedelta(minutes=espera, seconds=30))
+
+                # Antes de que venza el reintento el worker no lo toca
+                self.procesar()
+                correo.refresh_from_db()
+                self.assertEqual(correo.intentos, intento)
+                self.vencer(correo)
+
+            self.procesar()
+
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('fallido', CorreoSaliente.MAX_INTENTOS))
+        self.assertEqual(len(mail.outbox), 0)
+        # Los errores van al log, no a stdout del worker
+        self.assertEqual(len(registro.records), CorreoSaliente.MAX_INTENTOS)
+        self.assertIn('ana@example.com: SMTP caído', registro.output[0])
+
+    def test_error_al_conectar_reintenta_el_lote(self):
+        correos = [encolar_correo(f'c{i}@example.com', asunto='Hola', cuerpo='Hola') for i in range(3)]
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('sin red')), \
+                self.assertLogs('perfume_api.correos', 'ERROR') as registro:
+            resultado = procesar_pendientes(lote=10)
+
+        self.assertIn('Error conectando al servidor de correo: sin red', registro.output[0])
+
+        self.assertEqual((resultado['enviados'], resultado['fallidos']), (0, 3))
+        for correo in correos:
+            correo.refresh_from_db()
+            self.assertEqual((correo.estado, correo.intentos, correo.ultimo_error), ('pendiente', 1, 'sin red'))
+
+    def test_reserva_caducada_se_vuelve_a_tomar(self):
+        abandonado = encolar_correo('viejo@example.com', asunto='Hola', cuerpo='Hola')
+        en_curso = encolar_correo('nuevo@example.com', asunto='Hola', cuerpo='Hola')
+        ahora = timezone.now()
+        # Un worker murió tras tomar el primero; otro todavía está enviando el segundo
+        CorreoSaliente.objects.filter(id=abandonado.id).update(estado='enviando', siguiente_intento=ahora - timedelta(seconds=1))
+        CorreoSaliente.objects.filter(id=en_curso.id).update(estado='enviando', siguiente_intento=ahora + PLAZO_ENVIO)
+
+        self.procesar()
+
+        self.assertEqual([m.to for m in mail.outbox], [['viejo@example.com']])
+        en_curso.refresh_from_db()
+        self.assertEqual(en_curso.estado, 'enviando')
+
+    def test_el_worker_sigue_tras_un_error(self):
+        encolar_correo('ana@example.com', asunto='Hola', cuerpo='Hola')
+        errores_pendientes = [RuntimeError('base de datos caída')]
+        esperas = []
+
+        def procesar_o_fallar(**kwargs):
+            if errores_pendientes:
+                raise errores_pendientes.pop()
+            return procesar_pendientes(**kwargs)
+
+        def dormir(segundos):
+            # Segunda espera: el ciclo siguiente al error ya envió; terminar
+            esperas.append(segundos)
+            if len(esperas) == 2:
+                raise KeyboardInterrupt
+
+        with mock.patch(
+            'perfume_api.management.commands.procesar_correos.procesar_pendientes', side_effect=procesar_o_fallar
+        ) as procesar, mock.patch('perfume_api.management.commands.procesar_correos.time.sleep', side_effect=dormir):
+            errores = StringIO()
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('procesar_correos', '--intervalo', '0', stdout=StringIO(), stderr=errores)
+
+        self.assertEqual(procesar.call_count, 2)
+        self.assertIn('base de datos caída', errores.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@skipUnless(os.environ.get('MEDIR_ARRANQUE'), "mide tiempo y memoria reales: MEDIR_ARRANQUE=1 para correrlo")
+class ArranqueTests(TestCase):
+    def test_arranque_dentro_del_presupuesto(self):
+        # Importa perfumeria.wsgi con -X importtime en otro proceso y falla si
+        # se pasa del tiempo/memoria o carga módulos pesados al arrancar
+        salida = StringIO()
+        call_command('medir_arranque', '--repeticiones', '1', stdout=salida)
+        self.assertIn('✅', salida.getvalue())
+
+
+# ======================================================
+# 🧾 LISTAS DESDE values(): MISMO JSON QUE EL SERIALIZER
+# ======================================================
+
+class RepresentacionValoresTests(TestCase):
+    """La representación desde values() debe dar los mismos bytes que el serializer."""
+
+    # Decimales con otra escala, con exponente y cero negativo; fechas con microsegundos
+    DECIMALES = [Decimal('5'), Decimal('12.345'), Decimal('12.355'), Decimal('0E-2'), Decimal('-0.00'), Decimal('1.5E+2')]
+    FECHAS = [
+        datetime(2025, 1, 31, 23, 59, 59, 999999),
+        datetime(2025, 6, 1, 8, 0),
+        datetime(2025, 6, 1, 8, 0, 0, 1),
+    ]
+
+    def assertMismoJson(self, serializer_data, valores):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(valores), renderer.render(serializer_data))
+
+    def filas_productos(self, fechas):
+        marca, tipo = Marca(id=1, nombre='Chanel'), Tipo(id=2, nombre='Eau de Parfum')
+        filas = []
+        for i, (precio, fecha) in enumerate(zip(self.DECIMALES, fechas * 2), start=1):
+            filas.append({
+                'id': i, 'nombre': f'Perfume {i}', 'descripcion': None if i % 2 else 'Floral',
+                'precio': precio, 'url_imagen': None if i % 3 else f'https://cdn.example.com/{i}.jpg',
+                'stock': i, 'genero': 'Unisex', 'created_at': fecha, 'updated_at': None if i == 1 else fecha,
+                'marca_id': marca.id, 'marca__nombre': marca.nombre, 'tipo_id': tipo.id, 'tipo__nombre': tipo.nombre,
+            })
+        productos = [
+            Producto(marca=marca, tipo=tipo, **{k: v for k, v in fila.items() if '__' not in k and not k.endswith('_id')})
+            for fila in filas
+        ]
+        return filas, productos
+
+    def comparar_todo(self, fechas):
+        filas, productos = self.filas_productos(fechas)
+        self.assertMismoJson(
+            ProductoSerializer(productos, many=True).data, PRODUCTO_VALORES.representar(filas, list(PRODUCTO_VALORES.campos))
+        )
+
+        filas = [
+            {'id': i, 'total': total, 'fecha': fecha, 'metodo_pago': 'efectivo', 'subtotal': total, 'iva': None,
+             'num_items': 0, 'cliente_id': i}
+            for i, (total, fecha) in enumerate(zip(self.DECIMALES, fechas * 2), start=1)
+        ]
+        self.assertMismoJson(
+            FacturaSerializer([Factura(**fila) for fila in filas], many=True).data,
+            FACTURA_VALORES.representar(filas, list(FACTURA_VALORES.campos)),
+        )
+
+        filas = [
+            {'id': i, 'cantidad': i, 'precio_unitario': precio, 'subtotal': precio * i, 'factura_id': 1, 'producto_id': i}
+            for i, precio in enumerate(self.DECIMALES, start=1)
+        ]
+        self.assertMismoJson(
+            DetalleFacturaSerializer([DetalleFactura(**fila) for fila in filas], many=True).data,
+            DETALLE_FACTURA_VALORES.representar(filas, list(DETALLE_FACTURA_VALORES.campos)),
+        )
+
+    def test_mismo_json_sin_zona_horaria(self):
+        self.comparar_todo(self.FECHAS)
+
+    @override_settings(USE_TZ=True)
+    def test_mismo_json_con_zona_horaria(self):
+        utc = [timezone.make_aware(fecha, timezone.utc) for fecha in self.FECHAS]
+        self.comparar_todo(utc + [timezone.make_aware(fecha) for fecha in self.FECHAS])
+
+    @override_settings(USE_TZ=True, TIME_ZONE='UTC')
+    def test_mismo_json_en_utc(self):
+        # DRF escribe "Z" en lugar de "+00:00"
+        self.comparar_todo([timezone.make_aware(fecha) for fecha in self.FECHAS])
+
+    def test_mismo_json_que_el_serializer_en_la_api(self):
+        marca, tipo = crear_catalogo(1)
+        Producto.objects.create(
+            nombre='Sin imagen', marca=marca, tipo=tipo, precio=Decimal('5'), stock=0, descripcion=None, url_imagen=None
+        )
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', email='ana@example.com', sexo='Mujer', password='x')
+        for total in ('69.00', '0.01'):
+            factura = Factura(cliente=cliente, total=Decimal(total), fecha=datetime(2025, 1, 1, 10, 30, 0, 123456))
+            factura.aplicar_agregados(factura.total, 1)
+            factura.save()
+            DetalleFactura.objects.create(
+                factura=factura, producto=Producto.objects.first(), cantidad=3, precio_unitario=Decimal('20'),
+                subtotal=Decimal('60'),
+            )
+
+        casos = [
+            ('/api/productos/', Producto.objects.select_related('marca', 'tipo').order_by('-id'), ProductoSerializer),
+            ('/api/facturas/', Factura.objects.order_by('-fecha', '-id'), FacturaSerializer),
+            ('/api/detalles/', DetalleFactura.objects.order_by('-id'), DetalleFacturaSerializer),
+        ]
+        for url, queryset, serializer_class in casos:
+            with self.subTest(url=url):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertMismoJson(serializer_class(queryset, many=True).data, respuesta.data['results'])
+
+
+# ======================================================
+# 🖼️ CAMPOS A PEDIDO: ?fields= Y ?view=compact
+# ======================================================
+
+class CamposProductoTests(TestCase):
+    COMPACTOS = ['id', 'nombre', 'precio', 'url_imagen', 'stock']
+
+    def setUp(self):
+        cache.clear()
+        self.marca, _ = crear_catalogo(3)
+        self.completos = {p['id']: p for p in self.client.get('/api/productos/').json()['results']}
+        cache.clear()
+
+    def obtener(self, url, **parametros):
+        """(respuesta, SQL de la consulta que trae las filas de productos)."""
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, parametros)
+        sql = [c['sql'] for c in consultas.captured_queries if 'perfume_api_producto' in c['sql']]
+        return respuesta, sql[-1] if sql else ''
+
+    def test_vista_compacta(self):
+        for url in ('/api/productos/', f'/api/productos/marca/{self.marca.id}/'):
+            with self.subTest(url=url):
+                respuesta, sql = self.obtener(url, view='compact')
+                self.assertEqual(respuesta.status_code, 200)
+                datos = respuesta.json()
+                productos = datos['results'] if isinstance(datos, dict) else datos
+                self.assertEqual(len(productos), 3)
+                for producto in productos:
+                    self.assertEqual(list(producto), self.COMPACTOS)
+                    self.assertEqual(producto, {k: self.completos[producto['id']][k] for k in self.COMPACTOS})
+                # Solo las columnas pedidas llegan al SELECT
+                self.assertIn('url_imagen', sql)
+                self.assertNotIn('descripcion', sql)
+                self.assertNotIn('perfume_api_marca', sql)
+
+    def test_fields_en_el_orden_del_serializer(self):
+        respuesta, sql = self.obtener('/api/productos/', fields='precio, marca_nombre,id')
+        self.assertEqual(respuesta.status_code, 200)
+        for producto in respuesta.json()['results']:
+            self.assertEqual(list(producto), ['id', 'precio', 'marca_nombre'])
+        self.assertIn('perfume_api_marca', sql)
+        self.assertNotIn('descripcion', sql)
+        # fields manda sobre view
+        producto = self.client.get('/api/productos/', {'fields': 'nombre', 'view': 'compact'}).json()['results'][0]
+        self.assertEqual(list(producto), ['nombre'])
+
+    def test_fields_con_orden_y_cursor(self):
+        # La columna del orden se lee para el cursor pero no sale en la respuesta
+        ids, url = [], '/api/productos/?fields=nombre,id&ordering=-precio&page_size=2'
+        while url:
+            datos = self.client.get(url).json()
+            for producto in datos['results']:
+                self.assertEqual(list(producto), ['id', 'nombre'])
+                ids.append(producto['id'])
+            url = datos['next']
+        self.assertEqual(sorted(ids), sorted(self.completos))
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_campo_desconocido_es_400(self):
+        for url in ('/api/productos/', f'/api/productos/marca/{self.marca.id}/'):
+            for parametros in ({'fields': 'id,precio_costo'}, {'view': 'full'}):
+                with self.subTest(url=url, **parametros):
+                    # Dos veces: el 400 no debe quedar en el cache del catálogo
+                    for _ in range(2):
+                        respuesta = self.client.get(url, parametros)
+                        self.assertEqual(respuesta.status_code, 400)
+                        self.assertIn('precio_costo' if 'fields' in parametros else 'compact', str(respuesta.json()))
+        # Sin campos compactos definidos (facturas) ?view no está disponible
+        self.assertEqual(self.client.get('/api/facturas/', {'view': 'compact'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/productos/').status_code, 200)
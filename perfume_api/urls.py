@@ -20,6 +20,9 @@ from .views import (
     password_reset_verify,
     password_reset_confirm,
     admin_factura_pdf,
+    exportar_facturas_zip,
+    buscar_productos,
+    autocompletar_catalogo,
     send_verification_code,  # ✅ NUEVO
     verify_email_code,       # ✅ NUEVO
 )
@@ -42,10 +45,19 @@ router.register("clientes", ClienteViewSet)
 urlpatterns = [
     # ✅ DASHBOARD PERSONALIZADO (debe ir ANTES de las rutas del router)
     path("admin/dashboard/", dashboard_views.custom_dashboard, name="custom_dashboard"),
+    path("admin/dashboard/metricas/", dashboard_views.dashboard_metricas, name="dashboard_metricas"),
+    path("admin/dashboard/analitica/", dashboard_views.dashboard_analitica, name="dashboard_analitica"),
     
     # 📄 VER PDF DESDE ADMIN
     path("admin/factura/<int:factura_id>/pdf/", admin_factura_pdf, name="admin_factura_pdf"),
     
+    # 🗜️ EXPORTAR PDFs DE FACTURAS EN ZIP
+    path("admin/facturas/exportar-zip/", exportar_facturas_zip, name="exportar_facturas_zip"),
+    
+    # 🔎 BÚSQUEDA (antes del router: si no, "buscar" se tomaría como id de producto)
+    path("productos/buscar/", buscar_productos, name="buscar_productos"),
+    path("productos/autocompletar/", autocompletar_catalogo, name="autocompletar_catalogo"),
+    
 ] + router.urls + [
     
     # ==================== PRODUCTOS ====================
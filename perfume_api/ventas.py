@@ -0,0 +1,140 @@
+# perfume_api/ventas.py
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DetalleFactura, Factura, VentaDiaria
+
+
+# ======================================================
+# 🔹 ROLLUP DE VENTAS DIARIAS
+# ======================================================
+# VentaDiaria guarda una fila por (día, método de pago). Cada venta suma su
+# total, 1 orden y sus unidades con un UPDATE atómico; las ediciones o
+# borrados desde el admin recalculan el día completo.
+
+def dia_de(fecha):
+    """Día local de un datetime (igual al que calcula TruncDate)."""
+    if timezone.is_aware(fecha):
+        fecha = timezone.localtime(fecha)
+    return fecha.date()
+
+
+def inicio_dia(dia):
+    """Primer instante del día, en la misma zona que Factura.fecha."""
+    inicio = datetime.combine(dia, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def registrar_venta(factura, unidades):
+    """
+    Suma una factura nueva al rollup. Debe llamarse dentro de la misma
+    transacción que crea la factura.
+    """
+    fila = VentaDiaria.objects.filter(fecha=dia_de(factura.fecha), metodo_pago=factura.metodo_pago)
+    cambios = dict(
+        total=F('total') + factura.total,
+        ordenes=F('ordenes') + 1,
+        unidades=F('unidades') + unidades,
+        updated_at=timezone.now(),
+    )
+
+    if fila.update(**cambios):
+        return
+
+    # Primera venta del día con este método de pago
+    try:
+        with transaction.atomic():
+            VentaDiaria.objects.create(
+                fecha=dia_de(factura.fecha),
+                metodo_pago=factura.metodo_pago,
+                total=factura.total,
+                ordenes=1,
+                unidades=unidades,
+            )
+    except IntegrityError:
+        # Otra venta concurrente creó la fila primero
+        fila.update(**cambios)
+
+
+def agregar_ventas(facturas):
+    """
+    Agrega un queryset de facturas por (día, método de pago).
+    Devuelve {(fecha, metodo_pago): {'total', 'ordenes', 'unidades'}}.
+    """
+    # Totales y órdenes por factura, y unidades por detalle, en consultas
+    # separadas: unirlas en una sola multiplicaría el total por cada línea.
+    resultado = {}
+    por_factura = (
+        facturas
+        .annotate(dia=TruncDate('fecha'))
+        .values('dia', 'metodo_pago')
+        .annotate(total_dia=Sum('total'), ordenes_dia=Count('id'))
+        .order_by()
+    )
+    for fila in por_factura:
+        resultado[(fila['dia'], fila['metodo_pago'])] = {
+            'total': fila['total_dia'] or Decimal('0.00'),
+            'ordenes': fila['ordenes_dia'],
+            'unidades': 0,
+        }
+
+    por_detalle = (
+        DetalleFactura.objects
+        .filter(factura__in=facturas)
+        .annotate(dia=TruncDate('factura__fecha'))
+        .values('dia', 'factura__metodo_pago')
+        .annotate(unidades_dia=Sum('cantidad'))
+        .order_by()
+    )
+    for fila in por_detalle:
+        clave = (fila['dia'], fila['factura__metodo_pago'])
+        if clave in resultado:
+            resultado[clave]['unidades'] = fila['unidades_dia'] or 0
+
+    return resultado
+
+
+@transaction.atomic
+def recalcular_dias(fechas):
+    """Recalcula desde las facturas las filas del rollup de los días dados."""
+    fechas = set(fechas)
+    if not fechas:
+        return
+
+    VentaDiaria.objects.filter(fecha__in=fechas).delete()
+    # Rangos [00:00, 00:00 del día siguiente) para que usen el índice de fecha
+    rangos = reduce(or_, (
+        Q(fecha__gte=inicio_dia(dia), fecha__lt=inicio_dia(dia + timedelta(days=1)))
+        for dia in fechas
+    ))
+    agregados = agregar_ventas(Factura.objects.filter(rangos))
+    VentaDiaria.objects.bulk_create([
+        VentaDiaria(fecha=fecha, metodo_pago=metodo_pago, **valores)
+        for (fecha, metodo_pago), valores in agregados.items()
+    ])
+
+
+@transaction.atomic
+def reconstruir_ventas(desde=None):
+    """Reconstruye el rollup completo (o desde una fecha). Devuelve las filas creadas."""
+    facturas = Factura.objects.all()
+    filas = VentaDiaria.objects.all()
+    if desde:
+        facturas = facturas.filter(fecha__gte=inicio_dia(desde))
+        filas = filas.filter(fecha__gte=desde)
+
+    filas.delete()
+    agregados = agregar_ventas(facturas)
+    VentaDiaria.objects.bulk_create([
+        VentaDiaria(fecha=fecha, metodo_pago=metodo_pago, **valores)
+        for (fecha, metodo_pago), valores in agregados.items()
+    ], batch_size=1000)
+    return len(agregados)
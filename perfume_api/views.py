@@ -1,32 +1,27 @@
 # perfume_api/views.py
 from datetime import datetime, timedelta
-from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
-import io
 import os
 import re
 import base64
-import resend  # ✅ NUEVO
+from functools import reduce
+from operator import or_
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth.hashers import make_password
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Prefetch, Q, Subquery, When
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 from django.conf import settings
 
-# ✅ Configurar Resend API Key
-resend.api_key = os.environ.get('RESEND_API_KEY', '')
-
-# ✅ REPORTLAB para PDFs
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-
 from .models import (
     Usuario, 
     Marca, 
@@ -43,42 +38,125 @@ from .serializers import (
     MarcaSerializer,
     TipoSerializer,
     ProductoSerializer,
+    ProductoBusquedaSerializer,
     FacturaSerializer,
     DetalleFacturaSerializer,
     ClienteSerializer,
+    PRODUCTO_VALORES,
+    FACTURA_VALORES,
+    DETALLE_FACTURA_VALORES,
 )
+from .pagination import BusquedaPagination, FacturaCursorPagination
+from .busqueda import buscar_productos as buscar_en_catalogo
+from .autocompletar import LIMITE_AUTOCOMPLETAR, LIMITE_AUTOCOMPLETAR_MAX, autocompletar
+from .filters import BusquedaCatalogoFilter, ProductoFilter
+from .correos import encolar_correo, encolar_factura
+from .facturas_pdf import obtener_pdf_factura, respuesta_zip_facturas
+from .cache import datos_catalogo, invalidar_catalogo_al_confirmar, respuesta_condicional
+from .ventas import inicio_dia, registrar_venta
 
 # ======================================================
 # 🔹 VIEWSETS - CRUD Automático
 # ======================================================
 
+class CatalogoCacheMixin:
+    """Sirve `list` desde el cache versionado del catálogo."""
+
+    def list(self, request, *args, **kwargs):
+        datos = datos_catalogo(
+            request,
+            lambda: super(CatalogoCacheMixin, self).list(request, *args, **kwargs).data,
+        )
+        return Response(datos)
+
+class CatalogoCondicionalMixin:
+    """Responde 304 en `list`/`retrieve` si el catálogo no cambió."""
+
+    def list(self, request, *args, **kwargs):
+        return respuesta_condicional(
+            request,
+            self.filter_queryset(self.get_queryset()),
+            lambda: super(CatalogoCondicionalMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        return respuesta_condicional(
+            request,
+            self.get_queryset().filter(**{self.lookup_field: kwargs[lookup]}),
+            lambda: super(CatalogoCondicionalMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+class ListaValoresMixin:
+    """
+    `list` de solo lectura desde values(): mismo JSON que el serializer sin
+    instanciar modelos ni campos de DRF. Admite ?fields=a,b y ?view=compact.
+    """
+    representacion_valores = None
+
+    def list(self, request, *args, **kwargs):
+        try:
+            nombres = self.representacion_valores.elegir(request.query_params)
+        except ValueError as e:
+            # Excepción (no Response 400) para que el cache del catálogo no la guarde
+            raise ValidationError({"error": str(e)})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # El cursor lee su posición de la fila: las columnas del orden van en values()
+        orden = []
+        if hasattr(self.paginator, "get_ordering"):
+            orden = [campo.lstrip("-") for campo in self.paginator.get_ordering(request, queryset, self)]
+        filas = queryset.values(*self.representacion_valores.columnas(nombres, extra=orden))
+
+        pagina = self.paginate_queryset(filas)
+        if pagina is None:
+            return Response(self.representacion_valores.representar(filas, nombres))
+        return self.get_paginated_response(self.representacion_valores.representar(pagina, nombres))
+
 class UsuarioViewSet(viewsets.ModelViewSet):
     queryset = Usuario.objects.all()
     serializer_class = UsuarioSerializer
+    ordering_fields = ["id"]
 
-class MarcaViewSet(viewsets.ModelViewSet):
+class MarcaViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     queryset = Marca.objects.all()
     serializer_class = MarcaSerializer
+    ordering_fields = ["id"]
 
-class TipoViewSet(viewsets.ModelViewSet):
+class TipoViewSet(CatalogoCacheMixin, viewsets.ModelViewSet):
     queryset = Tipo.objects.all()
     serializer_class = TipoSerializer
+    ordering_fields = ["id"]
 
-class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.all()
+class ProductoViewSet(CatalogoCondicionalMixin, CatalogoCacheMixin, ListaValoresMixin, viewsets.ModelViewSet):
+    # 🔹 marca y tipo en el mismo JOIN (el serializer lee sus nombres)
+    queryset = Producto.objects.select_related("marca", "tipo")
     serializer_class = ProductoSerializer
-
-class FacturaViewSet(viewsets.ModelViewSet):
+    # 🔎 Filtros, búsqueda y orden en el servidor: la app pide solo lo que muestra
+    filterset_class = ProductoFilter
+    # ?search= por texto completo (índice GIN) y nombre de marca, no icontains
+    filter_backends = [DjangoFilterBackend, BusquedaCatalogoFilter, OrderingFilter]
+    ordering_fields = ["id", "precio", "nombre"]
+    # 🖼️ ?fields=id,nombre,precio o ?view=compact para la grilla
+    representacion_valores = PRODUCTO_VALORES
+
+class FacturaViewSet(ListaValoresMixin, viewsets.ModelViewSet):
     queryset = Factura.objects.all()
     serializer_class = FacturaSerializer
+    representacion_valores = FACTURA_VALORES
+    pagination_class = FacturaCursorPagination
+    ordering_fields = ["fecha", "id"]
 
-class DetalleFacturaViewSet(viewsets.ModelViewSet):
+class DetalleFacturaViewSet(ListaValoresMixin, viewsets.ModelViewSet):
     queryset = DetalleFactura.objects.all()
     serializer_class = DetalleFacturaSerializer
+    representacion_valores = DETALLE_FACTURA_VALORES
+    ordering_fields = ["id"]
 
 class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
+    ordering_fields = ["id"]
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
@@ -126,42 +204,35 @@ def send_verification_code(request):
     # Crear nuevo registro de verificación
     EmailVerification.objects.create(email=email, code=code)
     
-    # Enviar email con Resend API
-    try:
-        params = {
-            "from": "Maison de Parfums <onboarding@resend.dev>",
-            "to": [email],
-            "subject": "Código de verificación - Maison de Parfums",
-            "html": f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #333; text-align: center;">Código de verificación</h2>
-                    <p style="color: #666;">Hola,</p>
-                    <p style="color: #666;">Tu código de verificación es:</p>
-                    <div style="background-color: #f5f5f5; padding: 30px; text-align: center; margin: 30px 0; border-radius: 10px;">
-                        <h1 style="color: #000; font-size: 42px; letter-spacing: 10px; margin: 0; font-weight: bold;">{code}</h1>
-                    </div>
-                    <p style="color: #666;">Este código expira en <strong>10 minutos</strong>.</p>
-                    <p style="color: #666;">Si no solicitaste este código, ignora este mensaje.</p>
-                    <br>
-                    <p style="color: #666;">Saludos,<br><strong>Maison de Parfums</strong></p>
-                    <hr style="border: none; border-top: 1px solid #eee; margin: 30px 0;">
-                    <p style="color: #999; font-size: 12px; text-align: center;">Perfumería de Lujo</p>
-                </div>
-            """
-        }
-        
-        resend.Emails.send(params)
-        
-        return Response({
-            'message': 'Código enviado correctamente',
-            'exists': False
-        }, status=200)
-        
-    except Exception as e:
-        print(f"❌ Error enviando email: {str(e)}")
-        return Response({
-            'message': f'Error al enviar email: {str(e)}'
-        }, status=500)
+    # 📬 Encolar el email (lo envía el worker por la API de Resend)
+    cuerpo_html = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #333; text-align: center;">Código de verificación</h2>
+            <p style="color: #666;">Hola,</p>
+            <p style="color: #666;">Tu código de verificación es:</p>
+            <div style="background-color: #f5f5f5; padding: 30px; text-align: center; margin: 30px 0; border-radius: 10px;">
+                <h1 style="color: #000; font-size: 42px; letter-spacing: 10px; margin: 0; font-weight: bold;">{code}</h1>
+            </div>
+            <p style="color: #666;">Este código expira en <strong>10 minutos</strong>.</p>
+            <p style="color: #666;">Si no solicitaste este código, ignora este mensaje.</p>
+            <br>
+            <p style="color: #666;">Saludos,<br><strong>Maison de Parfums</strong></p>
+            <hr style="border: none; border-top: 1px solid #eee; margin: 30px 0;">
+            <p style="color: #999; font-size: 12px; text-align: center;">Perfumería de Lujo</p>
+        </div>
+    """
+    encolar_correo(
+        destinatario=email,
+        asunto="Código de verificación - Maison de Parfums",
+        cuerpo_html=cuerpo_html,
+        remitente="Maison de Parfums <onboarding@resend.dev>",
+        canal='resend',
+    )
+    
+    return Response({
+        'message': 'Código enviado correctamente',
+        'exists': False
+    }, status=200)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -214,9 +285,55 @@ def verify_email_code(request):
 
 @api_view(["GET"])
 def productos_por_marca(request, marca_id):
-    productos = Producto.objects.filter(marca_id=marca_id)
-    serializer = ProductoSerializer(productos, many=True)
-    return Response(serializer.data)
+    """GET /api/productos/marca/<id>/ (admite ?fields= y ?view=compact)"""
+    productos = Producto.objects.select_related("marca", "tipo").filter(marca_id=marca_id)
+    try:
+        nombres = PRODUCTO_VALORES.elegir(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def construir():
+        filas = productos.values(*PRODUCTO_VALORES.columnas(nombres))
+        return PRODUCTO_VALORES.representar(filas, nombres)
+
+    return respuesta_condicional(
+        request,
+        productos,
+        lambda: Response(datos_catalogo(request, construir)),
+    )
+
+@api_view(["GET"])
+def buscar_productos(request):
+    """
+    Búsqueda de texto completo en nombre y descripción, por relevancia.
+    GET /api/productos/buscar/?q=eau de toilette elegance&page=1&page_size=20
+    """
+    texto = request.query_params.get("q", "").strip()
+    if not texto:
+        return Response({"error": "El parámetro q es requerido"}, status=status.HTTP_400_BAD_REQUEST)
+
+    def construir():
+        paginator = BusquedaPagination()
+        pagina = paginator.paginate_queryset(buscar_en_catalogo(texto), request)
+        return paginator.get_paginated_response(ProductoBusquedaSerializer(pagina, many=True).data).data
+
+    return Response(datos_catalogo(request, construir))
+
+@api_view(["GET"])
+def autocompletar_catalogo(request):
+    """
+    Sugerencias de marcas y productos mientras se escribe, desde el índice
+    en memoria del worker (no consulta la base de datos).
+    GET /api/productos/autocompletar/?q=sauv&limite=8
+    """
+    try:
+        limite = min(int(request.query_params.get("limite", LIMITE_AUTOCOMPLETAR)), LIMITE_AUTOCOMPLETAR_MAX)
+    except ValueError:
+        return Response({"error": "limite debe ser un número"}, status=status.HTTP_400_BAD_REQUEST)
+    if limite < 1:
+        return Response({"error": "limite debe ser mayor que 0"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(autocompletar(request.query_params.get("q", ""), limite))
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -260,214 +377,6 @@ def update_cliente(request, pk):
         return Response(serializer.data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-# ======================================================
-# 🔹 FUNCIÓN: GENERAR PDF CON REPORTLAB
-# ======================================================
-
-def generar_pdf_factura(factura):
-    """
-    Genera un PDF de la factura con ReportLab
-    """
-    try:
-        detalles = DetalleFactura.objects.filter(factura=factura)
-        
-        # Calcular IVA
-        IVA_PORCENTAJE = 0.15
-        total = float(factura.total)
-        subtotal = total / (1 + IVA_PORCENTAJE)
-        iva = total - subtotal
-        
-        # Configurar meses en español
-        meses = {
-            1: 'enero', 2: 'febrero', 3: 'marzo', 4: 'abril',
-            5: 'mayo', 6: 'junio', 7: 'julio', 8: 'agosto',
-            9: 'septiembre', 10: 'octubre', 11: 'noviembre', 12: 'diciembre'
-        }
-        mes_texto = meses[factura.fecha.month]
-        fecha_formateada = f"{factura.fecha.day} de {mes_texto}, {factura.fecha.year}"
-        
-        # Crear PDF
-        pdf_buffer = io.BytesIO()
-        c = canvas.Canvas(pdf_buffer, pagesize=letter)
-        width, height = letter
-        
-        # Header
-        c.setFont("Helvetica-Bold", 24)
-        c.drawCentredString(width/2, height - 50, "MAISON DES SENTEURS")
-        c.setFont("Helvetica-Oblique", 12)
-        c.drawCentredString(width/2, height - 70, "Perfumería de Lujo")
-        
-        # Línea separadora
-        c.line(50, height - 90, width - 50, height - 90)
-        
-        # Información de factura
-        y = height - 130
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Factura No:")
-        c.setFont("Helvetica", 12)
-        c.drawString(150, y, f"ORD-{factura.id:06d}")
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(400, y, "Fecha:")
-        c.setFont("Helvetica", 12)
-        c.drawString(450, y, fecha_formateada)
-        
-        # Cliente
-        y -= 50
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Cliente:")
-        c.setFont("Helvetica", 12)
-        c.drawString(110, y, f"{factura.cliente.nombre} {factura.cliente.apellido}")
-        
-        y -= 20
-        c.drawString(110, y, factura.cliente.email)
-        
-        if factura.cliente.cedula:
-            y -= 20
-            c.drawString(110, y, f"CI: {factura.cliente.cedula}")
-        
-        if factura.cliente.celular:
-            y -= 20
-            c.drawString(110, y, f"Tel: {factura.cliente.celular}")
-        
-        if factura.cliente.direccion:
-            y -= 20
-            c.drawString(110, y, f"Dir: {factura.cliente.direccion[:50]}")
-        
-        # Método de pago
-        y -= 30
-        metodo_pago_display = {
-            'wawallet': 'WaWallet',
-            'efectivo': 'Efectivo',
-            'tarjeta': 'Tarjeta de Crédito'
-        }.get(factura.metodo_pago, factura.metodo_pago.upper())
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(400, y, "Método de Pago:")
-        c.setFont("Helvetica", 12)
-        c.drawString(500, y, metodo_pago_display)
-        
-        # Tabla de productos
-        y -= 50
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y, "Detalle de Productos")
-        
-        y -= 30
-        # Headers de tabla
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(50, y, "Producto")
-        c.drawString(300, y, "Cantidad")
-        c.drawString(370, y, "Precio Unit.")
-        c.drawString(470, y, "Subtotal")
-        
-        # Línea bajo headers
-        c.line(50, y - 5, width - 50, y - 5)
-        
-        # Productos
-        y -= 25
-        c.setFont("Helvetica", 10)
-        for detalle in detalles:
-            producto = detalle.producto
-            c.drawString(50, y, producto.nombre[:40])
-            c.drawString(300, y, str(detalle.cantidad))
-            c.drawString(370, y, f"${detalle.precio_unitario:.2f}")
-            c.drawString(470, y, f"${detalle.subtotal:.2f}")
-            y -= 20
-            
-            if y < 150:
-                c.showPage()
-                y = height - 100
-                c.setFont("Helvetica", 10)
-        
-        # Totales
-        y -= 30
-        c.line(350, y, width - 50, y)
-        y -= 25
-        
-        c.setFont("Helvetica", 12)
-        c.drawString(370, y, "Subtotal:")
-        c.drawString(470, y, f"${subtotal:.2f}")
-        
-        y -= 20
-        c.drawString(370, y, "IVA (15%):")
-        c.drawString(470, y, f"${iva:.2f}")
-        
-        y -= 20
-        c.line(350, y + 5, width - 50, y + 5)
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(370, y - 10, "TOTAL:")
-        c.drawString(470, y - 10, f"${total:.2f}")
-        
-        # Footer
-        c.setFont("Helvetica-Oblique", 10)
-        c.drawCentredString(width/2, 50, "Gracias por su compra en Maison Des Senteurs")
-        c.drawCentredString(width/2, 35, "Perfumería de Lujo")
-        
-        c.save()
-        pdf_buffer.seek(0)
-        return pdf_buffer.getvalue()
-        
-    except Exception as e:
-        print(f"❌ Error generando PDF: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-def enviar_factura_por_email(factura):
-    """
-    Envía la factura por correo electrónico al cliente
-    """
-    try:
-        pdf_content = generar_pdf_factura(factura)
-        
-        if not pdf_content:
-            print("❌ No se pudo generar el PDF")
-            return False
-        
-        subject = f'Factura ORD-{factura.id:06d} - Maison Des Senteurs'
-        message = f"""
-Estimado/a {factura.cliente.nombre} {factura.cliente.apellido},
-
-Gracias por su compra en Maison Des Senteurs.
-
-Adjunto encontrará su factura correspondiente a la orden ORD-{factura.id:06d}.
-
-Detalles de la compra:
-- Total: ${factura.total:.2f}
-- Método de pago: {factura.metodo_pago.upper()}
-- Fecha: {factura.fecha.strftime('%d/%m/%Y %H:%M')}
-
-¡Esperamos volver a verle pronto!
-
-Atentamente,
-Maison Des Senteurs
-Perfumería de Lujo
-"""
-        
-        email = EmailMessage(
-            subject=subject,
-            body=message,
-            from_email='maisondeparfumsprofesional@gmail.com',
-            to=[factura.cliente.email],
-        )
-        
-        email.attach(
-            f'Factura_ORD-{factura.id:06d}.pdf',
-            pdf_content,
-            'application/pdf'
-        )
-        
-        email.send()
-        
-        print(f"✅ Factura enviada a {factura.cliente.email}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error enviando factura: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
-
 # ======================================================
 # 🔹 ENDPOINT PARA PROCESAR VENTAS
 # ======================================================
@@ -506,19 +415,43 @@ def procesar_venta(request):
             }
         )
         
-        total = 0
-        detalles = []
-        
+        # 1. Agrupar cantidades por producto (mantiene el orden del carrito)
+        cantidades = {}
         for item in productos_data:
+            if not isinstance(item, dict):
+                return Response({"error": "Cada producto debe tener id y cantidad"}, status=status.HTTP_400_BAD_REQUEST)
+            
             producto_id = item.get('id')
-            cantidad = item.get('cantidad', 1)
+            try:
+                cantidad = int(item.get('cantidad', 1))
+            except (TypeError, ValueError):
+                return Response({"error": "La cantidad debe ser un número entero"}, status=status.HTTP_400_BAD_REQUEST)
             
             if not producto_id:
                 return Response({"error": "Cada producto debe tener un ID"}, status=status.HTTP_400_BAD_REQUEST)
             
+            if cantidad < 1:
+                return Response({"error": "La cantidad debe ser mayor a 0"}, status=status.HTTP_400_BAD_REQUEST)
+            
             try:
-                producto = Producto.objects.select_for_update().get(id=producto_id)
-            except Producto.DoesNotExist:
+                producto_id = int(producto_id)
+            except (TypeError, ValueError):
+                return Response({"error": f"ID de producto inválido: {producto_id}"}, status=status.HTTP_400_BAD_REQUEST)
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+        
+        # 2. Bloquear todos los productos en un solo SELECT ... FOR UPDATE,
+        #    siempre en orden de id para evitar deadlocks entre carritos
+        productos = {
+            producto.id: producto
+            for producto in Producto.objects.select_for_update().filter(id__in=cantidades).order_by('id')
+        }
+        
+        total = 0
+        detalles = []
+        
+        for producto_id, cantidad in cantidades.items():
+            producto = productos.get(producto_id)
+            if producto is None:
                 return Response({"error": f"Producto con ID {producto_id} no encontrado"}, status=status.HTTP_404_NOT_FOUND)
             
             if producto.stock < cantidad:
@@ -531,33 +464,52 @@ def procesar_venta(request):
             subtotal = producto.precio * cantidad
             total += subtotal
             
-            detalles.append({
-                'producto': producto,
-                'cantidad': cantidad,
-                'precio_unitario': producto.precio,
-                'subtotal': subtotal
-            })
-        
-        factura = Factura.objects.create(
+            detalles.append(DetalleFactura(
+                producto=producto,
+                cantidad=cantidad,
+                precio_unitario=producto.precio,
+                subtotal=subtotal
+            ))
+        
+        factura = Factura(
             cliente=cliente,
             fecha=timezone.now(),
             total=total,
             metodo_pago=metodo_pago
         )
+        # Desglose del total (los precios ya incluyen IVA) y líneas en el mismo INSERT
+        factura.aplicar_agregados(total, len(detalles))
+        factura.save()
         
+        # 3. Insertar todos los detalles en un solo INSERT
         for detalle in detalles:
-            DetalleFactura.objects.create(
-                factura=factura,
-                producto=detalle['producto'],
-                cantidad=detalle['cantidad'],
-                precio_unitario=detalle['precio_unitario'],
-                subtotal=detalle['subtotal']
-            )
-            
-            detalle['producto'].stock -= detalle['cantidad']
-            detalle['producto'].save()
+            detalle.factura = factura
+        DetalleFactura.objects.bulk_create(detalles)
+        
+        # 4. Descontar stock con un único UPDATE condicional:
+        #    stock = stock - n WHERE stock >= n (nunca queda negativo)
+        actualizados = Producto.objects.filter(
+            reduce(or_, (Q(id=pid, stock__gte=cant) for pid, cant in cantidades.items()))
+        ).update(
+            stock=Case(
+                *(When(id=pid, then=F('stock') - cant) for pid, cant in cantidades.items()),
+                output_field=IntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
         
-        email_enviado = enviar_factura_por_email(factura)
+        if actualizados != len(cantidades):
+            transaction.set_rollback(True)
+            return Response({"error": "Stock insuficiente para completar la venta"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # El stock cambió: invalidar el catálogo cacheado al confirmar
+        invalidar_catalogo_al_confirmar()
+        
+        # 📊 Sumar la venta al rollup diario del dashboard
+        registrar_venta(factura, unidades=sum(cantidades.values()))
+        
+        # 📬 La factura se envía desde el worker (procesar_correos), fuera del request
+        encolar_factura(factura)
         
         return Response({
             "success": True,
@@ -567,7 +519,7 @@ def procesar_venta(request):
             "fecha": factura.fecha.isoformat(),
             "cliente": cliente.nombre + " " + cliente.apellido,
             "metodo_pago": metodo_pago,
-            "email_enviado": email_enviado,
+            "email_en_cola": True,
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -580,10 +532,32 @@ def procesar_venta(request):
 # 🔹 ENDPOINT PARA OBTENER FACTURAS DEL USUARIO
 # ======================================================
 
+# Tamaño de página del historial de compras
+FACTURAS_USUARIO_LIMITE = 20
+FACTURAS_USUARIO_LIMITE_MAX = 100
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def obtener_facturas_usuario(request, usuario_id):
+    """
+    Historial de compras del usuario, de la más reciente a la más antigua.
+    GET /api/usuarios/<id>/facturas/?limite=20
+    GET /api/usuarios/<id>/facturas/?limite=20&antes=<id de la última factura recibida>
+    
+    Responde con `siguiente` (id a enviar como `antes`) o null si no hay más.
+    Siempre son 4 consultas: usuario, cliente, página de facturas y detalles.
+    """
     try:
+        try:
+            limite = min(int(request.query_params.get('limite', FACTURAS_USUARIO_LIMITE)), FACTURAS_USUARIO_LIMITE_MAX)
+            antes = request.query_params.get('antes')
+            antes = int(antes) if antes else None
+        except ValueError:
+            return Response({"error": "limite y antes deben ser números"}, status=status.HTTP_400_BAD_REQUEST)
+        if limite < 1:
+            return Response({"error": "limite debe ser mayor que 0"}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
             usuario = Usuario.objects.get(id=usuario_id)
         except Usuario.DoesNotExist:
@@ -592,22 +566,57 @@ def obtener_facturas_usuario(request, usuario_id):
         try:
             cliente = Cliente.objects.get(email=usuario.email)
         except Cliente.DoesNotExist:
-            return Response({"facturas": []}, status=status.HTTP_200_OK)
+            return Response({"facturas": [], "siguiente": None}, status=status.HTTP_200_OK)
+        
+        facturas = (
+            Factura.objects
+            .filter(cliente=cliente)
+            .order_by('-fecha', '-id')
+            .prefetch_related(
+                Prefetch(
+                    'detallefactura_set',
+                    queryset=DetalleFactura.objects
+                        .select_related('producto__marca', 'producto__tipo')
+                        .order_by('id'),
+                    to_attr='detalles',
+                )
+            )
+        )
         
-        facturas = Factura.objects.filter(cliente=cliente).order_by('-fecha')
+        if antes is not None:
+            # Keyset sobre (fecha, id): usa el índice factura_fecha_id_idx
+            # y no salta ni repite facturas aunque entren compras nuevas.
+            fecha_antes = Factura.objects.filter(id=antes, cliente=cliente).values('fecha')[:1]
+            facturas = facturas.filter(
+                Q(fecha__lt=Subquery(fecha_antes)) |
+                Q(fecha=Subquery(fecha_antes), id__lt=antes)
+            )
+        
+        # Se pide una de más para saber si hay otra página
+        facturas = list(facturas[:limite + 1])
+        hay_mas = len(facturas) > limite
+        facturas = facturas[:limite]
+        
+        datos_cliente = {
+            'nombre': cliente.nombre,
+            'apellido': cliente.apellido,
+            'email': cliente.email,
+            'cedula': cliente.cedula or '',
+            'direccion': cliente.direccion or '',
+            'celular': cliente.celular or '',
+        }
         
         facturas_data = []
         for factura in facturas:
-            detalles = DetalleFactura.objects.filter(factura=factura)
-            
             productos = []
-            for detalle in detalles:
+            for detalle in factura.detalles:
+                producto = detalle.producto
                 productos.append({
-                    'id': detalle.producto.id,
-                    'nombre': detalle.producto.nombre,
-                    'marca': detalle.producto.marca.nombre if detalle.producto.marca else 'Sin marca',
-                    'tipo': detalle.producto.tipo.nombre if detalle.producto.tipo else 'Sin tipo',
-                    'imagen': detalle.producto.url_imagen or '',
+                    'id': producto.id,
+                    'nombre': producto.nombre,
+                    'marca': producto.marca.nombre if producto.marca else 'Sin marca',
+                    'tipo': producto.tipo.nombre if producto.tipo else 'Sin tipo',
+                    'imagen': producto.url_imagen or '',
                     'cantidad': detalle.cantidad,
                     'precio_unitario': float(detalle.precio_unitario),
                     'subtotal': float(detalle.subtotal),
@@ -620,17 +629,13 @@ def obtener_facturas_usuario(request, usuario_id):
                 'total': float(factura.total),
                 'metodo_pago': factura.metodo_pago,
                 'productos': productos,
-                'cliente': {
-                    'nombre': cliente.nombre,
-                    'apellido': cliente.apellido,
-                    'email': cliente.email,
-                    'cedula': cliente.cedula if hasattr(cliente, 'cedula') else '',
-                    'direccion': cliente.direccion if hasattr(cliente, 'direccion') else '',
-                    'celular': cliente.celular if hasattr(cliente, 'celular') else '',
-                }
+                'cliente': datos_cliente,
             })
         
-        return Response({"facturas": facturas_data}, status=status.HTTP_200_OK)
+        return Response({
+            "facturas": facturas_data,
+            "siguiente": facturas[-1].id if hay_mas else None,
+        }, status=status.HTTP_200_OK)
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -664,9 +669,9 @@ def password_reset_request(request):
             expires_at=timezone.now() + timedelta(minutes=10)
         )
         
-        try:
-            subject = 'Código de Recuperación - Maison Des Senteurs'
-            message = f"""
+        # 📬 Encolar el email (lo envía el worker procesar_correos)
+        subject = 'Código de Recuperación - Maison Des Senteurs'
+        message = f"""
 Hola,
 
 Has solicitado restablecer tu contraseña en Maison Des Senteurs.
@@ -680,17 +685,12 @@ Si no solicitaste este cambio, ignora este mensaje.
 Atentamente,
 Maison Des Senteurs
 """
-            
-            email_obj = EmailMessage(
-                subject=subject,
-                body=message,
-                from_email='maisondeparfumsprofesional@gmail.com',
-                to=[email],
-            )
-            email_obj.send()
-            
-        except Exception as e:
-            print(f"❌ Error enviando email: {str(e)}")
+        
+        encolar_correo(
+            destinatario=email,
+            asunto=subject,
+            cuerpo=message,
+        )
         
         return Response({"message": "Código enviado exitosamente", "email": email}, status=status.HTTP_200_OK)
         
@@ -775,26 +775,68 @@ def password_reset_confirm(request):
 @permission_classes([AllowAny])
 def admin_factura_pdf(request, factura_id):
     """
-    Genera y muestra el PDF de una factura directamente en el navegador
+    Muestra el PDF de una factura directamente en el navegador
+    (se genera solo la primera vez; después se sirve el archivo guardado)
     """
     try:
-        factura = get_object_or_404(Factura, id=factura_id)
+        factura = get_object_or_404(Factura.objects.select_related('cliente'), id=factura_id)
         
-        pdf_content = generar_pdf_factura(factura)
+        storage, nombre = obtener_pdf_factura(factura)
         
-        if not pdf_content:
+        if not nombre:
             return HttpResponse(
                 "Error al generar el PDF. Revisa los logs del servidor.",
                 status=500
             )
         
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="Factura_ORD-{factura.id:06d}.pdf"'
-        
-        return response
+        return FileResponse(
+            storage.open(nombre, 'rb'),
+            content_type='application/pdf',
+            filename=f"Factura_ORD-{factura.id:06d}.pdf",
+        )
         
     except Exception as e:
         print(f"❌ Error generando PDF para admin: {str(e)}")
         import traceback
         traceback.print_exc()
         return HttpResponse(f"Error: {str(e)}", status=500)
+
+# ======================================================
+# 🔹 ENDPOINT PARA EXPORTAR FACTURAS EN ZIP
+# ======================================================
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def exportar_facturas_zip(request):
+    """
+    Descarga un ZIP con el PDF de cada factura del periodo (en streaming).
+    GET /api/admin/facturas/exportar-zip/?mes=2025-11
+    GET /api/admin/facturas/exportar-zip/?desde=2025-11-01&hasta=2025-11-30
+    """
+    facturas = Factura.objects.all()
+    
+    try:
+        mes = request.query_params.get('mes')
+        desde = request.query_params.get('desde')
+        hasta = request.query_params.get('hasta')
+        
+        # Rangos [inicio, fin) sobre fecha (no fecha__year/__date) para usar el índice
+        if mes:
+            inicio = datetime.strptime(mes, '%Y-%m').date()
+            siguiente = (inicio + timedelta(days=32)).replace(day=1)
+            facturas = facturas.filter(fecha__gte=inicio_dia(inicio), fecha__lt=inicio_dia(siguiente))
+            nombre = f"Facturas_{mes}.zip"
+        else:
+            if desde:
+                facturas = facturas.filter(fecha__gte=inicio_dia(datetime.strptime(desde, '%Y-%m-%d').date()))
+            if hasta:
+                fin = datetime.strptime(hasta, '%Y-%m-%d').date() + timedelta(days=1)
+                facturas = facturas.filter(fecha__lt=inicio_dia(fin))
+            nombre = f"Facturas_{desde or 'inicio'}_{hasta or 'hoy'}.zip"
+    except ValueError:
+        return Response(
+            {"error": "Formato inválido: use mes=AAAA-MM o desde/hasta=AAAA-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return respuesta_zip_facturas(facturas, nombre)
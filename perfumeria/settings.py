@@ -141,6 +141,35 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 📄 Almacenamiento de los PDFs de facturas (cualquier backend de Storage)
+FACTURAS_PDF_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': MEDIA_ROOT / 'facturas',
+    },
+}
+
+# 🗜️ Procesos para dibujar PDFs en la exportación ZIP (None = núcleos, hasta 4)
+FACTURAS_PDF_PROCESOS = None
+
+
+# 🗄️ Cache (local en memoria en desarrollo; settings_production usa Redis o
+# la tabla de cache de la base, compartidos por todos los workers)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'perfumeria'),
+    }
+}
+
+# ⏱️ Segundos que vive una respuesta cacheada del catálogo
+CATALOGO_CACHE_TTL = 300
+
+# 📊 Dashboard: segundos que el contexto se considera fresco, y segundos
+# extra durante los que se sirve la copia vieja mientras se recalcula
+DASHBOARD_CACHE_TTL = 60
+DASHBOARD_CACHE_MARGEN = 600
+
 
 # 🔑 Campo por defecto para IDs automáticas
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -158,7 +187,10 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
-    ]
+    ],
+    # 📄 Paginación por cursor (keyset) para todos los ViewSets del router
+    'DEFAULT_PAGINATION_CLASS': 'perfume_api.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 
@@ -175,12 +207,17 @@ SIMPLE_JWT = {
 
 
 # ===== 📧 EMAIL CONFIGURATION (Resend SMTP) ===== 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Para probar sin red: EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend
+# o django.core.mail.backends.filebased.EmailBackend (escribe en EMAIL_FILE_PATH)
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'correos_enviados'
 EMAIL_HOST = 'smtp.resend.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'resend'
 EMAIL_HOST_PASSWORD = os.environ.get('RESEND_API_KEY', '')
+# API HTTP de Resend (si está vacía, el worker envía todo por EMAIL_BACKEND)
+RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
 DEFAULT_FROM_EMAIL = 'onboarding@resend.dev'
 SERVER_EMAIL = 'onboarding@resend.dev'
 EMAIL_TIMEOUT = 30
@@ -2,6 +2,7 @@
 from .settings import *
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 # ⚠️ Seguridad en producción
@@ -23,6 +24,32 @@ DATABASES = {
 }
 
 
+# 🗄️ Cache compartido: los workers de gunicorn y el worker de correos deben
+# ver la misma versión del catálogo (invalidaciones, ETag, Last-Modified).
+# Con REDIS_URL se usa Redis (recomendado); si no, la tabla de cache en
+# PostgreSQL, que es correcta pero cuesta consultas extra por petición
+# (la crea `createcachetable` al arrancar, ver Procfile).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif not os.environ.get('CACHE_BACKEND'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'perfumeria_cache',
+        }
+    }
+
+if CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    # Cada proceso tendría su propia versión del catálogo y las
+    # invalidaciones no llegarían a los demás workers
+    raise ImproperlyConfigured("LocMemCache no sirve en producción: configure REDIS_URL o un CACHE_BACKEND compartido")
+
+
 # Archivos estáticos con WhiteNoise
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -49,12 +76,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
 # ===== 📧 EMAIL CONFIGURATION (Resend para Railway) ===== 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.resend.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'resend'
 EMAIL_HOST_PASSWORD = os.environ.get('RESEND_API_KEY')
+RESEND_API_KEY = os.environ.get('RESEND_API_KEY', '')
 DEFAULT_FROM_EMAIL = 'onboarding@resend.dev'
 SERVER_EMAIL = 'onboarding@resend.dev'
 EMAIL_TIMEOUT = 30
@@ -21,3 +21,9 @@ else:
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'perfumeria.settings')
 
 application = get_wsgi_application()
+
+# 🔎 Índice de autocompletado en memoria: se precarga en un hilo al arrancar
+# el worker. Si la base no responde el worker arranca igual y el índice se
+# construye en la primera petición.
+from perfume_api.autocompletar import calentar_autocompletar_en_segundo_plano  # noqa: E402
+calentar_autocompletar_en_segundo_plano()